@@ -0,0 +1,84 @@
+"""Period balance and date range sums with 100k expenses.
+
+Run with `python -m benchmarks.bench_period`.
+"""
+
+import random
+import timeit
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from src.expense_management.domain import model as expense_model
+
+EXPENSES = 100_000
+START = datetime(2025, 1, 1)
+
+
+def generate_expenses(count: int) -> list[expense_model.Expense]:
+    org_id = uuid4()
+    submitter_id = uuid4()
+    return [
+        expense_model.Expense(
+            submitter_id=submitter_id,
+            date=START + timedelta(minutes=random.randrange(365 * 24 * 60)),
+            title="expense",
+            amount=round(random.uniform(1, 500), 2),
+            category=expense_model.ExpenseCategory.OFFICE_SUPPLIES,
+            organization_id=org_id,
+        )
+        for _ in range(count)
+    ]
+
+
+def linear_sum(expenses, start, end) -> float:
+    """The previous implementation, a scan over every expense."""
+    return sum(expense.amount for expense in expenses if start <= expense.date <= end)
+
+
+def report(name: str, seconds: float, runs: int):
+    print(f"{name:<40} {seconds / runs * 1e6:>12.2f} us/op")
+
+
+def main():
+    expenses = generate_expenses(EXPENSES)
+    ranges = [
+        (START + timedelta(days=day), START + timedelta(days=day + 30))
+        for day in range(0, 330, 11)
+    ]
+
+    period = expense_model.Period(start=START)
+    seconds = timeit.timeit(
+        lambda: [period.add_expense(expense) for expense in expenses], number=1
+    )
+    report(f"add_expense, shuffled ({EXPENSES})", seconds, EXPENSES)
+
+    in_order = expense_model.Period(start=START)
+    ordered = sorted(expenses, key=lambda expense: expense.date)
+    seconds = timeit.timeit(
+        lambda: [in_order.add_expense(expense) for expense in ordered], number=1
+    )
+    report(f"add_expense, date order ({EXPENSES})", seconds, EXPENSES)
+
+    period.expenses_between(*ranges[0])  # build the prefix sums once
+    runs = 10_000
+    report("balance", timeit.timeit(lambda: period.balance, number=runs), runs)
+    report(
+        "linear total (before)",
+        timeit.timeit(lambda: sum(expense.amount for expense in expenses), number=10),
+        10,
+    )
+
+    runs = 1_000
+    seconds = timeit.timeit(
+        lambda: [period.expenses_between(start, end) for start, end in ranges],
+        number=runs,
+    )
+    report("expenses_between", seconds, runs * len(ranges))
+    seconds = timeit.timeit(
+        lambda: [linear_sum(expenses, start, end) for start, end in ranges], number=1
+    )
+    report("linear date range sum (before)", seconds, len(ranges))
+
+
+if __name__ == "__main__":
+    main()
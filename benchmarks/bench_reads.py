@@ -0,0 +1,123 @@
+"""Organization listing through the ORM against the Core read path.
+
+Run with `python -m benchmarks.bench_reads [ROWS ...]`, defaults to 10k, 100k and
+1M rows on a temporary SQLite database.
+"""
+
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from itertools import batched
+from pathlib import Path
+from uuid import UUID, uuid4
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from src._shared.infrastructure import orm
+from src.expense_management.domain import model as expense_model
+from src.expense_management.infrastructure.queries import SqlAlchemyExpenseQueries
+from src.expense_management.infrastructure.repository import (
+    SqlAlchemyExpenseRepository,
+)
+from src.iam.domain import model as user_model
+
+SIZES = [10_000, 100_000, 1_000_000]
+START = datetime(2025, 1, 1)
+
+
+def sqlite_uuid() -> UUID:
+    """A uuid4 whose hex SQLite does not coerce to a number.
+
+    The UUID columns get NUMERIC affinity on SQLite, hex like `1234e567...` is
+    stored as REAL. Rare per row, but certain over a million of them.
+    """
+    while True:
+        value = uuid4()
+        try:
+            float(value.hex)
+        except ValueError:
+            return value
+
+
+def populate(session_factory, rows: int):
+    org_id = sqlite_uuid()
+    submitter_id = sqlite_uuid()
+    with session_factory() as session:
+        session.add(orm.OrganizationORM(id=org_id, name="org"))
+        session.add(
+            orm.UserORM(
+                id=submitter_id,
+                name="submitter",
+                email="s@u.com",
+                role=user_model.UserRole.SUBMITTER,
+                organization_id=org_id,
+            )
+        )
+        session.flush()
+        expenses = (
+            dict(
+                id=sqlite_uuid(),
+                submitter_id=submitter_id,
+                organization_id=org_id,
+                date=START + timedelta(minutes=random.randrange(365 * 24 * 60)),
+                title="expense",
+                amount=round(random.uniform(1, 500), 2),
+                category=expense_model.ExpenseCategory.OFFICE_SUPPLIES,
+                state=random.choice(list(expense_model.ExpenseState)),
+            )
+            for _ in range(rows)
+        )
+        for batch in batched(expenses, 10_000):
+            session.execute(insert(orm.ExpenseORM), list(batch))
+        session.commit()
+    return org_id
+
+
+def orm_listing(session, org_id: UUID):
+    return SqlAlchemyExpenseRepository(session).find_by_organization(org_id)
+
+
+def core_expenses(session, org_id: UUID):
+    return SqlAlchemyExpenseQueries(session).expenses_by_organization(org_id)
+
+
+def core_rows(session, org_id: UUID):
+    return SqlAlchemyExpenseQueries(session).rows_by_organization(org_id)
+
+
+def measure(session_factory, read, org_id: UUID) -> float:
+    with session_factory() as session:
+        started = time.perf_counter()
+        read(session, org_id)
+        return time.perf_counter() - started
+
+
+def report(name: str, rows: int, seconds: float):
+    print(f"{name:<36} {rows:>9} rows {seconds:>9.3f} s {rows / seconds:>12.0f} rows/s")
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or SIZES
+    for rows in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            engine = create_engine(f"sqlite:///{Path(directory) / 'bench.db'}")
+            orm.Base.metadata.create_all(engine)
+            session_factory = sessionmaker(bind=engine)
+            org_id = populate(session_factory, rows)
+
+            reads = {
+                "find_by_organization (ORM, before)": orm_listing,
+                "expenses_by_organization (Core)": core_expenses,
+                "rows_by_organization (Core)": core_rows,
+            }
+            for name, read in reads.items():
+                report(name, rows, measure(session_factory, read, org_id))
+            engine.dispose()
+        print()
+
+
+if __name__ == "__main__":
+    main()
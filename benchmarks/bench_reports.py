@@ -0,0 +1,101 @@
+"""Period breakdowns in pure Python against the NumPy `ExpenseReport`.
+
+Run with `python -m benchmarks.bench_reports [ROWS ...]`, defaults to 100k and 1M
+expenses held in memory. Both paths start from the same `ExpenseBatch`, loading
+it from the database is measured by `bench_reads`. Building the report converts
+every row once, the breakdowns after that run on the arrays alone.
+"""
+
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from uuid import uuid4
+
+from src.expense_management.domain import model as expense_model
+from src.expense_management.domain.report import ExpenseReport
+
+SIZES = [100_000, 1_000_000]
+START = datetime(2025, 1, 1)
+END = datetime(2026, 1, 1)
+
+
+def build_batch(rows: int) -> expense_model.ExpenseBatch:
+    submitters = [uuid4() for _ in range(50)]
+    states = list(expense_model.ExpenseState)
+    batch = expense_model.ExpenseBatch()
+    for _ in range(rows):
+        batch.append(
+            uuid4(),
+            START + timedelta(minutes=random.randrange(365 * 24 * 60)),
+            round(random.uniform(1, 500), 2),
+            random.choice(states),
+            expense_model.ExpenseCategory.OFFICE_SUPPLIES,
+            random.choice(submitters),
+        )
+    return batch
+
+
+def python_breakdowns(batch: expense_model.ExpenseBatch):
+    by_category, by_state, by_month, by_submitter, by_both = {}, {}, {}, {}, {}
+    for when, amount, state, category, submitter_id in zip(
+        batch.dates, batch.amounts, batch.states, batch.categories, batch.submitter_ids
+    ):
+        if not START <= when < END:
+            continue
+        month = date(when.year, when.month, 1)
+        by_category[category] = by_category.get(category, 0.0) + amount
+        by_state[state] = by_state.get(state, 0.0) + amount
+        by_month[month] = by_month.get(month, 0.0) + amount
+        by_submitter[submitter_id] = by_submitter.get(submitter_id, 0.0) + amount
+        months = by_both.setdefault(category, {})
+        months[month] = months.get(month, 0.0) + amount
+    return by_category, by_state, by_month, by_submitter, by_both
+
+
+def build_report(batch: expense_model.ExpenseBatch) -> ExpenseReport:
+    return ExpenseReport.from_batch(batch, START, END)
+
+
+def numpy_breakdowns(report: ExpenseReport):
+    return (
+        report.by_category(),
+        report.by_state(),
+        report.by_month(),
+        report.by_submitter(),
+        report.by_category_and_month(),
+    )
+
+
+def measure(work, *args) -> float:
+    started = time.perf_counter()
+    work(*args)
+    return time.perf_counter() - started
+
+
+def report(name: str, rows: int, seconds: float):
+    print(f"{name:<36} {rows:>9} rows {seconds:>9.3f} s {rows / seconds:>12.0f} rows/s")
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or SIZES
+    for rows in sizes:
+        batch = build_batch(rows)
+        expense_report = build_report(batch)
+        python_result = python_breakdowns(batch)
+        for expected, actual in zip(
+            python_result[:4], numpy_breakdowns(expense_report)
+        ):
+            assert expected.keys() <= actual.keys()
+            assert all(abs(actual[key] - expected[key]) < 1e-6 for key in expected)
+
+        report("dict loops (pure Python)", rows, measure(python_breakdowns, batch))
+        report("ExpenseReport.from_batch", rows, measure(build_report, batch))
+        report(
+            "ExpenseReport breakdowns", rows, measure(numpy_breakdowns, expense_report)
+        )
+        print()
+
+
+if __name__ == "__main__":
+    main()
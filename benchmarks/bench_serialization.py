@@ -0,0 +1,112 @@
+"""JSON encoding of expense responses, from the domain objects to bytes.
+
+Run with `python -m benchmarks.bench_serialization [ROWS ...]`, defaults to 10k
+expenses, the largest page the API hands out. Compares what FastAPI does with a
+returned list, `jsonable_encoder` or the response model validating it, with
+building the models by hand and with `DomainSerializer`, which skips both.
+"""
+
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from src._shared.api.serialization import DomainSerializer
+from src.expense_management.api.schemas import ExpenseResponse
+from src.expense_management.domain import model as expense_model
+
+SIZES = [10_000]
+START = datetime(2025, 1, 1)
+
+
+def build_expenses(rows: int) -> list[expense_model.Expense]:
+    submitters = [uuid4() for _ in range(50)]
+    organization_id = uuid4()
+    return [
+        expense_model.Expense(
+            submitter_id=random.choice(submitters),
+            date=START + timedelta(minutes=random.randrange(365 * 24 * 60)),
+            title="Office chair",
+            amount=round(random.uniform(1, 500), 2),
+            category=random.choice(list(expense_model.ExpenseCategory)),
+            organization_id=organization_id,
+            state=random.choice(list(expense_model.ExpenseState)),
+        )
+        for _ in range(rows)
+    ]
+
+
+def as_response(expense: expense_model.Expense) -> ExpenseResponse:
+    return ExpenseResponse(
+        **{
+            name: getattr(expense, name)
+            for name in ExpenseResponse.model_fields
+            if name not in ("category", "state")
+        },
+        category=expense.category.name,
+        state=expense.state.name,
+    )
+
+
+RESPONSES = TypeAdapter(list[ExpenseResponse])
+EXPENSES = DomainSerializer(expense_model.Expense, ExpenseResponse)
+
+
+def encode_jsonable(expenses: list[expense_model.Expense]) -> bytes:
+    return json.dumps(jsonable_encoder(expenses)).encode()
+
+
+def encode_validated(expenses: list[expense_model.Expense]) -> bytes:
+    return RESPONSES.dump_json(
+        RESPONSES.validate_python(
+            [
+                {name: getattr(expense, name) for name in ExpenseResponse.model_fields}
+                | {"category": expense.category.name, "state": expense.state.name}
+                for expense in expenses
+            ]
+        )
+    )
+
+
+def encode_models(expenses: list[expense_model.Expense]) -> bytes:
+    return RESPONSES.dump_json([as_response(expense) for expense in expenses])
+
+
+def encode_domain(expenses: list[expense_model.Expense]) -> bytes:
+    return EXPENSES.many(expenses)
+
+
+def measure(work, *args) -> float:
+    started = time.perf_counter()
+    work(*args)
+    return time.perf_counter() - started
+
+
+def report(name: str, rows: int, seconds: float):
+    print(f"{name:<36} {rows:>9} rows {seconds:>9.3f} s {rows / seconds:>12.0f} rows/s")
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or SIZES
+    for rows in sizes:
+        expenses = build_expenses(rows)
+        assert RESPONSES.validate_json(encode_domain(expenses)) == [
+            as_response(expense) for expense in expenses
+        ]
+
+        report(
+            "jsonable_encoder + json.dumps", rows, measure(encode_jsonable, expenses)
+        )
+        report("response model validation", rows, measure(encode_validated, expenses))
+        report("response models built by hand", rows, measure(encode_models, expenses))
+        report("DomainSerializer", rows, measure(encode_domain, expenses))
+        print()
+
+
+if __name__ == "__main__":
+    main()
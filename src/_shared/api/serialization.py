@@ -0,0 +1,61 @@
+"""JSON encoding of domain objects straight to bytes.
+
+A response model returned from an endpoint costs a model instance per row before
+Pydantic encodes it. `DomainSerializer` hands the domain dataclasses to the
+Pydantic core serializer instead, the response model only describes the output.
+"""
+
+from enum import Enum
+from typing import Generic, Sequence, TypeVar, get_type_hints
+
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import CoreSchema, SchemaSerializer, core_schema
+
+T = TypeVar("T")
+
+
+def _enum_name(value: Enum) -> str:
+    return value.name
+
+
+_BY_NAME = core_schema.plain_serializer_function_ser_schema(
+    _enum_name, return_schema=core_schema.str_schema()
+)
+
+
+class DomainSerializer(Generic[T]):
+    """Encodes instances of the `source` dataclass shaped like `schema`.
+
+    Attributes are read by the names of the response model fields, enums are
+    written by name as the response models declare them.
+    """
+
+    def __init__(self, source: type[T], schema: type[BaseModel]):
+        hints = get_type_hints(source)
+        item = core_schema.dataclass_schema(
+            source,
+            core_schema.dataclass_args_schema(
+                source.__name__,
+                [
+                    core_schema.dataclass_field(
+                        name=name, schema=_field_schema(hints[name], field.annotation)
+                    )
+                    for name, field in schema.model_fields.items()
+                ],
+            ),
+            fields=list(schema.model_fields),
+        )
+        self._one = SchemaSerializer(item)
+        self._many = SchemaSerializer(core_schema.list_schema(item))
+
+    def one(self, value: T) -> bytes:
+        return self._one.to_json(value)
+
+    def many(self, values: Sequence[T]) -> bytes:
+        return self._many.to_json(values)
+
+
+def _field_schema(source_type, annotation) -> CoreSchema:
+    if isinstance(source_type, type) and issubclass(source_type, Enum):
+        return core_schema.any_schema(serialization=_BY_NAME)
+    return TypeAdapter(annotation).core_schema
@@ -1,3 +1,4 @@
+from pathlib import Path
 from typing import Optional
 
 from pydantic import BaseModel
@@ -14,6 +15,29 @@ class DBConfig(BaseModel):
     password: str
     username: str
     dbname: str
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30
+    pool_pre_ping: bool = True
+    pool_recycle: int = 1800
+    # Read replica for reporting queries, e.g. postgresql://user:pw@replica:5432/db
+    replica_dsn: Optional[str] = None
+    replica_max_lag_seconds: float = 5
+    replica_connect_timeout: int = 2
+
+
+class PrincipalCacheConfig(BaseModel):
+    maxsize: int = 4096
+    ttl_seconds: float = 60
+
+
+class ReceiptStoreConfig(BaseModel):
+    root: Path = Path("var/receipts")
+
+
+class AuthConfig(BaseModel):
+    secret_key: str
+    token_ttl_seconds: int = 3600
 
 
 class TestConfig(BaseModel):
@@ -28,6 +52,9 @@ class Settings(BaseSettings):
 
     test: Optional[TestConfig]
     db: DBConfig
+    auth: Optional[AuthConfig] = None
+    principal_cache: PrincipalCacheConfig = PrincipalCacheConfig()
+    receipts: ReceiptStoreConfig = ReceiptStoreConfig()
 
     @classmethod
     def settings_customise_sources(
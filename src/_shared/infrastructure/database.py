@@ -1,19 +1,282 @@
+import logging
+import threading
+import time
+from datetime import date, datetime
+from functools import lru_cache, partial
+from typing import Callable, Optional, TypeVar
+
 from src._shared.config import get_settings
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy import Engine, create_engine, func, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from src._shared.infrastructure import orm
 
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Bind arguments of the reads a `RoutingSession` may serve from the replica
+REPLICA_READ = {"replica": True}
+
+# Seconds the standby's replay is behind, none once it replayed all it received
+_REPLICATION_LAG = text(
+    "SELECT COALESCE(CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()"
+    " THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END, 0)"
+)
 
-def build_postgres_uri():
+
+def build_postgres_uri(driver: str = "postgresql"):
     settings = get_settings()
-    return f"postgresql://{settings.db.username}:{settings.db.password}@{settings.db.host}:{settings.db.port}/{settings.db.dbname}"
+    return f"{driver}://{settings.db.username}:{settings.db.password}@{settings.db.host}:{settings.db.port}/{settings.db.dbname}"
 
 
-def postgres_db_engine():
-    engine = create_engine(build_postgres_uri())
+@lru_cache(maxsize=1)
+def postgres_db_engine() -> Engine:
+    """Process-wide engine, the connection pool is shared by every request."""
+    settings = get_settings()
+    engine = create_engine(
+        build_postgres_uri(),
+        pool_size=settings.db.pool_size,
+        max_overflow=settings.db.max_overflow,
+        pool_timeout=settings.db.pool_timeout,
+        pool_pre_ping=settings.db.pool_pre_ping,
+        pool_recycle=settings.db.pool_recycle,
+    )
     orm.Base.metadata.create_all(engine)
     return engine
 
 
+def replication_lag(engine: Engine) -> Optional[float]:
+    """Seconds a Postgres standby is behind, None if it cannot be reached."""
+    try:
+        with engine.connect() as connection:
+            return float(connection.execute(_REPLICATION_LAG).scalar_one())
+    except DBAPIError:
+        return None
+
+
+class Replica:
+    """A read replica, used while it is reachable and at most `max_lag` seconds behind.
+
+    The lag is measured at most once per `check_interval` and by one thread at a
+    time, the others go by the previous measurement meanwhile.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        max_lag: float,
+        check_interval: float = 1.0,
+        measure: Callable[[Engine], Optional[float]] = replication_lag,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.engine = engine
+        self._max_lag = max_lag
+        self._check_interval = check_interval
+        self._measure = measure
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._checked_at: Optional[float] = None
+        self._available = False
+
+    def is_available(self) -> bool:
+        now = self._clock()
+        due = self._checked_at is None or now - self._checked_at >= self._check_interval
+        if due and self._lock.acquire(blocking=False):
+            try:
+                lag = self._measure(self.engine)
+                available = lag is not None and lag <= self._max_lag
+                if available != self._available:
+                    log = logger.info if available else logger.warning
+                    log(
+                        "Replica %s, lag %s s",
+                        "in use" if available else "skipped",
+                        lag,
+                    )
+                self._available = available
+                self._checked_at = now
+            finally:
+                self._lock.release()
+        return self._available
+
+    def mark_unavailable(self) -> None:
+        """Skips the replica until its next check, a read on it just failed."""
+        if self._available:
+            logger.warning("Replica skipped, a read on it failed")
+        self._available = False
+        self._checked_at = self._clock()
+
+
+class RoutingSession(Session):
+    """Serves the reads executed with `REPLICA_READ` from `replica`, if available.
+
+    Everything else goes to the primary, and so does every read once the session
+    wrote, a request always reads its own writes. A read failing on the replica is
+    run again on the primary.
+    """
+
+    def __init__(self, *args, replica: Optional[Replica] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._replica = replica
+        self._wrote = False
+        self._on_replica = False
+
+    def get_bind(self, mapper=None, *, clause=None, replica: bool = False, **kwargs):
+        if self._flushing or (clause is not None and clause.is_dml):
+            self._wrote = True
+        elif (
+            replica
+            and not self._wrote
+            and self._replica is not None
+            and self._replica.is_available()
+        ):
+            self._on_replica = True
+            return self._replica.engine
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+    def execute(self, *args, **kwargs):
+        return self.read(partial(super().execute, *args, **kwargs))
+
+    def scalar(self, *args, **kwargs):
+        return self.read(partial(super().scalar, *args, **kwargs))
+
+    def scalars(self, *args, **kwargs):
+        return self.read(partial(super().scalars, *args, **kwargs))
+
+    def read(self, read: Callable[[], T]) -> T:
+        """Runs `read`, on the primary once more if it failed on the replica."""
+        self._on_replica = False
+        try:
+            return read()
+        except DBAPIError:
+            if not self._on_replica:
+                raise
+            self._replica.mark_unavailable()
+            # Ends the failed replica transaction, the session did not write yet
+            self.rollback()
+            self._on_replica = False
+            return read()
+
+
+def replica_read(session: Session, read: Callable[[], T]) -> T:
+    """Runs `read` on `session`, falling back to the primary if it is a `RoutingSession`."""
+    if isinstance(session, RoutingSession):
+        return session.read(read)
+    return read()
+
+
+@lru_cache(maxsize=1)
+def replica_db() -> Optional[Replica]:
+    """Process-wide replica, None unless `replica_dsn` is configured."""
+    settings = get_settings()
+    if settings.db.replica_dsn is None:
+        return None
+    engine = create_engine(
+        settings.db.replica_dsn,
+        pool_size=settings.db.pool_size,
+        max_overflow=settings.db.max_overflow,
+        pool_timeout=settings.db.pool_timeout,
+        pool_pre_ping=settings.db.pool_pre_ping,
+        pool_recycle=settings.db.pool_recycle,
+        # A replica that is down fails the connect fast, the read goes to the primary
+        connect_args={"connect_timeout": settings.db.replica_connect_timeout},
+    )
+    return Replica(engine, max_lag=settings.db.replica_max_lag_seconds)
+
+
+@lru_cache(maxsize=1)
+def session_factory() -> sessionmaker[Session]:
+    return sessionmaker(
+        bind=postgres_db_engine(), class_=RoutingSession, replica=replica_db()
+    )
+
+
 def get_db_session():
-    yield sessionmaker(postgres_db_engine())
+    """Request scoped session, closed (and its connection returned) afterwards."""
+    session = session_factory()()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@lru_cache(maxsize=1)
+def async_db_engine() -> AsyncEngine:
+    """Process-wide asyncpg engine, the schema is created by `postgres_db_engine`."""
+    settings = get_settings()
+    return create_async_engine(
+        build_postgres_uri("postgresql+asyncpg"),
+        pool_size=settings.db.pool_size,
+        max_overflow=settings.db.max_overflow,
+        pool_timeout=settings.db.pool_timeout,
+        pool_pre_ping=settings.db.pool_pre_ping,
+        pool_recycle=settings.db.pool_recycle,
+    )
+
+
+@lru_cache(maxsize=1)
+def async_session_factory() -> async_sessionmaker[AsyncSession]:
+    # Loaded objects stay usable after commit without an implicit (awaitable) refresh
+    return async_sessionmaker(bind=async_db_engine(), expire_on_commit=False)
+
+
+async def get_async_db_session():
+    """Request scoped `AsyncSession`, waiting on the database frees the event loop."""
+    async with async_session_factory()() as session:
+        yield session
+
+
+def warm_up_pool() -> None:
+    """Open `pool_size` connections upfront so the first requests skip the connect."""
+    engine = postgres_db_engine()
+    connections = [engine.connect() for _ in range(get_settings().db.pool_size)]
+    for connection in connections:
+        connection.execute(text("SELECT 1"))
+        connection.close()
+
+
+def dispose_engine() -> None:
+    if postgres_db_engine.cache_info().currsize:
+        postgres_db_engine().dispose()
+    if replica_db.cache_info().currsize and (replica := replica_db()) is not None:
+        replica.engine.dispose()
+    session_factory.cache_clear()
+    postgres_db_engine.cache_clear()
+    replica_db.cache_clear()
+
+
+async def dispose_async_engine() -> None:
+    if async_db_engine.cache_info().currsize:
+        await async_db_engine().dispose()
+    async_session_factory.cache_clear()
+    async_db_engine.cache_clear()
+
+
+def dialect_insert(session: Session | AsyncSession, table):
+    """INSERT construct of the session's backend, exposing `on_conflict_do_update`."""
+    if session.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+def month_start(session: Session | AsyncSession, column):
+    """SQL expression truncating a timestamp column to the start of its month."""
+    if session.get_bind().dialect.name == "postgresql":
+        return func.date_trunc("month", column)
+    return func.strftime("%Y-%m-01", column)
+
+
+def as_date(value: date | datetime | str) -> date:
+    """Normalize a `month_start` result, SQLite returns it as text."""
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.date()
+    return value
@@ -1,12 +1,25 @@
 from uuid import UUID, uuid4
-from datetime import datetime, UTC
+from datetime import date, datetime, UTC
 
-from sqlalchemy import DateTime, Float, ForeignKey, String
+from sqlalchemy import (
+    Date,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    JSON,
+    String,
+    Text,
+    text,
+)
 from sqlalchemy import Enum as SQLEnum
 from sqlalchemy.dialects.postgresql import UUID as PostgreSQL_UUID
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
+from src.expense_management.domain import events as expense_events
 from src.expense_management.domain import model as expense_model
+from src.expense_management.domain import receipt as receipt_model
 from src.iam.domain import model as user_model
 
 
@@ -33,6 +46,7 @@ class OrganizationORM(Base):
 
 class UserORM(Base):
     __tablename__ = "users"
+    __table_args__ = (Index("ix_users_organization_id", "organization_id"),)
 
     id: Mapped[UUID] = mapped_column(
         PostgreSQL_UUID(as_uuid=True), primary_key=True, default=uuid4
@@ -64,6 +78,22 @@ class UserORM(Base):
 
 class ExpenseORM(Base):
     __tablename__ = "expenses"
+    __table_args__ = (
+        # Listings filter on the owner and are keyset ordered by (date, id)
+        Index("ix_expenses_organization_id_date", "organization_id", "date", "id"),
+        Index("ix_expenses_submitter_id_date", "submitter_id", "date", "id"),
+        Index("ix_expenses_approved_by_id", "approved_by_id"),
+        # Approval queue, only the small set of submitted expenses is indexed
+        Index(
+            "ix_expenses_submitted_organization_id_date",
+            "organization_id",
+            "date",
+            "id",
+            postgresql_where=text("state = 'SUBMITTED'"),
+            sqlite_where=text("state = 'SUBMITTED'"),
+        ),
+    )
+
     id: Mapped[UUID] = mapped_column(
         PostgreSQL_UUID(as_uuid=True), primary_key=True, default=uuid4
     )
@@ -89,6 +119,11 @@ class ExpenseORM(Base):
     )
     organization_id: Mapped[UUID] = mapped_column(ForeignKey("organizations.id"))
     organization: Mapped[OrganizationORM] = relationship(back_populates="expenses")
+    notes: Mapped[str | None] = mapped_column(Text, nullable=True)
+    document_reference: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    decline_reason: Mapped[str | None] = mapped_column(Text, nullable=True)
+    revoke_reason: Mapped[str | None] = mapped_column(Text, nullable=True)
+    version: Mapped[int] = mapped_column(Integer, default=1)
     created: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=lambda: datetime.now(UTC)
     )
@@ -100,7 +135,7 @@ class ExpenseORM(Base):
 
     def to_domain(self) -> expense_model.Expense:
         """Convert ORM model to domain model."""
-        return expense_model.Expense(
+        expense = expense_model.Expense(
             id=self.id,
             submitter_id=self.submitter_id,
             title=self.title,
@@ -110,11 +145,26 @@ class ExpenseORM(Base):
             state=self.state,
             organization_id=self.organization_id,
             approved_by_id=self.approved_by_id if self.approved_by_id else None,
+            notes=self.notes,
+            document_reference=self.document_reference,
+            decline_reason=self.decline_reason,
+            revoke_reason=self.revoke_reason,
+            version=self.version,
         )
+        expense.mark_persisted()
+        return expense
 
     @classmethod
     def from_domain(cls, expense: expense_model.Expense) -> "ExpenseORM":
-        return cls(
+        return cls(**cls.values_from_domain(expense))
+
+    @staticmethod
+    def values_from_domain(expense: expense_model.Expense) -> dict:
+        """Column values of a domain model, e.g. for Core bulk statements.
+
+        The version is the one the row gets by the write, one past the loaded one.
+        """
+        return dict(
             id=expense.id,
             submitter_id=expense.submitter_id,
             title=expense.title,
@@ -124,4 +174,140 @@ class ExpenseORM(Base):
             state=expense.state,
             organization_id=expense.organization_id,
             approved_by_id=expense.approved_by_id if expense.approved_by_id else None,
+            notes=expense.notes,
+            document_reference=expense.document_reference,
+            decline_reason=expense.decline_reason,
+            revoke_reason=expense.revoke_reason,
+            version=expense.version + 1,
+        )
+
+
+class ExpenseSummaryORM(Base):
+    """Running spend per organization, month, category and state.
+
+    Maintained by the expense repository in the same transaction as the expenses.
+    """
+
+    __tablename__ = "expense_summaries"
+
+    organization_id: Mapped[UUID] = mapped_column(
+        ForeignKey("organizations.id"), primary_key=True
+    )
+    period: Mapped[date] = mapped_column(Date, primary_key=True)
+    category: Mapped[expense_model.ExpenseCategory] = mapped_column(
+        SQLEnum(expense_model.ExpenseCategory), primary_key=True
+    )
+    state: Mapped[expense_model.ExpenseState] = mapped_column(
+        SQLEnum(expense_model.ExpenseState), primary_key=True
+    )
+    total_amount: Mapped[float] = mapped_column(Float, default=0)
+    expense_count: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class ReceiptJobORM(Base):
+    """Processing state and results of a stored receipt, one row per content hash.
+
+    Rows are added by the expense repository when an expense references a new
+    receipt and worked off by the receipt pipeline.
+    """
+
+    __tablename__ = "receipt_jobs"
+    __table_args__ = (
+        Index("ix_receipt_jobs_state_available_at", "state", "available_at"),
+    )
+
+    document_reference: Mapped[str] = mapped_column(String(64), primary_key=True)
+    state: Mapped[receipt_model.ReceiptJobState] = mapped_column(
+        SQLEnum(receipt_model.ReceiptJobState),
+        default=receipt_model.ReceiptJobState.QUEUED,
+    )
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    available_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(UTC)
+    )
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    media_type: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    size: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    width: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    height: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    page_count: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    text: Mapped[str | None] = mapped_column(Text, nullable=True)
+    thumbnail_reference: Mapped[str | None] = mapped_column(String(64), nullable=True)
+
+    def to_domain(self) -> receipt_model.ReceiptJob:
+        return receipt_model.ReceiptJob(
+            document_reference=self.document_reference,
+            state=self.state,
+            attempts=self.attempts,
+            available_at=self.available_at,
+            last_error=self.last_error,
+            finished_at=self.finished_at,
+            analysis=(
+                receipt_model.ReceiptAnalysis(
+                    media_type=self.media_type,
+                    size=self.size,
+                    width=self.width,
+                    height=self.height,
+                    page_count=self.page_count,
+                    text=self.text,
+                    thumbnail_reference=self.thumbnail_reference,
+                )
+                if self.state == receipt_model.ReceiptJobState.SUCCEEDED
+                else None
+            ),
+        )
+
+
+class OutboxMessageORM(Base):
+    """Expense events waiting to be dispatched.
+
+    Written by the expense repository in the transaction that changes the expense,
+    so an event is stored if and only if its change is.
+    """
+
+    __tablename__ = "expense_outbox"
+    __table_args__ = (
+        Index(
+            "ix_expense_outbox_pending_occurred_at",
+            "occurred_at",
+            postgresql_where=text("dispatched_at IS NULL AND dead_at IS NULL"),
+            sqlite_where=text("dispatched_at IS NULL AND dead_at IS NULL"),
+        ),
+    )
+
+    id: Mapped[UUID] = mapped_column(PostgreSQL_UUID(as_uuid=True), primary_key=True)
+    event_type: Mapped[str] = mapped_column(String(100))
+    expense_id: Mapped[UUID] = mapped_column(PostgreSQL_UUID(as_uuid=True))
+    organization_id: Mapped[UUID] = mapped_column(PostgreSQL_UUID(as_uuid=True))
+    occurred_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    payload: Mapped[dict] = mapped_column(JSON)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    available_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(UTC)
+    )
+    dispatched_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    # Set once publishing failed `max_attempts` times, the message is not retried
+    dead_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+
+    @staticmethod
+    def values_from_event(event: expense_events.ExpenseEvent) -> dict:
+        return dict(
+            id=event.id,
+            event_type=type(event).__name__,
+            expense_id=event.expense_id,
+            organization_id=event.organization_id,
+            occurred_at=event.occurred_at,
+            payload={
+                name: str(value) if isinstance(value, UUID) else value
+                for name, value in vars(event).items()
+                if name not in ("id", "expense_id", "organization_id", "occurred_at")
+            },
         )
@@ -0,0 +1,145 @@
+from base64 import urlsafe_b64decode
+from datetime import datetime
+from typing import Annotated, Literal, Optional
+from uuid import UUID
+
+from fastapi import Depends, Header, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src._shared.infrastructure.database import get_async_db_session, get_db_session
+from src.expense_management.application.queries import ExpenseQueryService
+from src.expense_management.application.services import (
+    AsyncExpenseApplicationService,
+    ExpenseApplicationService,
+)
+from src.expense_management.domain import model as expense_model
+from src.expense_management.domain.repository import ExpenseCursor, ExpenseFilter
+from src.expense_management.infrastructure.queries import SqlAlchemyExpenseQueries
+from src.expense_management.infrastructure.receipts import (
+    LocalReceiptStore,
+    SqlAlchemyReceiptJobRepository,
+    get_receipt_store,
+)
+from src.expense_management.infrastructure.repository import (
+    AsyncSqlAlchemyExpenseRepository,
+    SqlAlchemyExpenseRepository,
+)
+from src.iam.api.dependency import get_current_user_id
+from src.iam.application.services import (
+    AsyncAuthorizationService,
+    AuthorizationService,
+)
+from src.iam.infrastructure.cache import (
+    AsyncCachedUserRepository,
+    CachedUserRepository,
+    PrincipalCache,
+    get_principal_cache,
+)
+from src.iam.infrastructure.repository import (
+    AsyncSqlAlchemyUserRepository,
+    SqlAlchemyUserRepository,
+)
+
+
+def get_auth_service(
+    session: Annotated[Session, Depends(get_db_session)],
+    principal_cache: Annotated[PrincipalCache, Depends(get_principal_cache)],
+) -> AuthorizationService:
+    return AuthorizationService(
+        CachedUserRepository(SqlAlchemyUserRepository(session), principal_cache)
+    )
+
+
+def get_expense_service(
+    session: Annotated[Session, Depends(get_db_session)],
+    auth_service: Annotated[AuthorizationService, Depends(get_auth_service)],
+    receipt_store: Annotated[LocalReceiptStore, Depends(get_receipt_store)],
+) -> ExpenseApplicationService:
+    return ExpenseApplicationService(
+        auth_service=auth_service,
+        expense_repo=SqlAlchemyExpenseRepository(session),
+        receipt_store=receipt_store,
+        receipt_jobs=SqlAlchemyReceiptJobRepository(session),
+    )
+
+
+def get_query_service(
+    session: Annotated[Session, Depends(get_db_session)],
+    auth_service: Annotated[AuthorizationService, Depends(get_auth_service)],
+) -> ExpenseQueryService:
+    return ExpenseQueryService(
+        auth_service=auth_service, queries=SqlAlchemyExpenseQueries(session)
+    )
+
+
+def get_async_auth_service(
+    session: Annotated[AsyncSession, Depends(get_async_db_session)],
+    principal_cache: Annotated[PrincipalCache, Depends(get_principal_cache)],
+) -> AsyncAuthorizationService:
+    return AsyncAuthorizationService(
+        AsyncCachedUserRepository(
+            AsyncSqlAlchemyUserRepository(session), principal_cache
+        )
+    )
+
+
+def get_async_expense_service(
+    session: Annotated[AsyncSession, Depends(get_async_db_session)],
+    auth_service: Annotated[AsyncAuthorizationService, Depends(get_async_auth_service)],
+    receipt_store: Annotated[LocalReceiptStore, Depends(get_receipt_store)],
+) -> AsyncExpenseApplicationService:
+    return AsyncExpenseApplicationService(
+        auth_service=auth_service,
+        expense_repo=AsyncSqlAlchemyExpenseRepository(session),
+        receipt_store=receipt_store,
+    )
+
+
+StateName = Literal[tuple(state.name for state in expense_model.ExpenseState)]
+CategoryName = Literal[
+    tuple(category.name for category in expense_model.ExpenseCategory)
+]
+
+
+def get_expense_filter(
+    state: Annotated[Optional[list[StateName]], Query()] = None,
+    category: Annotated[Optional[list[CategoryName]], Query()] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> ExpenseFilter:
+    return ExpenseFilter(
+        states=[expense_model.ExpenseState[name] for name in state] if state else None,
+        categories=(
+            [expense_model.ExpenseCategory[name] for name in category]
+            if category
+            else None
+        ),
+        date_from=date_from,
+        date_to=date_to,
+    )
+
+
+def get_cursor(after: Optional[str] = None) -> Optional[ExpenseCursor]:
+    """Decodes the opaque `next_cursor` a previous page was answered with."""
+    if after is None:
+        return None
+    try:
+        date, expense_id = urlsafe_b64decode(after).decode().split("|")
+        return ExpenseCursor(date=datetime.fromisoformat(date), id=UUID(expense_id))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail="Invalid cursor"
+        )
+
+
+CurrentUserId = Annotated[UUID, Depends(get_current_user_id)]
+ExpenseService = Annotated[ExpenseApplicationService, Depends(get_expense_service)]
+AsyncExpenseService = Annotated[
+    AsyncExpenseApplicationService, Depends(get_async_expense_service)
+]
+QueryService = Annotated[ExpenseQueryService, Depends(get_query_service)]
+Filters = Annotated[ExpenseFilter, Depends(get_expense_filter)]
+Cursor = Annotated[Optional[ExpenseCursor], Depends(get_cursor)]
+PageLimit = Annotated[int, Query(ge=1, le=10_000)]
+IfNoneMatch = Annotated[Optional[str], Header()]
@@ -1,13 +1,429 @@
+import json
+from base64 import urlsafe_b64encode
+from dataclasses import asdict
+from datetime import date, datetime
+from enum import Enum
+from functools import partial
+from typing import Annotated, Callable, Literal, Optional
+from uuid import UUID
+
+from fastapi import Form, HTTPException, Query, Response, UploadFile, status
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.routing import APIRouter
 
+from src._shared.api.serialization import DomainSerializer
+from src.expense_management.api.dependency import (
+    AsyncExpenseService,
+    CategoryName,
+    CurrentUserId,
+    Cursor,
+    ExpenseService,
+    Filters,
+    IfNoneMatch,
+    PageLimit,
+    QueryService,
+)
+from src.expense_management.api.schemas import (
+    ExpenseAggregateResponse,
+    ExpenseBatchCommand,
+    ExpenseCommandResultResponse,
+    ExpenseCreatedResponse,
+    ExpenseListItemResponse,
+    ExpenseListResponse,
+    ExpenseResponse,
+    ReceiptJobResponse,
+    RevokeCommand,
+)
+from src.expense_management.application import expense_exception
+from src.expense_management.application.export import ExportFormat
+from src.expense_management.application.queries import (
+    ExpenseGrouping,
+    ExpenseListItem,
+    ExpenseListPage,
+)
+from src.expense_management.application.services import ExpenseCommandResult
+from src.expense_management.domain import exception as domain_exception
+from src.expense_management.domain import model as expense_model
+from src.expense_management.domain.repository import ExpenseCursor
+from src.expense_management.infrastructure import exception as infra_exception
+
+
+router = APIRouter(prefix="/expenses")
+
+RECEIPT_CHUNK_SIZE = 64 * 1024
+# Caches may keep a copy but have to revalidate it, which a 304 answers cheaply
+REVALIDATE = "private, no-cache"
+# Rule checks on the acting user, the other rule violations conflict with the state
+_FORBIDDEN = (
+    expense_exception.InvalidSubmitter,
+    expense_exception.InvalidApprover,
+    domain_exception.InvalidSubmitUser,
+    domain_exception.InvalidApprover,
+    domain_exception.InvalidWithdrawUser,
+    domain_exception.InvalidRevokeUser,
+)
+# Encode the domain objects directly, large pages skip a model instance per row
+_EXPENSES = DomainSerializer(expense_model.Expense, ExpenseResponse)
+_LIST_ITEMS = DomainSerializer(ExpenseListItem, ExpenseListItemResponse)
+
+
+@router.get("", response_model=ExpenseListResponse)
+def list_my_expenses(
+    user_id: CurrentUserId,
+    service: QueryService,
+    filters: Filters,
+    after: Cursor,
+    if_none_match: IfNoneMatch = None,
+    limit: PageLimit = 50,
+):
+    """Expenses the user submitted or approved, in pages ordered by date.
+
+    A matching If-None-Match is answered from the ids and versions of the page.
+    """
+    if if_none_match is not None:
+        etag = _etag(service.list_user_tag(user_id, filters, after, limit))
+        if _matches(if_none_match, etag):
+            return _not_modified(etag)
+    page = service.list_user_page(user_id, filters, after, limit)
+    return _json(_list_content(page), _etag(page.tag))
+
+
+@router.get("/organizations/{org_id}", response_model=ExpenseListResponse)
+def list_organization_expenses(
+    org_id: UUID,
+    user_id: CurrentUserId,
+    service: QueryService,
+    filters: Filters,
+    after: Cursor,
+    if_none_match: IfNoneMatch = None,
+    limit: PageLimit = 50,
+):
+    try:
+        if if_none_match is not None:
+            etag = _etag(
+                service.list_organization_tag(user_id, org_id, filters, after, limit)
+            )
+            if _matches(if_none_match, etag):
+                return _not_modified(etag)
+        page = service.list_organization_page(user_id, org_id, filters, after, limit)
+    except expense_exception.NotPermitted:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+
+    return _json(_list_content(page), _etag(page.tag))
+
+
+@router.post(
+    "", status_code=status.HTTP_201_CREATED, response_model=ExpenseCreatedResponse
+)
+def create_expense(
+    user_id: CurrentUserId,
+    service: ExpenseService,
+    title: Annotated[str, Form()],
+    date: Annotated[datetime, Form()],
+    amount: Annotated[float, Form(gt=0)],
+    category: Annotated[CategoryName, Form()],
+    organization_id: Annotated[UUID, Form()],
+    notes: Annotated[Optional[str], Form()] = None,
+    receipt: Optional[UploadFile] = None,
+):
+    # Read in chunks, the store hashes each one as it is written to disk
+    chunks = (
+        iter(partial(receipt.file.read, RECEIPT_CHUNK_SIZE), b"")
+        if receipt is not None
+        else None
+    )
+    try:
+        expense = service.create_expense(
+            user_id,
+            title,
+            date,
+            amount,
+            category,
+            organization_id,
+            notes=notes,
+            receipt=chunks,
+        )
+    except expense_exception.NotPermitted:
+        # Also answers organizations that do not exist, like the listing routes
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+    except expense_exception.InvalidCategory:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT)
+    return ExpenseCreatedResponse(
+        id=expense.id, document_reference=expense.document_reference
+    )
+
+
+# Declared ahead of the /{expense_id} routes, which would match "batch" first
+@router.post("/batch/submit", response_model=list[ExpenseCommandResultResponse])
+async def submit_expenses(
+    command: ExpenseBatchCommand, user_id: CurrentUserId, service: AsyncExpenseService
+):
+    return _to_response(await service.submit_expenses(user_id, command.expense_ids))
+
+
+@router.post("/batch/approve", response_model=list[ExpenseCommandResultResponse])
+async def approve_expenses(
+    command: ExpenseBatchCommand, user_id: CurrentUserId, service: AsyncExpenseService
+):
+    return _to_response(await service.approve_expenses(user_id, command.expense_ids))
+
+
+@router.get("/{expense_id}", response_model=ExpenseResponse)
+def get_expense_by_id(
+    expense_id: UUID,
+    user_id: CurrentUserId,
+    service: QueryService,
+    if_none_match: IfNoneMatch = None,
+):
+    """Answers a matching If-None-Match from the stored tag, without a full read."""
+    try:
+        if if_none_match is not None:
+            etag = _etag(service.expense_tag(user_id, expense_id))
+            if _matches(if_none_match, etag):
+                return _not_modified(etag)
+        tagged = service.get_expense(user_id, expense_id)
+    except expense_exception.NotPermitted:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+    except infra_exception.NoExpenseFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+    return _json(_EXPENSES.one(tagged.expense), _etag(tagged.tag))
+
+
+@router.post("/{expense_id}/submit", response_model=ExpenseResponse)
+def submit_expense(expense_id: UUID, user_id: CurrentUserId, service: ExpenseService):
+    return _transition(lambda: service.submit_expense(user_id, expense_id))
+
+
+@router.post("/{expense_id}/approve", response_model=ExpenseResponse)
+def approve_expense(expense_id: UUID, user_id: CurrentUserId, service: ExpenseService):
+    return _transition(lambda: service.approve_expense(user_id, expense_id))
+
+
+@router.post("/{expense_id}/withdraw", response_model=ExpenseResponse)
+def withdraw_expense(expense_id: UUID, user_id: CurrentUserId, service: ExpenseService):
+    return _transition(lambda: service.withdraw_expense(user_id, expense_id))
+
+
+@router.post("/{expense_id}/revoke", response_model=ExpenseResponse)
+def revoke_approval(
+    expense_id: UUID,
+    command: RevokeCommand,
+    user_id: CurrentUserId,
+    service: ExpenseService,
+):
+    return _transition(
+        lambda: service.revoke_approval(user_id, expense_id, command.reason)
+    )
+
+
+@router.get("/{expense_id}/receipt")
+def download_receipt(expense_id: UUID, user_id: CurrentUserId, service: ExpenseService):
+    try:
+        receipt = service.get_receipt(user_id, expense_id)
+    except expense_exception.NotPermitted:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+    except (
+        infra_exception.NoExpenseFound,
+        infra_exception.NoReceiptFound,
+        expense_exception.NoReceipt,
+    ):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+    # Handles Range requests, servers with the pathsend extension use sendfile
+    return FileResponse(
+        receipt.path,
+        media_type="application/octet-stream",
+        headers={
+            "ETag": f'"{receipt.digest}"',
+            "Cache-Control": "private, max-age=31536000, immutable",
+        },
+    )
+
+
+@router.get(
+    "/organizations/{org_id}/summary", response_model=list[ExpenseAggregateResponse]
+)
+def summarize_organization_expenses(
+    org_id: UUID,
+    group_by: Annotated[
+        list[Literal[tuple(grouping.name for grouping in ExpenseGrouping)]], Query()
+    ],
+    user_id: CurrentUserId,
+    service: QueryService,
+    filters: Filters,
+):
+    groupings = [ExpenseGrouping[name] for name in group_by]
+    try:
+        aggregates = service.summarize_organization(user_id, org_id, groupings, filters)
+    except expense_exception.NotPermitted:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+
+    return [
+        ExpenseAggregateResponse(
+            group={
+                grouping.name.lower(): value.name
+                if isinstance(value, Enum)
+                else str(value)
+                for grouping, value in zip(groupings, aggregate.key)
+            },
+            total=aggregate.total,
+            count=aggregate.count,
+            average=aggregate.average,
+        )
+        for aggregate in aggregates
+    ]
+
+
+@router.get(
+    "/organizations/{org_id}/monthly-spend",
+    response_model=list[ExpenseAggregateResponse],
+)
+def monthly_organization_spend(
+    org_id: UUID,
+    user_id: CurrentUserId,
+    service: QueryService,
+    month_from: Optional[date] = None,
+    month_to: Optional[date] = None,
+):
+    try:
+        aggregates = service.monthly_spend(user_id, org_id, month_from, month_to)
+    except expense_exception.NotPermitted:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+
+    return [
+        ExpenseAggregateResponse(
+            group=dict(month=str(month), category=category.name, state=state.name),
+            total=aggregate.total,
+            count=aggregate.count,
+            average=aggregate.average,
+        )
+        for aggregate in aggregates
+        for month, category, state in [aggregate.key]
+    ]
+
+
+@router.get("/organizations/{org_id}/export")
+def export_organization_expenses(
+    org_id: UUID,
+    user_id: CurrentUserId,
+    service: QueryService,
+    filters: Filters,
+    format: Literal["csv", "ndjson"] = "csv",
+):
+    export_format = ExportFormat[format.upper()]
+    try:
+        chunks = service.export_organization_expenses(
+            user_id, org_id, export_format, filters
+        )
+    except expense_exception.NotPermitted:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+
+    # Each chunk is only produced once the previous one was sent to the client
+    return StreamingResponse(
+        chunks,
+        media_type=export_format.media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="expenses-{org_id}.{format}"'
+        },
+    )
+
+
+@router.get("/{expense_id}/receipt/job", response_model=ReceiptJobResponse)
+def get_receipt_job(expense_id: UUID, user_id: CurrentUserId, service: ExpenseService):
+    try:
+        job = service.get_receipt_job(user_id, expense_id)
+    except expense_exception.NotPermitted:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+    except (
+        infra_exception.NoExpenseFound,
+        infra_exception.NoReceiptJobFound,
+        expense_exception.NoReceipt,
+    ):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+    return ReceiptJobResponse(
+        state=job.state.name,
+        attempts=job.attempts,
+        last_error=job.last_error,
+        **(asdict(job.analysis) if job.analysis else {}),
+    )
+
+
+def _transition(apply: Callable[[], expense_model.Expense]) -> Response:
+    try:
+        expense = apply()
+    except infra_exception.NoExpenseFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    except _FORBIDDEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+    except (
+        domain_exception.ExpenseRuleViolation,
+        domain_exception.ConcurrentModification,
+    ) as error:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=type(error).__name__
+        )
+
+    return Response(_EXPENSES.one(expense), media_type="application/json")
+
+
+def _etag(tag: str) -> str:
+    return f'"{tag}"'
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match compares weakly, a W/ prefix does not matter."""
+    if if_none_match is None:
+        return False
+    candidates = {
+        value.strip().removeprefix("W/") for value in if_none_match.split(",")
+    }
+    return "*" in candidates or etag in candidates
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": REVALIDATE},
+    )
+
 
+def _json(content: bytes, etag: str) -> Response:
+    return Response(
+        content,
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": REVALIDATE},
+    )
 
-router = APIRouter(prefix="expenses")
 
+def _list_content(page: ExpenseListPage) -> bytes:
+    """Encodes the page like `ExpenseListResponse`."""
+    next_cursor = _cursor_token(page.next_cursor) if page.next_cursor else None
+    return b"".join(
+        [
+            b'{"items":',
+            _LIST_ITEMS.many(page.items),
+            b',"next_cursor":',
+            json.dumps(next_cursor).encode(),
+            b"}",
+        ]
+    )
 
 
-@router.get("/{expense_id}", )
-def get_expense_by_id():
-    pass
+def _cursor_token(cursor: ExpenseCursor) -> str:
+    return urlsafe_b64encode(f"{cursor.date.isoformat()}|{cursor.id}".encode()).decode()
 
 
+def _to_response(
+    results: list[ExpenseCommandResult],
+) -> list[ExpenseCommandResultResponse]:
+    return [
+        ExpenseCommandResultResponse(
+            expense_id=result.expense_id,
+            ok=result.ok,
+            state=result.expense.state.name if result.expense else None,
+            error=result.error,
+        )
+        for result in results
+    ]
@@ -0,0 +1,82 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+
+class ExpenseResponse(BaseModel):
+    id: UUID
+    title: str
+    amount: float
+    date: datetime
+    category: str
+    state: str
+    organization_id: UUID
+    submitter_id: UUID
+    approved_by_id: Optional[UUID] = None
+    notes: Optional[str] = None
+    document_reference: Optional[str] = None
+    decline_reason: Optional[str] = None
+    revoke_reason: Optional[str] = None
+    version: int
+
+
+class ExpenseListItemResponse(BaseModel):
+    id: UUID
+    date: datetime
+    title: str
+    amount: float
+    category: str
+    state: str
+    organization_id: UUID
+    organization_name: str
+    submitter_id: UUID
+    submitter_name: str
+    approved_by_id: Optional[UUID] = None
+    approver_name: Optional[str] = None
+
+
+class ExpenseListResponse(BaseModel):
+    items: list[ExpenseListItemResponse]
+    next_cursor: Optional[str] = None
+
+
+class ExpenseCreatedResponse(BaseModel):
+    id: UUID
+    document_reference: Optional[str] = None
+
+
+class ReceiptJobResponse(BaseModel):
+    state: str
+    attempts: int
+    last_error: Optional[str] = None
+    media_type: Optional[str] = None
+    size: Optional[int] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    page_count: Optional[int] = None
+    text: Optional[str] = None
+    thumbnail_reference: Optional[str] = None
+
+
+class ExpenseBatchCommand(BaseModel):
+    expense_ids: list[UUID] = Field(min_length=1, max_length=500)
+
+
+class RevokeCommand(BaseModel):
+    reason: str = Field(min_length=1)
+
+
+class ExpenseCommandResultResponse(BaseModel):
+    expense_id: UUID
+    ok: bool
+    state: Optional[str] = None
+    error: Optional[str] = None
+
+
+class ExpenseAggregateResponse(BaseModel):
+    group: dict[str, str]
+    total: float
+    count: int
+    average: float
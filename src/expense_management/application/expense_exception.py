@@ -8,3 +8,11 @@ class InvalidSubmitter(Exception):
 
 class InvalidApprover(Exception):
     pass
+
+
+class NoReceipt(Exception):
+    pass
+
+
+class InvalidCategory(Exception):
+    pass
@@ -0,0 +1,53 @@
+import csv
+import io
+import json
+from datetime import datetime
+from enum import Enum
+from itertools import batched
+from typing import Iterable, Iterator, Sequence
+from uuid import UUID
+
+
+class ExportFormat(Enum):
+    CSV = "text/csv"
+    NDJSON = "application/x-ndjson"
+
+    @property
+    def media_type(self) -> str:
+        return self.value
+
+
+def encode_rows(
+    columns: Sequence[str],
+    rows: Iterable[Sequence],
+    format: ExportFormat,
+    chunk_size: int = 500,
+) -> Iterator[str]:
+    """Encode rows lazily, one text chunk per `chunk_size` rows."""
+    if format == ExportFormat.CSV:
+        yield _csv([columns])
+    for chunk in batched(rows, chunk_size):
+        plain_rows = [[_plain(value) for value in row] for row in chunk]
+        if format == ExportFormat.CSV:
+            yield _csv(plain_rows)
+        else:
+            yield "".join(
+                json.dumps(dict(zip(columns, row))) + "\n" for row in plain_rows
+            )
+
+
+def _plain(value):
+    """JSON and CSV friendly form of a row value."""
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def _csv(rows: Iterable[Iterable]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
@@ -0,0 +1,307 @@
+from dataclasses import dataclass, field
+from enum import Enum, auto
+from datetime import date, datetime
+from typing import Any, Iterator, NamedTuple, Optional, Protocol, Sequence
+from uuid import UUID
+
+from src.expense_management.application import expense_exception
+from src.expense_management.application.export import ExportFormat, encode_rows
+from src.expense_management.application.services import ExpenseAuthorizationContract
+from src.expense_management.domain import model as expense_model
+from src.expense_management.domain.report import ExpenseReport
+from src.expense_management.domain.repository import ExpenseCursor, ExpenseFilter
+
+
+class ExpenseGrouping(Enum):
+    STATE = auto()
+    CATEGORY = auto()
+    SUBMITTER = auto()
+    MONTH = auto()
+
+
+@dataclass(frozen=True)
+class ExpenseAggregate:
+    """One group, `key` holds the group values in the requested grouping order.
+
+    Months are given as the `date` of their first day.
+    """
+
+    key: tuple[Any, ...]
+    total: float
+    count: int
+    average: float
+
+
+class ExpenseRow(NamedTuple):
+    """Lightweight listing entry, for reads that need no domain behaviour."""
+
+    id: UUID
+    date: datetime
+    title: str
+    amount: float
+    category: expense_model.ExpenseCategory
+    state: expense_model.ExpenseState
+    submitter_id: UUID
+
+
+@dataclass(frozen=True, slots=True)
+class ExpenseListItem:
+    """Listing entry carrying the names a list shows, no user lookups needed.
+
+    A dataclass rather than a row tuple, so it can be encoded without a dict.
+    """
+
+    id: UUID
+    date: datetime
+    title: str
+    amount: float
+    category: expense_model.ExpenseCategory
+    state: expense_model.ExpenseState
+    organization_id: UUID
+    organization_name: str
+    submitter_id: UUID
+    submitter_name: str
+    approved_by_id: Optional[UUID]
+    approver_name: Optional[str]
+
+
+@dataclass(frozen=True)
+class ExpenseListPage:
+    """`tag` changes whenever an expense enters, leaves or changes in the page.
+
+    It follows the expense rows only, renamed users or organizations keep it.
+    """
+
+    items: list[ExpenseListItem]
+    next_cursor: Optional[ExpenseCursor] = None
+    tag: str = field(default="", compare=False)
+
+
+class ExpenseStamp(NamedTuple):
+    """Who may read an expense and its current `tag`, without loading it."""
+
+    submitter_id: UUID
+    organization_id: UUID
+    tag: str
+
+
+@dataclass(frozen=True)
+class TaggedExpense:
+    """An expense with the tag of the stored version it was read from.
+
+    The tag changes with every write to the expense, it makes a strong ETag.
+    """
+
+    expense: expense_model.Expense
+    tag: str
+
+
+class IExpenseQueries(Protocol):
+    def stamp_by_id(self, expense_id: UUID) -> ExpenseStamp: ...
+
+    def expense_by_id(self, expense_id: UUID) -> TaggedExpense: ...
+
+    def expenses_by_organization(
+        self, org_id: UUID, filters: ExpenseFilter = ExpenseFilter()
+    ) -> list[expense_model.Expense]:
+        """Read-only listing ordered by `(date, id)`, the expenses are not tracked."""
+        ...
+
+    def rows_by_organization(
+        self, org_id: UUID, filters: ExpenseFilter = ExpenseFilter()
+    ) -> list[ExpenseRow]: ...
+
+    def list_page_by_organization(
+        self,
+        org_id: UUID,
+        filters: ExpenseFilter = ExpenseFilter(),
+        after: Optional[ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> ExpenseListPage:
+        """Names joined in by the listing query, one round trip per page."""
+        ...
+
+    def list_page_by_user(
+        self,
+        user_id: UUID,
+        filters: ExpenseFilter = ExpenseFilter(),
+        after: Optional[ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> ExpenseListPage:
+        """Expenses the user submitted or approved, like `list_page_by_organization`."""
+        ...
+
+    def list_tag_by_organization(
+        self,
+        org_id: UUID,
+        filters: ExpenseFilter = ExpenseFilter(),
+        after: Optional[ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> str:
+        """Tag of the page `list_page_by_organization` returns, without its names."""
+        ...
+
+    def list_tag_by_user(
+        self,
+        user_id: UUID,
+        filters: ExpenseFilter = ExpenseFilter(),
+        after: Optional[ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> str: ...
+
+    def batch_by_organization(
+        self, org_id: UUID, filters: ExpenseFilter = ExpenseFilter()
+    ) -> expense_model.ExpenseBatch:
+        """Columnar variant of `expenses_by_organization` for analytics."""
+        ...
+
+    def stream_rows_by_organization(
+        self, org_id: UUID, filters: ExpenseFilter = ExpenseFilter()
+    ) -> Iterator[ExpenseRow]:
+        """`rows_by_organization` fetched in chunks, memory stays flat at any size."""
+        ...
+
+    def aggregate_by_organization(
+        self,
+        org_id: UUID,
+        group_by: Sequence[ExpenseGrouping],
+        filters: ExpenseFilter = ExpenseFilter(),
+    ) -> list[ExpenseAggregate]: ...
+
+    def monthly_spend(
+        self,
+        org_id: UUID,
+        month_from: Optional[date] = None,
+        month_to: Optional[date] = None,
+    ) -> list[ExpenseAggregate]:
+        """Spend keyed by (month, category, state), `month_to` is exclusive."""
+        ...
+
+
+class ExpenseQueryService:
+    """Read side for reports and dashboards, computed by the database."""
+
+    def __init__(
+        self, auth_service: ExpenseAuthorizationContract, queries: IExpenseQueries
+    ):
+        self._auth_service = auth_service
+        self._queries = queries
+
+    def list_organization_expenses(
+        self,
+        user_id: UUID,
+        org_id: UUID,
+        filters: ExpenseFilter = ExpenseFilter(),
+    ) -> list[ExpenseRow]:
+        self._ensure_can_view(user_id, org_id)
+        return self._queries.rows_by_organization(org_id, filters)
+
+    def expense_tag(self, user_id: UUID, expense_id: UUID) -> str:
+        """Tag of the current version, a narrow lookup to answer conditional reads."""
+        stamp = self._queries.stamp_by_id(expense_id)
+        self._ensure_can_read(user_id, stamp.submitter_id, stamp.organization_id)
+        return stamp.tag
+
+    def get_expense(self, user_id: UUID, expense_id: UUID) -> TaggedExpense:
+        tagged = self._queries.expense_by_id(expense_id)
+        self._ensure_can_read(
+            user_id, tagged.expense.submitter_id, tagged.expense.organization_id
+        )
+        return tagged
+
+    def list_organization_page(
+        self,
+        user_id: UUID,
+        org_id: UUID,
+        filters: ExpenseFilter = ExpenseFilter(),
+        after: Optional[ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> ExpenseListPage:
+        self._ensure_can_view(user_id, org_id)
+        return self._queries.list_page_by_organization(org_id, filters, after, limit)
+
+    def list_user_page(
+        self,
+        user_id: UUID,
+        filters: ExpenseFilter = ExpenseFilter(),
+        after: Optional[ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> ExpenseListPage:
+        """The user's own expenses, submitted or approved by them."""
+        return self._queries.list_page_by_user(user_id, filters, after, limit)
+
+    def list_organization_tag(
+        self,
+        user_id: UUID,
+        org_id: UUID,
+        filters: ExpenseFilter = ExpenseFilter(),
+        after: Optional[ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> str:
+        """Tag of the page, a narrow lookup to answer conditional reads."""
+        self._ensure_can_view(user_id, org_id)
+        return self._queries.list_tag_by_organization(org_id, filters, after, limit)
+
+    def list_user_tag(
+        self,
+        user_id: UUID,
+        filters: ExpenseFilter = ExpenseFilter(),
+        after: Optional[ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> str:
+        return self._queries.list_tag_by_user(user_id, filters, after, limit)
+
+    def export_organization_expenses(
+        self,
+        user_id: UUID,
+        org_id: UUID,
+        format: ExportFormat,
+        filters: ExpenseFilter = ExpenseFilter(),
+    ) -> Iterator[str]:
+        """Encoded chunks of the listing, produced while the consumer reads them.
+
+        Permission is checked right away, not on the first chunk.
+        """
+        self._ensure_can_view(user_id, org_id)
+        rows = self._queries.stream_rows_by_organization(org_id, filters)
+        return encode_rows(ExpenseRow._fields, rows, format)
+
+    def summarize_organization(
+        self,
+        user_id: UUID,
+        org_id: UUID,
+        group_by: Sequence[ExpenseGrouping],
+        filters: ExpenseFilter = ExpenseFilter(),
+    ) -> list[ExpenseAggregate]:
+        self._ensure_can_view(user_id, org_id)
+        return self._queries.aggregate_by_organization(org_id, group_by, filters)
+
+    def monthly_spend(
+        self,
+        user_id: UUID,
+        org_id: UUID,
+        month_from: Optional[date] = None,
+        month_to: Optional[date] = None,
+    ) -> list[ExpenseAggregate]:
+        self._ensure_can_view(user_id, org_id)
+        return self._queries.monthly_spend(org_id, month_from, month_to)
+
+    def report_for_period(
+        self, user_id: UUID, org_id: UUID, start: datetime, end: datetime
+    ) -> ExpenseReport:
+        """Breakdowns of the expenses dated from `start` until before `end`."""
+        self._ensure_can_view(user_id, org_id)
+        batch = self._queries.batch_by_organization(
+            org_id, ExpenseFilter(date_from=start, date_to=end)
+        )
+        return ExpenseReport.from_batch(batch, start, end)
+
+    # helper
+    def _ensure_can_view(self, user_id: UUID, org_id: UUID):
+        if not self._auth_service.can_view_organization_expenses(user_id, org_id):
+            raise expense_exception.NotPermitted("User is not permitted")
+
+    def _ensure_can_read(self, user_id: UUID, submitter_id: UUID, org_id: UUID):
+        # Submitters read their own expenses, whoever may view the organization all
+        if submitter_id != user_id:
+            self._ensure_can_view(user_id, org_id)
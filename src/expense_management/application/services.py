@@ -1,9 +1,18 @@
-from src.expense_management.domain.repository import IExpenseRepository
+from src.expense_management.domain.repository import (
+    IAsyncExpenseRepository,
+    IExpenseRepository,
+    IReceiptJobRepository,
+    IReceiptStore,
+    StoredReceipt,
+)
+from src.expense_management.domain import receipt as receipt_model
 from src.expense_management.domain import model as expense_model
 from src.expense_management.domain import exception as domain_expense
+import asyncio
+from dataclasses import dataclass, replace
 from uuid import UUID
 from datetime import datetime
-from typing import Optional, Protocol
+from typing import Any, Awaitable, Callable, Iterable, Mapping, Optional, Protocol
 from src.expense_management.application import expense_exception
 
 
@@ -20,15 +29,52 @@ class ExpenseAuthorizationContract(Protocol):
 
     def is_same_organization(self, user_id: UUID, org_id: UUID) -> bool: ...
 
+    def can_view_organization_expenses(self, user_id: UUID, org_id: UUID) -> bool:
+        """Checks if user may list all expenses of the organization"""
+        ...
+
+
+class AsyncExpenseAuthorizationContract(Protocol):
+    async def can_approve_expense(
+        self, submitter_id: UUID, approver_id: UUID, organization_id: UUID
+    ) -> bool: ...
+
+    async def can_submit_expense(self, user_id: UUID) -> bool: ...
+
+    async def is_approver(self, user_id: UUID) -> bool: ...
+
+    async def is_same_organization(self, user_id: UUID, org_id: UUID) -> bool: ...
+
+    async def can_view_organization_expenses(
+        self, user_id: UUID, org_id: UUID
+    ) -> bool: ...
+
+
+@dataclass(frozen=True)
+class ExpenseCommandResult:
+    """Outcome of a bulk command for one expense, `error` names the failed rule."""
+
+    expense_id: UUID
+    expense: Optional[expense_model.Expense] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
 
 class ExpenseApplicationService:
     def __init__(
         self,
         auth_service: ExpenseAuthorizationContract,
         expense_repo: IExpenseRepository,
+        receipt_store: Optional[IReceiptStore] = None,
+        receipt_jobs: Optional[IReceiptJobRepository] = None,
     ):
         self._auth_service = auth_service
         self._expense_repo = expense_repo
+        self._receipt_store = receipt_store
+        self._receipt_jobs = receipt_jobs
 
     def create_expense(
         self,
@@ -40,15 +86,19 @@ class ExpenseApplicationService:
         organization_id: UUID,
         notes: Optional[str] = None,
         document_reference: Optional[str] = None,
+        receipt: Optional[Iterable[bytes]] = None,
     ) -> expense_model.Expense:
-        # Build expense domain model
-
-        expense = expense_model.Expense(
+        """A `receipt` is stored first, `document_reference` becomes its SHA-256."""
+        if not self._auth_service.is_same_organization(submitter_id, organization_id):
+            raise expense_exception.NotPermitted
+        if receipt is not None:
+            document_reference = self._receipt_store.save(receipt).digest
+        expense = _build_expense(
             submitter_id=submitter_id,
             title=title,
             date=date,
             amount=amount,
-            category=expense_model.ExpenseCategory[category],
+            category=category,
             organization_id=organization_id,
             notes=notes,
             document_reference=document_reference,
@@ -58,25 +108,41 @@ class ExpenseApplicationService:
 
         return expense
 
-    def submit_expense(self, user_id: UUID, expense_id: UUID):
-        expense = self._expense_repo.get(expense_id=expense_id)
+    def create_expenses(
+        self, expenses: Iterable[Mapping[str, Any]]
+    ) -> list[ExpenseCommandResult]:
+        """Bulk variant of `create_expense`, each mapping holds its keyword arguments.
+
+        Expenses outside their submitter's organization are reported, not stored.
+        """
+        new_expenses = [_build_expense(**expense) for expense in expenses]
+        members = {
+            key: self._auth_service.is_same_organization(*key)
+            for key in set(map(_membership, new_expenses))
+        }
 
+        errors, valid = _created_errors(new_expenses, members)
+        self._expense_repo.save_many(valid)
+        return _bulk_results([expense.id for expense in new_expenses], errors, valid)
+
+    def submit_expense(self, user_id: UUID, expense_id: UUID):
         try:
-            expense.submit(user_id)
+            return self._expense_repo.submit(expense_id=expense_id, by=user_id)
         except domain_expense.InvalidSubmitUser:
             raise expense_exception.InvalidSubmitter
 
-        # Persist
-        self._expense_repo.save(expense)
-        return expense
+    def submit_expenses(
+        self, user_id: UUID, expense_ids: Iterable[UUID]
+    ) -> list[ExpenseCommandResult]:
+        return self._run_bulk(
+            expense_ids,
+            authorized=lambda expense: True,
+            transition=lambda expense: expense.submit(user_id),
+            persist=lambda ids: self._expense_repo.submit_many(ids, by=user_id),
+        )
 
     def withdraw_expense(self, user_id: UUID, expense_id: UUID):
-        expense = self._expense_repo.get(expense_id=expense_id)
-
-        expense.withdraw(user_id)
-
-        self._expense_repo.save(expense)
-        return expense
+        return self._expense_repo.withdraw(expense_id=expense_id, by=user_id)
 
     def approve_expense(self, user_id: UUID, expense_id: UUID):
         expense = self._expense_repo.get(expense_id=expense_id)
@@ -87,26 +153,327 @@ class ExpenseApplicationService:
         ):
             raise expense_exception.InvalidApprover
 
-        expense.approve(user_id)
+        # The repository re-checks the state, so concurrent approvals cannot both win
+        return self._expense_repo.approve(expense_id=expense_id, by=user_id)
 
-        self._expense_repo.save(expense)
-        return expense
+    def approve_expenses(
+        self, user_id: UUID, expense_ids: Iterable[UUID]
+    ) -> list[ExpenseCommandResult]:
+        permitted_organizations = {}
 
-    def revoke_approval(self, user_id: UUID, expense_id: UUID, reason: str):
-        expense = self._expense_repo.get(expense_id=expense_id)
+        def authorized(expense: expense_model.Expense) -> bool:
+            # Resolved once per organization, usually a single lookup per batch
+            org_id = expense.organization_id
+            if org_id not in permitted_organizations:
+                permitted_organizations[org_id] = (
+                    self._auth_service.can_view_organization_expenses(user_id, org_id)
+                )
+            return permitted_organizations[org_id]
 
-        expense.revoke(by=user_id, reason=reason)
+        return self._run_bulk(
+            expense_ids,
+            authorized=authorized,
+            transition=lambda expense: expense.approve(user_id),
+            persist=lambda ids: self._expense_repo.approve_many(ids, by=user_id),
+            unauthorized=expense_exception.InvalidApprover,
+        )
 
-        self._expense_repo.save(expense=expense)
-        return expense
+    def revoke_approval(self, user_id: UUID, expense_id: UUID, reason: str):
+        return self._expense_repo.revoke(
+            expense_id=expense_id, by=user_id, reason=reason
+        )
 
     def find_expenses_by_user(self, user_id: UUID) -> list[expense_model.Expense]:
         return self._expense_repo.find_by_user(user_id)
 
     def get_expenses_for_user_organization(self, user_id: UUID, org_id: UUID):
-        if not self._auth_service.is_approver(
-            user_id=user_id
-        ) or not self._auth_service.is_same_organization(user_id, org_id):
+        if not self._auth_service.can_view_organization_expenses(user_id, org_id):
             raise expense_exception.NotPermitted("User is not permitted")
 
         return self._expense_repo.find_by_organization(org_id=org_id)
+
+    def get_receipt(self, user_id: UUID, expense_id: UUID) -> StoredReceipt:
+        """The receipt of an expense, for its submitter and whoever may view it."""
+        return self._receipt_store.locate(self._receipt_of(user_id, expense_id))
+
+    def get_receipt_job(
+        self, user_id: UUID, expense_id: UUID
+    ) -> receipt_model.ReceiptJob:
+        """Processing state of the receipt, with its analysis once it succeeded."""
+        return self._receipt_jobs.get(self._receipt_of(user_id, expense_id))
+
+    # helper
+    def _receipt_of(self, user_id: UUID, expense_id: UUID) -> str:
+        expense = self._expense_repo.get(expense_id=expense_id)
+        if expense.submitter_id != user_id and not (
+            self._auth_service.can_view_organization_expenses(
+                user_id, expense.organization_id
+            )
+        ):
+            raise expense_exception.NotPermitted("User is not permitted")
+        if expense.document_reference is None:
+            raise expense_exception.NoReceipt
+        return expense.document_reference
+
+    def _run_bulk(
+        self,
+        expense_ids: Iterable[UUID],
+        authorized: Callable[[expense_model.Expense], bool],
+        transition: Callable[[expense_model.Expense], None],
+        persist: Callable[[list[UUID]], list[expense_model.Expense]],
+        unauthorized: type[Exception] = expense_exception.NotPermitted,
+    ) -> list[ExpenseCommandResult]:
+        """Check every expense on a loaded copy, then persist all valid ones at once."""
+        expense_ids = list(dict.fromkeys(expense_ids))
+        expenses = self._expense_repo.get_many(expense_ids)
+
+        errors = {}
+        for expense_id in expense_ids:
+            expense = expenses.get(expense_id)
+            errors[expense_id] = _bulk_error(
+                expense,
+                expense is not None and authorized(expense),
+                transition,
+                unauthorized,
+            )
+
+        valid_ids = [expense_id for expense_id in expense_ids if not errors[expense_id]]
+        return _bulk_results(expense_ids, errors, persist(valid_ids))
+
+
+class AsyncExpenseApplicationService:
+    """`ExpenseApplicationService` for async endpoints, waiting frees the event loop."""
+
+    def __init__(
+        self,
+        auth_service: AsyncExpenseAuthorizationContract,
+        expense_repo: IAsyncExpenseRepository,
+        receipt_store: Optional[IReceiptStore] = None,
+    ):
+        self._auth_service = auth_service
+        self._expense_repo = expense_repo
+        self._receipt_store = receipt_store
+
+    async def create_expense(
+        self,
+        submitter_id: UUID,
+        title: str,
+        date: datetime,
+        amount: float,
+        category: str,
+        organization_id: UUID,
+        notes: Optional[str] = None,
+        document_reference: Optional[str] = None,
+        receipt: Optional[Iterable[bytes]] = None,
+    ) -> expense_model.Expense:
+        if not await self._auth_service.is_same_organization(
+            submitter_id, organization_id
+        ):
+            raise expense_exception.NotPermitted
+        if receipt is not None:
+            document_reference = (
+                await asyncio.to_thread(self._receipt_store.save, receipt)
+            ).digest
+        expense = _build_expense(
+            submitter_id=submitter_id,
+            title=title,
+            date=date,
+            amount=amount,
+            category=category,
+            organization_id=organization_id,
+            notes=notes,
+            document_reference=document_reference,
+        )
+
+        await self._expense_repo.save(expense=expense)
+
+        return expense
+
+    async def create_expenses(
+        self, expenses: Iterable[Mapping[str, Any]]
+    ) -> list[ExpenseCommandResult]:
+        new_expenses = [_build_expense(**expense) for expense in expenses]
+        members = {
+            key: await self._auth_service.is_same_organization(*key)
+            for key in set(map(_membership, new_expenses))
+        }
+
+        errors, valid = _created_errors(new_expenses, members)
+        await self._expense_repo.save_many(valid)
+        return _bulk_results([expense.id for expense in new_expenses], errors, valid)
+
+    async def submit_expense(self, user_id: UUID, expense_id: UUID):
+        try:
+            return await self._expense_repo.submit(expense_id=expense_id, by=user_id)
+        except domain_expense.InvalidSubmitUser:
+            raise expense_exception.InvalidSubmitter
+
+    async def submit_expenses(
+        self, user_id: UUID, expense_ids: Iterable[UUID]
+    ) -> list[ExpenseCommandResult]:
+        async def authorized(expense: expense_model.Expense) -> bool:
+            return True
+
+        return await self._run_bulk(
+            expense_ids,
+            authorized=authorized,
+            transition=lambda expense: expense.submit(user_id),
+            persist=lambda ids: self._expense_repo.submit_many(ids, by=user_id),
+        )
+
+    async def withdraw_expense(self, user_id: UUID, expense_id: UUID):
+        return await self._expense_repo.withdraw(expense_id=expense_id, by=user_id)
+
+    async def approve_expense(self, user_id: UUID, expense_id: UUID):
+        expense = await self._expense_repo.get(expense_id=expense_id)
+
+        if not await self._auth_service.can_approve_expense(
+            expense.submitter_id, user_id, expense.organization_id
+        ):
+            raise expense_exception.InvalidApprover
+
+        return await self._expense_repo.approve(expense_id=expense_id, by=user_id)
+
+    async def approve_expenses(
+        self, user_id: UUID, expense_ids: Iterable[UUID]
+    ) -> list[ExpenseCommandResult]:
+        permitted_organizations = {}
+
+        async def authorized(expense: expense_model.Expense) -> bool:
+            org_id = expense.organization_id
+            if org_id not in permitted_organizations:
+                permitted_organizations[
+                    org_id
+                ] = await self._auth_service.can_view_organization_expenses(
+                    user_id, org_id
+                )
+            return permitted_organizations[org_id]
+
+        return await self._run_bulk(
+            expense_ids,
+            authorized=authorized,
+            transition=lambda expense: expense.approve(user_id),
+            persist=lambda ids: self._expense_repo.approve_many(ids, by=user_id),
+            unauthorized=expense_exception.InvalidApprover,
+        )
+
+    async def revoke_approval(self, user_id: UUID, expense_id: UUID, reason: str):
+        return await self._expense_repo.revoke(
+            expense_id=expense_id, by=user_id, reason=reason
+        )
+
+    async def find_expenses_by_user(self, user_id: UUID) -> list[expense_model.Expense]:
+        return await self._expense_repo.find_by_user(user_id)
+
+    async def get_expenses_for_user_organization(self, user_id: UUID, org_id: UUID):
+        if not await self._auth_service.can_view_organization_expenses(user_id, org_id):
+            raise expense_exception.NotPermitted("User is not permitted")
+
+        return await self._expense_repo.find_by_organization(org_id=org_id)
+
+    # helper
+    async def _run_bulk(
+        self,
+        expense_ids: Iterable[UUID],
+        authorized: Callable[[expense_model.Expense], Awaitable[bool]],
+        transition: Callable[[expense_model.Expense], None],
+        persist: Callable[[list[UUID]], Awaitable[list[expense_model.Expense]]],
+        unauthorized: type[Exception] = expense_exception.NotPermitted,
+    ) -> list[ExpenseCommandResult]:
+        expense_ids = list(dict.fromkeys(expense_ids))
+        expenses = await self._expense_repo.get_many(expense_ids)
+
+        errors = {}
+        for expense_id in expense_ids:
+            expense = expenses.get(expense_id)
+            errors[expense_id] = _bulk_error(
+                expense,
+                expense is not None and await authorized(expense),
+                transition,
+                unauthorized,
+            )
+
+        valid_ids = [expense_id for expense_id in expense_ids if not errors[expense_id]]
+        return _bulk_results(expense_ids, errors, await persist(valid_ids))
+
+
+def _bulk_error(
+    expense: Optional[expense_model.Expense],
+    authorized: bool,
+    transition: Callable[[expense_model.Expense], None],
+    unauthorized: type[Exception],
+) -> Optional[str]:
+    """Name of the rule a bulk command breaks for one expense, None if it passes."""
+    if expense is None:
+        return "NoExpenseFound"
+    if not authorized:
+        return unauthorized.__name__
+    try:
+        transition(replace(expense))
+    except domain_expense.ExpenseRuleViolation as error:
+        return type(error).__name__
+    return None
+
+
+def _membership(expense: expense_model.Expense) -> tuple[UUID, UUID]:
+    return expense.submitter_id, expense.organization_id
+
+
+def _created_errors(
+    new_expenses: list[expense_model.Expense],
+    members: dict[tuple[UUID, UUID], bool],
+) -> tuple[dict[UUID, Optional[str]], list[expense_model.Expense]]:
+    """Errors of new expenses by id, and the expenses that passed."""
+    errors = {
+        expense.id: _bulk_error(
+            expense,
+            members[_membership(expense)],
+            transition=lambda expense: None,
+            unauthorized=expense_exception.NotPermitted,
+        )
+        for expense in new_expenses
+    }
+    return errors, [expense for expense in new_expenses if not errors[expense.id]]
+
+
+def _bulk_results(
+    expense_ids: list[UUID],
+    errors: dict[UUID, Optional[str]],
+    persisted: list[expense_model.Expense],
+) -> list[ExpenseCommandResult]:
+    persisted = {expense.id: expense for expense in persisted}
+    return [
+        ExpenseCommandResult(expense_id, expense=persisted[expense_id])
+        if expense_id in persisted
+        else ExpenseCommandResult(
+            expense_id,
+            error=errors[expense_id] or domain_expense.ConcurrentModification.__name__,
+        )
+        for expense_id in expense_ids
+    ]
+
+
+def _build_expense(
+    submitter_id: UUID,
+    title: str,
+    date: datetime,
+    amount: float,
+    category: str,
+    organization_id: UUID,
+    notes: Optional[str] = None,
+    document_reference: Optional[str] = None,
+) -> expense_model.Expense:
+    try:
+        expense_category = expense_model.ExpenseCategory[category]
+    except KeyError:
+        raise expense_exception.InvalidCategory(category)
+    return expense_model.Expense(
+        submitter_id=submitter_id,
+        title=title,
+        date=date,
+        amount=amount,
+        category=expense_category,
+        organization_id=organization_id,
+        notes=notes,
+        document_reference=document_reference,
+    )
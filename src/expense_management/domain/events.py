@@ -0,0 +1,34 @@
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from uuid import UUID, uuid4
+
+
+@dataclass(frozen=True, kw_only=True)
+class ExpenseEvent:
+    """Something that happened to an expense, recorded by the aggregate."""
+
+    expense_id: UUID
+    organization_id: UUID
+    by: UUID
+    id: UUID = field(default_factory=uuid4)
+    occurred_at: datetime = field(default_factory=lambda: datetime.now(UTC))
+
+
+@dataclass(frozen=True, kw_only=True)
+class ExpenseSubmitted(ExpenseEvent):
+    pass
+
+
+@dataclass(frozen=True, kw_only=True)
+class ExpenseApproved(ExpenseEvent):
+    pass
+
+
+@dataclass(frozen=True, kw_only=True)
+class ExpenseWithdrawn(ExpenseEvent):
+    pass
+
+
+@dataclass(frozen=True, kw_only=True)
+class ExpenseApprovalRevoked(ExpenseEvent):
+    reason: str
@@ -1,34 +1,46 @@
-class InvalidSubmitUser(Exception):
+class ExpenseRuleViolation(Exception):
+    """Base of all errors raised when an expense rule is violated."""
+
+
+class InvalidSubmitUser(ExpenseRuleViolation):
+    pass
+
+
+class ExpenseNotSubmitted(ExpenseRuleViolation):
+    pass
+
+
+class InvalidApprover(ExpenseRuleViolation):
     pass
 
 
-class ExpenseNotSubmitted(Exception):
+class ExpenseNotDraft(ExpenseRuleViolation):
     pass
 
 
-class InvalidApprover(Exception):
+class InvalidWithdrawUser(ExpenseRuleViolation):
     pass
 
 
-class ExpenseNotDraft(Exception):
+class InvalidWithdrawState(ExpenseRuleViolation):
     pass
 
 
-class InvalidWithdrawUser(Exception):
+class InvalidRevokeState(ExpenseRuleViolation):
     pass
 
 
-class InvalidWithdrawState(Exception):
+class InvalidRevokeUser(ExpenseRuleViolation):
     pass
 
 
-class InvalidRevokeState(Exception):
+class MissingReason(ExpenseRuleViolation):
     pass
 
 
-class InvalidRevokeUser(Exception):
+class ConcurrentModification(Exception):
     pass
 
 
-class MissingReason(Exception):
+class ExpenseVersionConflict(ConcurrentModification):
     pass
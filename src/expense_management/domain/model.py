@@ -1,10 +1,14 @@
+from array import array
+from bisect import bisect_left, bisect_right
 from datetime import datetime
+from itertools import accumulate
 from dateutil.relativedelta import relativedelta
-from typing import Optional
+from typing import Iterable, Optional
 from enum import Enum, auto
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from uuid import uuid4, UUID
 import src.expense_management.domain.exception as exception
+import src.expense_management.domain.events as events
 
 
 class ExpenseState(Enum):
@@ -14,12 +18,22 @@ class ExpenseState(Enum):
     WITHDRAWN = auto()
     REVOKED = auto()
 
+    @property
+    def code(self) -> int:
+        """Dense index from 0, for array based reports."""
+        return self.value - 1
+
 
 class ExpenseCategory(Enum):
     OFFICE_SUPPLIES = auto()
 
+    @property
+    def code(self) -> int:
+        """Dense index from 0, for array based reports."""
+        return self.value - 1
 
-@dataclass(kw_only=True)
+
+@dataclass(kw_only=True, slots=True)
 class Expense:
     id: UUID = field(default_factory=uuid4)
     submitter_id: UUID
@@ -34,6 +48,68 @@ class Expense:
     approved_by_id: Optional[UUID] = None
     decline_reason: Optional[str] = None
     revoke_reason: Optional[str] = None
+    # Bumped by every write of the stored row, saves of an older version conflict
+    version: int = 0
+    # Change tracking, values of fields as they were when last persisted. The dict
+    # is only allocated on the first change, most loaded expenses never get one
+    _persisted: bool = field(default=False, init=False, repr=False, compare=False)
+    _original: Optional[dict] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    # Events recorded since the last `pull_events`, allocated on the first one too
+    _events: Optional[list[events.ExpenseEvent]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_persisted", False) and not name.startswith("_"):
+            if self._original is None:
+                object.__setattr__(self, "_original", {})
+            self._original.setdefault(name, getattr(self, name))
+        object.__setattr__(self, name, value)
+
+    @property
+    def is_persisted(self) -> bool:
+        return self._persisted
+
+    @property
+    def changed_fields(self) -> frozenset[str]:
+        """Fields whose value differs from the last persisted state."""
+        return frozenset(
+            name
+            for name, value in (self._original or {}).items()
+            if getattr(self, name) != value
+        )
+
+    def persisted_value(self, name: str):
+        """Value of a field as it was when last persisted."""
+        return (self._original or {}).get(name, getattr(self, name))
+
+    def mark_persisted(self, version: Optional[int] = None):
+        self._persisted = True
+        self._original = None
+        if version is not None:
+            # Set by the repository, not a change to track
+            object.__setattr__(self, "version", version)
+
+    @classmethod
+    def from_persisted(cls, *values) -> "Expense":
+        """Rebuild a stored expense from its field values in declaration order.
+
+        Skips `__init__` and the change tracking of `__setattr__`, for bulk reads.
+        """
+        expense = cls.__new__(cls)
+        for name, value in zip(EXPENSE_FIELDS, values, strict=True):
+            object.__setattr__(expense, name, value)
+        object.__setattr__(expense, "_persisted", True)
+        object.__setattr__(expense, "_original", None)
+        object.__setattr__(expense, "_events", None)
+        return expense
+
+    def pull_events(self) -> list[events.ExpenseEvent]:
+        """Recorded events in order, the aggregate forgets them."""
+        recorded, self._events = self._events or [], None
+        return recorded
 
     def submit(self, by: UUID):
         if not self._ensure(self.submitter_id == by):
@@ -43,6 +119,7 @@ class Expense:
             raise exception.ExpenseNotDraft
 
         self.state = ExpenseState.SUBMITTED
+        self._record(events.ExpenseSubmitted, by=by)
 
     def approve(self, by: UUID):
         if not self._ensure(self.state == ExpenseState.SUBMITTED):
@@ -53,6 +130,7 @@ class Expense:
 
         self.approved_by_id = by
         self.state = ExpenseState.APPROVED
+        self._record(events.ExpenseApproved, by=by)
 
     def withdraw(self, by: UUID):
         if not self._ensure(self.submitter_id == by):
@@ -62,6 +140,7 @@ class Expense:
             raise exception.InvalidWithdrawState
 
         self.state = ExpenseState.WITHDRAWN
+        self._record(events.ExpenseWithdrawn, by=by)
 
     def revoke(self, by: UUID, reason: str):
         if not reason:
@@ -75,12 +154,86 @@ class Expense:
 
         self.revoke_reason = reason
         self.state = ExpenseState.REVOKED
+        self._record(events.ExpenseApprovalRevoked, by=by, reason=reason)
 
     # helper
+    def _record(self, event_type: type[events.ExpenseEvent], **details):
+        if self._events is None:
+            self._events = []
+        self._events.append(
+            event_type(
+                expense_id=self.id, organization_id=self.organization_id, **details
+            )
+        )
+
     def _ensure(self, condition) -> bool:
         return condition
 
 
+EXPENSE_FIELDS = tuple(
+    expense_field.name
+    for expense_field in fields(Expense)
+    if not expense_field.name.startswith("_")
+)
+
+
+@dataclass(slots=True)
+class ExpenseBatch:
+    """Columnar expenses for analytics, index `i` of every column is one expense.
+
+    Amounts are packed doubles, far smaller than as many `Expense` objects.
+    """
+
+    ids: list[UUID] = field(default_factory=list)
+    dates: list[datetime] = field(default_factory=list)
+    amounts: array = field(default_factory=lambda: array("d"))
+    states: list[ExpenseState] = field(default_factory=list)
+    categories: list[ExpenseCategory] = field(default_factory=list)
+    submitter_ids: list[UUID] = field(default_factory=list)
+
+    @classmethod
+    def from_expenses(cls, expenses: Iterable[Expense]) -> "ExpenseBatch":
+        batch = cls()
+        for expense in expenses:
+            batch.append(
+                expense.id,
+                expense.date,
+                expense.amount,
+                expense.state,
+                expense.category,
+                expense.submitter_id,
+            )
+        return batch
+
+    def append(
+        self,
+        id: UUID,
+        date: datetime,
+        amount: float,
+        state: ExpenseState,
+        category: ExpenseCategory,
+        submitter_id: UUID,
+    ):
+        self.ids.append(id)
+        self.dates.append(date)
+        self.amounts.append(amount)
+        self.states.append(state)
+        self.categories.append(category)
+        self.submitter_ids.append(submitter_id)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def total(self) -> float:
+        return sum(self.amounts)
+
+    def totals_by_state(self) -> dict[ExpenseState, float]:
+        totals = {}
+        for state, amount in zip(self.states, self.amounts):
+            totals[state] = totals.get(state, 0.0) + amount
+        return totals
+
+
 class Period:
     def __init__(
         self,
@@ -96,21 +249,55 @@ class Period:
         self._end = end
         self._inital_balance = initial_balance
         self._expenses = []
+        self._total = 0.0
+        # Expense dates in ascending order, amounts and their prefix sums alike
+        self._dates: list[datetime] = []
+        self._amounts: list[float] = []
+        self._prefix_sums: list[float] = [0.0]
+        self._prefix_sums_stale = False
 
     @property
-    def expenses(
-        self, start: Optional[datetime] = None, end: Optional[datetime] = None
-    ) -> float:
-        if not start or not end:
-            return sum(expense.amount for expense in self._expenses)
-        filtered = filter(
-            lambda x: x.expense_date >= start and x.expense_date <= end, self._expenses
-        )
-        return sum(expense.amount for expense in filtered)
+    def start(self) -> datetime:
+        return self._start
+
+    @property
+    def end(self) -> datetime:
+        return self._end
+
+    @property
+    def expenses(self) -> float:
+        """Total amount of all expenses in the period."""
+        return self._total
 
     @property
     def balance(self) -> float:
-        return self._inital_balance - self.expenses
+        return self._inital_balance - self._total
+
+    def expenses_between(self, start: datetime, end: datetime) -> float:
+        """Total amount of the expenses dated from `start` to `end`, both inclusive."""
+        if self._prefix_sums_stale:
+            self._prefix_sums = [0.0, *accumulate(self._amounts)]
+            self._prefix_sums_stale = False
+
+        first = bisect_left(self._dates, start)
+        last = bisect_right(self._dates, end)
+        if first >= last:
+            return 0.0
+        return self._prefix_sums[last] - self._prefix_sums[first]
+
+    def to_batch(self) -> ExpenseBatch:
+        """The expenses of the period as columns, e.g. for an `ExpenseReport`."""
+        return ExpenseBatch.from_expenses(self._expenses)
 
     def add_expense(self, expense: Expense):
         self._expenses.append(expense)
+        self._total += expense.amount
+
+        index = bisect_right(self._dates, expense.date)
+        self._dates.insert(index, expense.date)
+        self._amounts.insert(index, expense.amount)
+        if index == len(self._amounts) - 1 and not self._prefix_sums_stale:
+            # Expenses mostly arrive in date order, extending the sums is enough
+            self._prefix_sums.append(self._prefix_sums[-1] + expense.amount)
+        else:
+            self._prefix_sums_stale = True
@@ -0,0 +1,55 @@
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum, auto
+from typing import Optional
+
+
+class ReceiptJobState(Enum):
+    QUEUED = auto()
+    RUNNING = auto()
+    SUCCEEDED = auto()
+    FAILED = auto()
+
+
+@dataclass(frozen=True, kw_only=True)
+class ReceiptAnalysis:
+    """What the receipt pipeline extracted from one stored receipt."""
+
+    media_type: str
+    size: int
+    width: Optional[int] = None
+    height: Optional[int] = None
+    page_count: Optional[int] = None
+    text: Optional[str] = None
+    thumbnail_reference: Optional[str] = None
+
+
+@dataclass(kw_only=True)
+class ReceiptJob:
+    """Processing of the receipt stored as `document_reference`.
+
+    A claimed job is leased until `available_at`, a worker that dies meanwhile
+    leaves it to be claimed again once the lease ran out.
+    """
+
+    document_reference: str
+    state: ReceiptJobState = ReceiptJobState.QUEUED
+    attempts: int = 0
+    available_at: datetime
+    last_error: Optional[str] = None
+    finished_at: Optional[datetime] = None
+    analysis: Optional[ReceiptAnalysis] = None
+
+
+@dataclass(frozen=True)
+class ReceiptJobStats:
+    counts: dict[ReceiptJobState, int]
+    finished: int
+    window_seconds: float
+
+    @property
+    def throughput(self) -> float:
+        """Jobs finished per second over the window."""
+        if self.window_seconds <= 0:
+            return 0.0
+        return self.finished / self.window_seconds
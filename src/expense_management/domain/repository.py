@@ -1,13 +1,210 @@
-from typing import Protocol
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import AsyncIterator, Collection, Iterable, Iterator, Optional, Protocol
 from uuid import UUID
 from src.expense_management.domain import model as expense_model
+from src.expense_management.domain import receipt as receipt_model
+
+
+@dataclass(frozen=True, kw_only=True)
+class ExpenseFilter:
+    """Optional criteria for listings, `date_from` is inclusive, `date_to` exclusive."""
+
+    states: Optional[Collection[expense_model.ExpenseState]] = None
+    categories: Optional[Collection[expense_model.ExpenseCategory]] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+
+    def matches(self, expense: expense_model.Expense) -> bool:
+        return (
+            (self.states is None or expense.state in self.states)
+            and (self.categories is None or expense.category in self.categories)
+            and (self.date_from is None or expense.date >= self.date_from)
+            and (self.date_to is None or expense.date < self.date_to)
+        )
+
+
+@dataclass(frozen=True)
+class ExpenseCursor:
+    """Keyset position, listings are ordered by `(date, id)`."""
+
+    date: datetime
+    id: UUID
+
+    @classmethod
+    def after(cls, expense: expense_model.Expense) -> "ExpenseCursor":
+        return cls(date=expense.date, id=expense.id)
+
+
+@dataclass(frozen=True)
+class ExpensePage:
+    items: list[expense_model.Expense]
+    next_cursor: Optional[ExpenseCursor] = None
+
+
+@dataclass(frozen=True)
+class StoredReceipt:
+    """A receipt file, `digest` is the hex SHA-256 of its content."""
+
+    digest: str
+    size: int
+    path: Path
+
+
+class IReceiptStore(Protocol):
+    def save(self, chunks: Iterable[bytes]) -> StoredReceipt:
+        """Stores the content once, saving the same bytes again returns the same file"""
+        ...
+
+    def locate(self, digest: str) -> StoredReceipt: ...
+
+
+class IReceiptJobRepository(Protocol):
+    def get(self, document_reference: str) -> receipt_model.ReceiptJob: ...
+
+    def claim(
+        self, limit: int, now: datetime, lease: timedelta
+    ) -> list[receipt_model.ReceiptJob]:
+        """Leases up to `limit` due jobs to the caller, counting an attempt for each"""
+        ...
+
+    def complete(
+        self, job: receipt_model.ReceiptJob, analysis: receipt_model.ReceiptAnalysis
+    ) -> bool:
+        """Records the result of the claimed `job`, False if it was claimed again since"""
+        ...
+
+    def fail(
+        self,
+        job: receipt_model.ReceiptJob,
+        error: str,
+        retry_at: Optional[datetime] = None,
+    ) -> bool:
+        """Queues the claimed `job` again at `retry_at`, without one it has failed for
+        good. False if it was claimed again since, the failure is then dropped"""
+        ...
+
+    def stats(self, since: datetime, until: datetime) -> receipt_model.ReceiptJobStats:
+        """Jobs per state, and how many finished between `since` and `until`"""
+        ...
 
 
 class IExpenseRepository(Protocol):
     def get(self, expense_id: UUID) -> expense_model.Expense: ...
 
+    def get_many(
+        self, expense_ids: Collection[UUID]
+    ) -> dict[UUID, expense_model.Expense]: ...
+
     def save(self, expense: expense_model.Expense) -> None: ...
 
+    def save_many(self, expenses: Iterable[expense_model.Expense]) -> None: ...
+
+    def submit(self, expense_id: UUID, by: UUID) -> expense_model.Expense: ...
+
+    def approve(self, expense_id: UUID, by: UUID) -> expense_model.Expense: ...
+
+    def submit_many(
+        self, expense_ids: Collection[UUID], by: UUID
+    ) -> list[expense_model.Expense]: ...
+
+    def approve_many(
+        self, expense_ids: Collection[UUID], by: UUID
+    ) -> list[expense_model.Expense]: ...
+
+    def withdraw(self, expense_id: UUID, by: UUID) -> expense_model.Expense: ...
+
+    def revoke(
+        self, expense_id: UUID, by: UUID, reason: str
+    ) -> expense_model.Expense: ...
+
     def find_by_organization(self, org_id: UUID) -> list[expense_model.Expense]: ...
 
     def find_by_user(self, user_id: UUID) -> list[expense_model.Expense]: ...
+
+    def find_page_by_organization(
+        self,
+        org_id: UUID,
+        filters: ExpenseFilter = ExpenseFilter(),
+        after: Optional[ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> ExpensePage: ...
+
+    def find_page_by_user(
+        self,
+        user_id: UUID,
+        filters: ExpenseFilter = ExpenseFilter(),
+        after: Optional[ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> ExpensePage: ...
+
+    def stream_by_organization(
+        self, org_id: UUID, filters: ExpenseFilter = ExpenseFilter()
+    ) -> Iterator[expense_model.Expense]: ...
+
+    def stream_by_user(
+        self, user_id: UUID, filters: ExpenseFilter = ExpenseFilter()
+    ) -> Iterator[expense_model.Expense]: ...
+
+
+class IAsyncExpenseRepository(Protocol):
+    """`IExpenseRepository` for the event loop, streams are async iterators."""
+
+    async def get(self, expense_id: UUID) -> expense_model.Expense: ...
+
+    async def get_many(
+        self, expense_ids: Collection[UUID]
+    ) -> dict[UUID, expense_model.Expense]: ...
+
+    async def save(self, expense: expense_model.Expense) -> None: ...
+
+    async def save_many(self, expenses: Iterable[expense_model.Expense]) -> None: ...
+
+    async def submit(self, expense_id: UUID, by: UUID) -> expense_model.Expense: ...
+
+    async def approve(self, expense_id: UUID, by: UUID) -> expense_model.Expense: ...
+
+    async def submit_many(
+        self, expense_ids: Collection[UUID], by: UUID
+    ) -> list[expense_model.Expense]: ...
+
+    async def approve_many(
+        self, expense_ids: Collection[UUID], by: UUID
+    ) -> list[expense_model.Expense]: ...
+
+    async def withdraw(self, expense_id: UUID, by: UUID) -> expense_model.Expense: ...
+
+    async def revoke(
+        self, expense_id: UUID, by: UUID, reason: str
+    ) -> expense_model.Expense: ...
+
+    async def find_by_organization(
+        self, org_id: UUID
+    ) -> list[expense_model.Expense]: ...
+
+    async def find_by_user(self, user_id: UUID) -> list[expense_model.Expense]: ...
+
+    async def find_page_by_organization(
+        self,
+        org_id: UUID,
+        filters: ExpenseFilter = ExpenseFilter(),
+        after: Optional[ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> ExpensePage: ...
+
+    async def find_page_by_user(
+        self,
+        user_id: UUID,
+        filters: ExpenseFilter = ExpenseFilter(),
+        after: Optional[ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> ExpensePage: ...
+
+    def stream_by_organization(
+        self, org_id: UUID, filters: ExpenseFilter = ExpenseFilter()
+    ) -> AsyncIterator[expense_model.Expense]: ...
+
+    def stream_by_user(
+        self, user_id: UUID, filters: ExpenseFilter = ExpenseFilter()
+    ) -> AsyncIterator[expense_model.Expense]: ...
@@ -1,2 +1,14 @@
 class NoExpenseFound(Exception):
     pass
+
+
+class NoReceiptFound(Exception):
+    pass
+
+
+class NoReceiptJobFound(Exception):
+    pass
+
+
+class CorruptReceipt(Exception):
+    pass
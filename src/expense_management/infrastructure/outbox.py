@@ -0,0 +1,200 @@
+"""Dispatch of the expense events the repositories wrote to the outbox.
+
+Run a dispatcher with `python -m src.expense_management.infrastructure.outbox`,
+any number of them can drain the outbox side by side.
+"""
+
+import argparse
+import json
+import logging
+import signal
+import threading
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime, timedelta
+from typing import Callable, Optional
+from uuid import UUID
+
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.orm import Session
+
+from src._shared.infrastructure import orm
+from src._shared.infrastructure.database import session_factory
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class OutboxMessage:
+    id: UUID
+    event_type: str
+    expense_id: UUID
+    organization_id: UUID
+    occurred_at: datetime
+    payload: dict
+
+    @classmethod
+    def from_orm(cls, message_orm: orm.OutboxMessageORM) -> "OutboxMessage":
+        return cls(
+            id=message_orm.id,
+            event_type=message_orm.event_type,
+            expense_id=message_orm.expense_id,
+            organization_id=message_orm.organization_id,
+            occurred_at=message_orm.occurred_at,
+            payload=message_orm.payload,
+        )
+
+
+@dataclass(frozen=True)
+class DeadLetter:
+    """A message the dispatcher gave up on, with why publishing it failed."""
+
+    message: OutboxMessage
+    attempts: int
+    last_error: str
+    dead_at: datetime
+
+
+class OutboxDispatcher:
+    """Hands pending messages to `publish`, one batch per transaction.
+
+    A batch is selected FOR UPDATE SKIP LOCKED, so concurrent dispatchers take the
+    next rows instead of waiting on each other. Delivery is at least once: a crash
+    between publishing and the commit publishes the batch again, consumers dedupe
+    on the message id. A message `publish` raised for is retried with exponential
+    backoff from `retry_delay` on. Once it used up `max_attempts` it is dead: it is
+    not dispatched anymore and kept for inspection, see `dead_letters`.
+    """
+
+    def __init__(
+        self,
+        session: Session,
+        publish: Callable[[OutboxMessage], None],
+        batch_size: int = 100,
+        max_attempts: int = 5,
+        retry_delay: timedelta = timedelta(seconds=30),
+        clock: Callable[[], datetime] = lambda: datetime.now(UTC),
+    ):
+        self._session = session
+        self._publish = publish
+        self._batch_size = batch_size
+        self._max_attempts = max_attempts
+        self._retry_delay = retry_delay
+        self._clock = clock
+
+    def dispatch_batch(self) -> int:
+        """Publishes the oldest due messages and returns how many went out."""
+        message = orm.OutboxMessageORM
+        now = self._clock()
+        pending = self._session.scalars(
+            select(message)
+            .where(message.dispatched_at.is_(None), message.dead_at.is_(None))
+            .where(message.available_at <= now)
+            .order_by(message.occurred_at)
+            .limit(self._batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+
+        dispatched = []
+        for message_orm in pending:
+            try:
+                self._publish(OutboxMessage.from_orm(message_orm))
+            except Exception as error:
+                self._failed(message_orm, f"{type(error).__name__}: {error}", now)
+            else:
+                dispatched.append(message_orm.id)
+
+        if dispatched:
+            self._session.execute(
+                update(message)
+                .where(message.id.in_(dispatched))
+                .values(dispatched_at=now),
+                execution_options={"synchronize_session": False},
+            )
+        self._session.commit()
+        return len(dispatched)
+
+    def run(self, stop: threading.Event, poll_interval: float = 1.0):
+        """Drains the outbox until `stop` is set, polling once it ran dry."""
+        while not stop.is_set():
+            if not self.dispatch_batch():
+                stop.wait(poll_interval)
+
+    def dead_letters(self, limit: int = 100) -> list[DeadLetter]:
+        """The messages given up on, the most recent first."""
+        message = orm.OutboxMessageORM
+        dead = self._session.scalars(
+            select(message)
+            .where(message.dead_at.is_not(None))
+            .order_by(message.dead_at.desc())
+            .limit(limit)
+        )
+        return [
+            DeadLetter(
+                message=OutboxMessage.from_orm(message_orm),
+                attempts=message_orm.attempts,
+                last_error=message_orm.last_error,
+                dead_at=message_orm.dead_at,
+            )
+            for message_orm in dead
+        ]
+
+    def purge(self, before: datetime, dead_before: Optional[datetime] = None) -> int:
+        """Deletes the messages dispatched before `before`.
+
+        Dead messages are kept, unless `dead_before` is given: then the ones given
+        up on before it are deleted too.
+        """
+        message = orm.OutboxMessageORM
+        purged = message.dispatched_at < before
+        if dead_before is not None:
+            purged = or_(purged, message.dead_at < dead_before)
+        result = self._session.execute(delete(message).where(purged))
+        self._session.commit()
+        return result.rowcount
+
+    # helper
+    def _failed(self, message_orm: orm.OutboxMessageORM, error: str, now: datetime):
+        message_orm.attempts += 1
+        message_orm.last_error = error
+        if message_orm.attempts >= self._max_attempts:
+            message_orm.dead_at = now
+            logger.warning(
+                "Outbox message %s dead after %s attempts: %s",
+                message_orm.id,
+                message_orm.attempts,
+                error,
+            )
+        else:
+            backoff = self._retry_delay * 2 ** (message_orm.attempts - 1)
+            message_orm.available_at = now + backoff
+
+
+def log_message(message: OutboxMessage):
+    """Publishes to the log, as the audit trail of expense changes."""
+    logger.info(json.dumps(asdict(message), default=str))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument(
+        "--once", action="store_true", help="dispatch the pending messages, then exit"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+
+    with session_factory()() as session:
+        dispatcher = OutboxDispatcher(session, log_message, batch_size=args.batch_size)
+        if args.once:
+            while dispatcher.dispatch_batch():
+                pass
+        else:
+            dispatcher.run(stop)
+
+
+if __name__ == "__main__":
+    main()
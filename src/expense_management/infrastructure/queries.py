@@ -0,0 +1,526 @@
+import hashlib
+from collections import defaultdict
+from dataclasses import astuple
+from datetime import date
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import Select, func, or_, select
+from sqlalchemy.orm import Session
+
+from src._shared.infrastructure import orm
+from src._shared.infrastructure.database import (
+    REPLICA_READ,
+    as_date,
+    month_start,
+    replica_read,
+)
+from src.expense_management.application import queries
+from src.expense_management.domain import model as expense_model
+from src.expense_management.domain.repository import ExpenseCursor, ExpenseFilter
+from src.expense_management.infrastructure import exception
+from src.expense_management.infrastructure.repository import (
+    after_clause,
+    filter_clauses,
+)
+
+_expenses = orm.ExpenseORM.__table__
+_EXPENSE_COLUMNS = [_expenses.c[name] for name in expense_model.EXPENSE_FIELDS]
+_ROW_COLUMNS = [_expenses.c[name] for name in queries.ExpenseRow._fields]
+_organizations = orm.OrganizationORM.__table__
+_submitters = orm.UserORM.__table__.alias("submitter")
+_approvers = orm.UserORM.__table__.alias("approver")
+_LIST_COLUMNS = [
+    _expenses.c.id,
+    _expenses.c.date,
+    _expenses.c.title,
+    _expenses.c.amount,
+    _expenses.c.category,
+    _expenses.c.state,
+    _expenses.c.organization_id,
+    _organizations.c.name,
+    _expenses.c.submitter_id,
+    _submitters.c.name,
+    _expenses.c.approved_by_id,
+    _approvers.c.name,
+]
+_BATCH_COLUMNS = [
+    _expenses.c.id,
+    _expenses.c.date,
+    _expenses.c.amount,
+    _expenses.c.state,
+    _expenses.c.category,
+    _expenses.c.submitter_id,
+]
+
+
+class SqlAlchemyExpenseQueries(queries.IExpenseQueries):
+    """Reports and read-only listings on Core, no ORM instances or identity map.
+
+    Reports and exports may be served by the replica. Single expenses and the list
+    pages, which show a user's own changes right away, are read from the primary.
+    """
+
+    def __init__(self, session: Session, batch_size: int = 1000):
+        self._session = session
+        self._batch_size = batch_size
+
+    def stamp_by_id(self, expense_id: UUID) -> queries.ExpenseStamp:
+        row = self._execute(
+            select(
+                _expenses.c.submitter_id,
+                _expenses.c.organization_id,
+                _expenses.c.version,
+            ).where(_expenses.c.id == expense_id)
+        ).one_or_none()
+        if row is None:
+            raise exception.NoExpenseFound
+        return queries.ExpenseStamp(row[0], row[1], _tag(row[2]))
+
+    def expense_by_id(self, expense_id: UUID) -> queries.TaggedExpense:
+        row = self._execute(
+            select(*_EXPENSE_COLUMNS).where(_expenses.c.id == expense_id)
+        ).one_or_none()
+        if row is None:
+            raise exception.NoExpenseFound
+        expense = expense_model.Expense.from_persisted(*row)
+        return queries.TaggedExpense(expense, _tag(expense.version))
+
+    def expenses_by_organization(
+        self, org_id: UUID, filters: ExpenseFilter = ExpenseFilter()
+    ) -> list[expense_model.Expense]:
+        rows = self._report(_organization_listing(_EXPENSE_COLUMNS, org_id, filters))
+        return [expense_model.Expense.from_persisted(*row) for row in rows]
+
+    def rows_by_organization(
+        self, org_id: UUID, filters: ExpenseFilter = ExpenseFilter()
+    ) -> list[queries.ExpenseRow]:
+        rows = self._report(_organization_listing(_ROW_COLUMNS, org_id, filters))
+        return [queries.ExpenseRow._make(row) for row in rows]
+
+    def list_page_by_organization(
+        self,
+        org_id: UUID,
+        filters: ExpenseFilter = ExpenseFilter(),
+        after: Optional[ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> queries.ExpenseListPage:
+        owner = _expenses.c.organization_id == org_id
+        return _to_list_page(
+            self._execute(_list_page_query(owner, filters, after, limit)).all(), limit
+        )
+
+    def list_page_by_user(
+        self,
+        user_id: UUID,
+        filters: ExpenseFilter = ExpenseFilter(),
+        after: Optional[ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> queries.ExpenseListPage:
+        owner = _owned_by_user(user_id)
+        return _to_list_page(
+            self._execute(_list_page_query(owner, filters, after, limit)).all(), limit
+        )
+
+    def list_tag_by_organization(
+        self,
+        org_id: UUID,
+        filters: ExpenseFilter = ExpenseFilter(),
+        after: Optional[ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> str:
+        owner = _expenses.c.organization_id == org_id
+        return _list_tag(self._execute(_list_tag_query(owner, filters, after, limit)))
+
+    def list_tag_by_user(
+        self,
+        user_id: UUID,
+        filters: ExpenseFilter = ExpenseFilter(),
+        after: Optional[ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> str:
+        owner = _owned_by_user(user_id)
+        return _list_tag(self._execute(_list_tag_query(owner, filters, after, limit)))
+
+    def batch_by_organization(
+        self, org_id: UUID, filters: ExpenseFilter = ExpenseFilter()
+    ) -> expense_model.ExpenseBatch:
+        batch = expense_model.ExpenseBatch()
+        for row in self._report(_organization_listing(_BATCH_COLUMNS, org_id, filters)):
+            batch.append(*row)
+        return batch
+
+    def stream_rows_by_organization(
+        self, org_id: UUID, filters: ExpenseFilter = ExpenseFilter()
+    ) -> Iterator[queries.ExpenseRow]:
+        # Server side cursor, `batch_size` rows are buffered at a time
+        stmt = _organization_listing(_ROW_COLUMNS, org_id, filters)
+        result = self._report(stmt.execution_options(yield_per=self._batch_size))
+        for partition in result.partitions():
+            yield from map(queries.ExpenseRow._make, partition)
+
+    def aggregate_by_organization(
+        self,
+        org_id: UUID,
+        group_by: Sequence[queries.ExpenseGrouping],
+        filters: ExpenseFilter = ExpenseFilter(),
+    ) -> list[queries.ExpenseAggregate]:
+        keys = [self._group_column(grouping) for grouping in group_by]
+        stmt = (
+            select(
+                *keys,
+                func.sum(orm.ExpenseORM.amount),
+                func.count(),
+                func.avg(orm.ExpenseORM.amount),
+            )
+            .where(orm.ExpenseORM.organization_id == org_id, *filter_clauses(filters))
+            .group_by(*keys)
+            .order_by(*keys)
+        )
+
+        return [
+            queries.ExpenseAggregate(
+                key=tuple(
+                    as_date(value)
+                    if grouping == queries.ExpenseGrouping.MONTH
+                    else value
+                    for grouping, value in zip(group_by, row[: len(keys)])
+                ),
+                total=row[-3],
+                count=row[-2],
+                average=row[-1],
+            )
+            for row in self._report(stmt)
+        ]
+
+    def monthly_spend(
+        self,
+        org_id: UUID,
+        month_from: Optional[date] = None,
+        month_to: Optional[date] = None,
+    ) -> list[queries.ExpenseAggregate]:
+        # Served by the maintained summary table, no scan of the expenses
+        summary = orm.ExpenseSummaryORM
+        stmt = (
+            select(summary)
+            .where(summary.organization_id == org_id, summary.expense_count > 0)
+            .order_by(summary.period, summary.category, summary.state)
+        )
+        if month_from is not None:
+            stmt = stmt.where(summary.period >= month_from)
+        if month_to is not None:
+            stmt = stmt.where(summary.period < month_to)
+
+        return [
+            queries.ExpenseAggregate(
+                key=(row.period, row.category, row.state),
+                total=row.total_amount,
+                count=row.expense_count,
+                average=row.total_amount / row.expense_count,
+            )
+            for row in self._report(stmt)
+        ]
+
+    # helper
+    def _execute(self, stmt: Select):
+        # Straight on the connection, skipping the ORM layer of the session
+        return self._session.connection().execute(stmt)
+
+    def _report(self, stmt: Select):
+        # May run on the replica, see `RoutingSession`
+        return replica_read(
+            self._session,
+            lambda: self._session.connection(bind_arguments=REPLICA_READ).execute(stmt),
+        )
+
+    def _group_column(self, grouping: queries.ExpenseGrouping):
+        if grouping == queries.ExpenseGrouping.MONTH:
+            return month_start(self._session, orm.ExpenseORM.date)
+        return {
+            queries.ExpenseGrouping.STATE: orm.ExpenseORM.state,
+            queries.ExpenseGrouping.CATEGORY: orm.ExpenseORM.category,
+            queries.ExpenseGrouping.SUBMITTER: orm.ExpenseORM.submitter_id,
+        }[grouping]
+
+
+def _organization_listing(columns, org_id: UUID, filters: ExpenseFilter) -> Select:
+    return (
+        select(*columns)
+        .where(_expenses.c.organization_id == org_id, *filter_clauses(filters))
+        .order_by(_expenses.c.date, _expenses.c.id)
+    )
+
+
+def _tag(version: int) -> str:
+    # Every write bumps the version of the row
+    return str(version)
+
+
+def _list_page_query(
+    owner, filters: ExpenseFilter, after: Optional[ExpenseCursor], limit: int
+) -> Select:
+    """The listing with its names joined in by primary key, versions last.
+
+    Names stay where they are edited instead of being copied into a read table,
+    the expense side is served by the same indexes as the repository listings.
+    """
+    stmt = select(*_LIST_COLUMNS, _expenses.c.version).select_from(
+        _expenses.join(
+            _organizations, _organizations.c.id == _expenses.c.organization_id
+        )
+        .join(_submitters, _submitters.c.id == _expenses.c.submitter_id)
+        .outerjoin(_approvers, _approvers.c.id == _expenses.c.approved_by_id)
+    )
+    return _list_window(stmt, owner, filters, after, limit)
+
+
+def _list_tag_query(
+    owner, filters: ExpenseFilter, after: Optional[ExpenseCursor], limit: int
+) -> Select:
+    """Ids and versions of the rows `_list_page_query` reads, no joins needed."""
+    stmt = select(_expenses.c.id, _expenses.c.version)
+    return _list_window(stmt, owner, filters, after, limit)
+
+
+def _list_window(
+    stmt: Select,
+    owner,
+    filters: ExpenseFilter,
+    after: Optional[ExpenseCursor],
+    limit: int,
+) -> Select:
+    stmt = stmt.where(owner, *filter_clauses(filters)).order_by(
+        _expenses.c.date, _expenses.c.id
+    )
+    if after is not None:
+        stmt = stmt.where(after_clause(after))
+    # One extra row tells whether there is a next page
+    return stmt.limit(limit + 1)
+
+
+def _owned_by_user(user_id: UUID):
+    return or_(
+        _expenses.c.submitter_id == user_id, _expenses.c.approved_by_id == user_id
+    )
+
+
+def _list_tag(stamps: Iterable[tuple[UUID, Any]]) -> str:
+    """Digest of `(id, version)` pairs, a page keeps it while its rows do."""
+    digest = hashlib.sha256()
+    for expense_id, version in stamps:
+        digest.update(f"{expense_id}:{version};".encode())
+    return digest.hexdigest()[:32]
+
+
+def _to_list_page(rows: Sequence[tuple], limit: int) -> queries.ExpenseListPage:
+    """Rows of `_list_page_query`, each item followed by its version."""
+    items = [queries.ExpenseListItem(*row[:-1]) for row in rows[:limit]]
+    tag = _list_tag((row[0], row[-1]) for row in rows)
+    if len(rows) <= limit:
+        return queries.ExpenseListPage(items, tag=tag)
+    return queries.ExpenseListPage(
+        items, next_cursor=ExpenseCursor.after(items[-1]), tag=tag
+    )
+
+
+class FakeExpenseQueries(queries.IExpenseQueries):
+    def __init__(
+        self,
+        expenses: Optional[list[expense_model.Expense]] = None,
+        names: Optional[dict[UUID, str]] = None,
+    ):
+        self._expenses = expenses or []
+        # Names of the users and organizations, by id
+        self._names = names or {}
+
+    def stamp_by_id(self, expense_id: UUID) -> queries.ExpenseStamp:
+        tagged = self.expense_by_id(expense_id)
+        return queries.ExpenseStamp(
+            tagged.expense.submitter_id, tagged.expense.organization_id, tagged.tag
+        )
+
+    def expense_by_id(self, expense_id: UUID) -> queries.TaggedExpense:
+        for expense in self._expenses:
+            if expense.id == expense_id:
+                return queries.TaggedExpense(expense, _value_tag(expense))
+        raise exception.NoExpenseFound
+
+    def expenses_by_organization(
+        self, org_id: UUID, filters: ExpenseFilter = ExpenseFilter()
+    ) -> list[expense_model.Expense]:
+        return sorted(
+            (
+                expense
+                for expense in self._expenses
+                if expense.organization_id == org_id and filters.matches(expense)
+            ),
+            key=lambda expense: (expense.date, expense.id),
+        )
+
+    def rows_by_organization(
+        self, org_id: UUID, filters: ExpenseFilter = ExpenseFilter()
+    ) -> list[queries.ExpenseRow]:
+        return [
+            queries.ExpenseRow._make(
+                getattr(expense, name) for name in queries.ExpenseRow._fields
+            )
+            for expense in self.expenses_by_organization(org_id, filters)
+        ]
+
+    def list_page_by_organization(
+        self,
+        org_id: UUID,
+        filters: ExpenseFilter = ExpenseFilter(),
+        after: Optional[ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> queries.ExpenseListPage:
+        return self._list_page(
+            lambda expense: expense.organization_id == org_id, filters, after, limit
+        )
+
+    def list_page_by_user(
+        self,
+        user_id: UUID,
+        filters: ExpenseFilter = ExpenseFilter(),
+        after: Optional[ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> queries.ExpenseListPage:
+        return self._list_page(
+            lambda expense: user_id in (expense.submitter_id, expense.approved_by_id),
+            filters,
+            after,
+            limit,
+        )
+
+    def batch_by_organization(
+        self, org_id: UUID, filters: ExpenseFilter = ExpenseFilter()
+    ) -> expense_model.ExpenseBatch:
+        return expense_model.ExpenseBatch.from_expenses(
+            self.expenses_by_organization(org_id, filters)
+        )
+
+    def stream_rows_by_organization(
+        self, org_id: UUID, filters: ExpenseFilter = ExpenseFilter()
+    ) -> Iterator[queries.ExpenseRow]:
+        return iter(self.rows_by_organization(org_id, filters))
+
+    def aggregate_by_organization(
+        self,
+        org_id: UUID,
+        group_by: Sequence[queries.ExpenseGrouping],
+        filters: ExpenseFilter = ExpenseFilter(),
+    ) -> list[queries.ExpenseAggregate]:
+        groups = defaultdict(list)
+        for expense in self._expenses:
+            if expense.organization_id == org_id and filters.matches(expense):
+                key = tuple(_group_value(expense, grouping) for grouping in group_by)
+                groups[key].append(expense.amount)
+
+        return [
+            queries.ExpenseAggregate(
+                key=key,
+                total=sum(amounts),
+                count=len(amounts),
+                average=sum(amounts) / len(amounts),
+            )
+            for key, amounts in groups.items()
+        ]
+
+    def monthly_spend(
+        self,
+        org_id: UUID,
+        month_from: Optional[date] = None,
+        month_to: Optional[date] = None,
+    ) -> list[queries.ExpenseAggregate]:
+        aggregates = self.aggregate_by_organization(
+            org_id,
+            [
+                queries.ExpenseGrouping.MONTH,
+                queries.ExpenseGrouping.CATEGORY,
+                queries.ExpenseGrouping.STATE,
+            ],
+        )
+        return [
+            aggregate
+            for aggregate in aggregates
+            if (month_from is None or aggregate.key[0] >= month_from)
+            and (month_to is None or aggregate.key[0] < month_to)
+        ]
+
+    def list_tag_by_organization(
+        self,
+        org_id: UUID,
+        filters: ExpenseFilter = ExpenseFilter(),
+        after: Optional[ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> str:
+        return self.list_page_by_organization(org_id, filters, after, limit).tag
+
+    def list_tag_by_user(
+        self,
+        user_id: UUID,
+        filters: ExpenseFilter = ExpenseFilter(),
+        after: Optional[ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> str:
+        return self.list_page_by_user(user_id, filters, after, limit).tag
+
+    # helper
+    def _list_page(
+        self,
+        owner: Callable[[expense_model.Expense], bool],
+        filters: ExpenseFilter,
+        after: Optional[ExpenseCursor],
+        limit: int,
+    ) -> queries.ExpenseListPage:
+        expenses = sorted(
+            (
+                expense
+                for expense in self._expenses
+                if owner(expense)
+                and filters.matches(expense)
+                and (
+                    after is None or (expense.date, expense.id) > (after.date, after.id)
+                )
+            ),
+            key=lambda expense: (expense.date, expense.id),
+        )
+        return _to_list_page(
+            [
+                (*astuple(self._list_item(expense)), _value_tag(expense))
+                for expense in expenses[: limit + 1]
+            ],
+            limit,
+        )
+
+    def _list_item(self, expense: expense_model.Expense) -> queries.ExpenseListItem:
+        return queries.ExpenseListItem(
+            id=expense.id,
+            date=expense.date,
+            title=expense.title,
+            amount=expense.amount,
+            category=expense.category,
+            state=expense.state,
+            organization_id=expense.organization_id,
+            organization_name=self._names[expense.organization_id],
+            submitter_id=expense.submitter_id,
+            submitter_name=self._names[expense.submitter_id],
+            approved_by_id=expense.approved_by_id,
+            approver_name=self._names.get(expense.approved_by_id),
+        )
+
+
+def _value_tag(expense: expense_model.Expense) -> str:
+    # Derived from the values, so it changes whenever they do
+    values = tuple(getattr(expense, name) for name in expense_model.EXPENSE_FIELDS)
+    return f"{hash(values):x}"
+
+
+def _group_value(expense: expense_model.Expense, grouping: queries.ExpenseGrouping):
+    if grouping == queries.ExpenseGrouping.MONTH:
+        return expense.date.date().replace(day=1)
+    return {
+        queries.ExpenseGrouping.STATE: expense.state,
+        queries.ExpenseGrouping.CATEGORY: expense.category,
+        queries.ExpenseGrouping.SUBMITTER: expense.submitter_id,
+    }[grouping]
@@ -0,0 +1,233 @@
+"""Background processing of stored receipts on a local process pool.
+
+Each receipt is verified against its hash, its metadata parsed, images are
+downscaled into a thumbnail and PDFs have their text extracted. Run the workers
+with `python -m src.expense_management.infrastructure.receipt_pipeline [--once]`.
+"""
+
+import argparse
+import hashlib
+import os
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor
+from concurrent.futures import wait as wait_for
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from io import BytesIO
+from typing import Callable
+
+from PIL import Image, UnidentifiedImageError
+from pypdf import PdfReader
+
+from src._shared.infrastructure.database import session_factory
+from src.expense_management.domain import receipt as receipt_model
+from src.expense_management.domain.repository import IReceiptJobRepository
+from src.expense_management.infrastructure import exception
+from src.expense_management.infrastructure.receipts import (
+    LocalReceiptStore,
+    SqlAlchemyReceiptJobRepository,
+    get_receipt_store,
+)
+
+THUMBNAIL_SIZE = (320, 320)
+
+
+def analyze_receipt(
+    store: LocalReceiptStore, digest: str
+) -> receipt_model.ReceiptAnalysis:
+    """Every step is CPU bound, the pipeline runs this in a worker process."""
+    content = store.locate(digest).path.read_bytes()
+    if hashlib.sha256(content).hexdigest() != digest:
+        raise exception.CorruptReceipt(digest)
+
+    if content.startswith(b"%PDF-"):
+        return _analyze_pdf(content)
+    try:
+        return _analyze_image(store, content)
+    except UnidentifiedImageError:
+        return receipt_model.ReceiptAnalysis(
+            media_type="application/octet-stream", size=len(content)
+        )
+
+
+def _analyze_pdf(content: bytes) -> receipt_model.ReceiptAnalysis:
+    reader = PdfReader(BytesIO(content))
+    text = "\n".join(page.extract_text() for page in reader.pages).strip()
+    return receipt_model.ReceiptAnalysis(
+        media_type="application/pdf",
+        size=len(content),
+        page_count=len(reader.pages),
+        text=text or None,
+    )
+
+
+def _analyze_image(
+    store: LocalReceiptStore, content: bytes
+) -> receipt_model.ReceiptAnalysis:
+    thumbnail = BytesIO()
+    with Image.open(BytesIO(content)) as image:
+        media_type = image.get_format_mimetype() or "application/octet-stream"
+        width, height = image.size
+        # JPEGs are decoded at a fraction of their size, far less work for big scans
+        image.draft("RGB", THUMBNAIL_SIZE)
+        image.thumbnail(THUMBNAIL_SIZE)
+        image.convert("RGB").save(thumbnail, format="JPEG", quality=80)
+
+    return receipt_model.ReceiptAnalysis(
+        media_type=media_type,
+        size=len(content),
+        width=width,
+        height=height,
+        thumbnail_reference=store.save([thumbnail.getvalue()]).digest,
+    )
+
+
+@dataclass(frozen=True)
+class PipelineStats:
+    succeeded: int
+    retried: int
+    failed: int
+    busy_seconds: float
+
+    @property
+    def throughput(self) -> float:
+        """Receipts finished per second the pipeline had work."""
+        if not self.busy_seconds:
+            return 0.0
+        return (self.succeeded + self.failed) / self.busy_seconds
+
+
+class ReceiptPipeline:
+    """Works off receipt jobs with at most `capacity` of them in flight.
+
+    Failed jobs are retried with exponential backoff from `retry_delay` on, until
+    they used up `max_attempts`. Results of jobs that were claimed again after
+    their lease ran out are dropped and not counted.
+    """
+
+    def __init__(
+        self,
+        jobs: IReceiptJobRepository,
+        store: LocalReceiptStore,
+        executor: Executor,
+        capacity: int,
+        max_attempts: int = 3,
+        retry_delay: timedelta = timedelta(seconds=30),
+        lease: timedelta = timedelta(minutes=5),
+        clock: Callable[[], datetime] = lambda: datetime.now(UTC),
+    ):
+        self._jobs = jobs
+        self._store = store
+        self._executor = executor
+        self._capacity = capacity
+        self._max_attempts = max_attempts
+        self._retry_delay = retry_delay
+        self._lease = lease
+        self._clock = clock
+        self._succeeded = 0
+        self._retried = 0
+        self._failed = 0
+        self._busy_seconds = 0.0
+
+    def run_once(self) -> int:
+        """Processes one batch of due jobs and returns how many there were."""
+        started = time.perf_counter()
+        in_flight = self._submit(self._capacity)
+        for future in wait_for(in_flight).done:
+            self._record(in_flight[future], future)
+        if in_flight:
+            self._busy_seconds += time.perf_counter() - started
+        return len(in_flight)
+
+    def run(self, stop: threading.Event, poll_interval: float = 1.0):
+        """Keeps the pool busy until `stop` is set, then lets running jobs finish."""
+        in_flight: dict[Future, receipt_model.ReceiptJob] = {}
+        while in_flight or not stop.is_set():
+            started = time.perf_counter()
+            if not stop.is_set() and len(in_flight) < self._capacity:
+                in_flight |= self._submit(self._capacity - len(in_flight))
+            if not in_flight:
+                stop.wait(poll_interval)
+                continue
+
+            done, _ = wait_for(
+                in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                self._record(in_flight.pop(future), future)
+            self._busy_seconds += time.perf_counter() - started
+
+    def stats(self) -> PipelineStats:
+        return PipelineStats(
+            succeeded=self._succeeded,
+            retried=self._retried,
+            failed=self._failed,
+            busy_seconds=self._busy_seconds,
+        )
+
+    # helper
+    def _submit(self, limit: int) -> dict[Future, receipt_model.ReceiptJob]:
+        jobs = self._jobs.claim(limit, self._clock(), self._lease)
+        return {
+            self._executor.submit(
+                analyze_receipt, self._store, job.document_reference
+            ): job
+            for job in jobs
+        }
+
+    def _record(self, job: receipt_model.ReceiptJob, future: Future):
+        try:
+            analysis = future.result()
+        except Exception as error:
+            message = f"{type(error).__name__}: {error}"
+            if job.attempts >= self._max_attempts:
+                if self._jobs.fail(job, message):
+                    self._failed += 1
+            else:
+                backoff = self._retry_delay * 2 ** (job.attempts - 1)
+                if self._jobs.fail(job, message, retry_at=self._clock() + backoff):
+                    self._retried += 1
+        else:
+            if self._jobs.complete(job, analysis):
+                self._succeeded += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "--once", action="store_true", help="process the due jobs, then exit"
+    )
+    args = parser.parse_args()
+
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+
+    with (
+        session_factory()() as session,
+        ProcessPoolExecutor(max_workers=args.workers) as executor,
+    ):
+        pipeline = ReceiptPipeline(
+            SqlAlchemyReceiptJobRepository(session),
+            get_receipt_store(),
+            executor,
+            capacity=args.workers,
+        )
+        if args.once:
+            while pipeline.run_once():
+                pass
+        else:
+            pipeline.run(stop)
+
+    stats = pipeline.stats()
+    print(
+        f"{stats.succeeded} succeeded, {stats.retried} retried, "
+        f"{stats.failed} failed, {stats.throughput:.1f} receipts/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+import hashlib
+import os
+import re
+import tempfile
+from dataclasses import replace
+from datetime import UTC, datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from src._shared.config import get_settings
+from src._shared.infrastructure import orm
+from src.expense_management.domain import receipt as receipt_model
+from src.expense_management.domain import repository
+from src.expense_management.domain.repository import StoredReceipt
+from src.expense_management.infrastructure import exception
+
+# References to stored receipts are their SHA-256, anything else is free-form
+DIGEST = re.compile(r"[0-9a-f]{64}")
+# Running jobs are claimable again once their lease ran out
+_CLAIMABLE = (
+    receipt_model.ReceiptJobState.QUEUED,
+    receipt_model.ReceiptJobState.RUNNING,
+)
+
+
+class LocalReceiptStore:
+    """Receipts on the local filesystem, stored as `root/ab/cd/<sha256>`.
+
+    Uploads are hashed while written to a temporary file under `root`, which is
+    then hard linked into place. A stored file is therefore always complete and
+    identical uploads share one file.
+    """
+
+    def __init__(self, root: Path):
+        self._root = Path(root)
+        self._incoming = self._root / "incoming"
+        self._incoming.mkdir(parents=True, exist_ok=True)
+
+    def save(self, chunks: Iterable[bytes]) -> StoredReceipt:
+        digest = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=self._incoming) as file:
+            for chunk in chunks:
+                digest.update(chunk)
+                file.write(chunk)
+                size += len(chunk)
+            file.flush()
+            os.fsync(file.fileno())
+
+            path = self._path(digest.hexdigest())
+            path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.link(file.name, path)
+            except FileExistsError:
+                pass  # Stored before, the temporary file is dropped on close
+
+        return StoredReceipt(digest=digest.hexdigest(), size=size, path=path)
+
+    def locate(self, digest: str) -> StoredReceipt:
+        if not DIGEST.fullmatch(digest):
+            raise exception.NoReceiptFound
+        path = self._path(digest)
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            raise exception.NoReceiptFound
+        return StoredReceipt(digest=digest, size=size, path=path)
+
+    # helper
+    def _path(self, digest: str) -> Path:
+        return self._root / digest[:2] / digest[2:4] / digest
+
+
+@lru_cache(maxsize=1)
+def get_receipt_store() -> LocalReceiptStore:
+    return LocalReceiptStore(get_settings().receipts.root)
+
+
+#### Receipt Job Repos
+class SqlAlchemyReceiptJobRepository(repository.IReceiptJobRepository):
+    """Jobs are queued by the expense repository, in the transaction of the expense."""
+
+    def __init__(self, session: Session):
+        self._session = session
+
+    def get(self, document_reference: str) -> receipt_model.ReceiptJob:
+        job_orm = self._session.get(orm.ReceiptJobORM, document_reference)
+        if not job_orm:
+            raise exception.NoReceiptJobFound
+        return job_orm.to_domain()
+
+    def claim(
+        self, limit: int, now: datetime, lease: timedelta
+    ) -> list[receipt_model.ReceiptJob]:
+        job = orm.ReceiptJobORM
+        # Concurrent workers skip each other's rows instead of waiting on them
+        due = (
+            select(job.document_reference)
+            .where(job.state.in_(_CLAIMABLE), job.available_at <= now)
+            .order_by(job.available_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        claimed = self._session.scalars(
+            update(job)
+            .where(job.document_reference.in_(due))
+            .values(
+                state=receipt_model.ReceiptJobState.RUNNING,
+                attempts=job.attempts + 1,
+                available_at=now + lease,
+            )
+            .returning(job)
+        ).all()
+        jobs = [job_orm.to_domain() for job_orm in claimed]
+        self._session.commit()
+        return jobs
+
+    def complete(
+        self, job: receipt_model.ReceiptJob, analysis: receipt_model.ReceiptAnalysis
+    ) -> bool:
+        return self._finish(
+            job,
+            state=receipt_model.ReceiptJobState.SUCCEEDED,
+            last_error=None,
+            finished_at=datetime.now(UTC),
+            media_type=analysis.media_type,
+            size=analysis.size,
+            width=analysis.width,
+            height=analysis.height,
+            page_count=analysis.page_count,
+            text=analysis.text,
+            thumbnail_reference=analysis.thumbnail_reference,
+        )
+
+    def fail(
+        self,
+        job: receipt_model.ReceiptJob,
+        error: str,
+        retry_at: Optional[datetime] = None,
+    ) -> bool:
+        if retry_at is not None:
+            return self._finish(
+                job,
+                state=receipt_model.ReceiptJobState.QUEUED,
+                last_error=error,
+                available_at=retry_at,
+            )
+        else:
+            return self._finish(
+                job,
+                state=receipt_model.ReceiptJobState.FAILED,
+                last_error=error,
+                finished_at=datetime.now(UTC),
+            )
+
+    def stats(self, since: datetime, until: datetime) -> receipt_model.ReceiptJobStats:
+        job = orm.ReceiptJobORM
+        counts = dict(
+            self._session.execute(
+                select(job.state, func.count()).group_by(job.state)
+            ).all()
+        )
+        finished = self._session.scalar(
+            select(func.count()).where(
+                job.finished_at >= since, job.finished_at < until
+            )
+        )
+        return receipt_model.ReceiptJobStats(
+            counts={
+                state: counts.get(state, 0) for state in receipt_model.ReceiptJobState
+            },
+            finished=finished,
+            window_seconds=(until - since).total_seconds(),
+        )
+
+    # helper
+    def _finish(self, job: receipt_model.ReceiptJob, **values) -> bool:
+        # A worker whose lease ran out may still report, once the job was
+        # claimed again its attempt no longer matches and the result is dropped
+        finished = self._session.execute(
+            update(orm.ReceiptJobORM)
+            .where(
+                orm.ReceiptJobORM.document_reference == job.document_reference,
+                orm.ReceiptJobORM.attempts == job.attempts,
+                orm.ReceiptJobORM.state == receipt_model.ReceiptJobState.RUNNING,
+            )
+            .values(**values)
+        )
+        self._session.commit()
+        return finished.rowcount == 1
+
+
+class FakeReceiptJobRepository(repository.IReceiptJobRepository):
+    def __init__(self, jobs: Optional[list[receipt_model.ReceiptJob]] = None):
+        self._jobs = {job.document_reference: job for job in jobs} if jobs else {}
+
+    def get(self, document_reference: str) -> receipt_model.ReceiptJob:
+        job = self._jobs.get(document_reference)
+        if not job:
+            raise exception.NoReceiptJobFound
+        return replace(job)
+
+    def claim(
+        self, limit: int, now: datetime, lease: timedelta
+    ) -> list[receipt_model.ReceiptJob]:
+        due = sorted(
+            (
+                job
+                for job in self._jobs.values()
+                if job.state in _CLAIMABLE and job.available_at <= now
+            ),
+            key=lambda job: job.available_at,
+        )[:limit]
+        for job in due:
+            job.state = receipt_model.ReceiptJobState.RUNNING
+            job.attempts += 1
+            job.available_at = now + lease
+        return [replace(job) for job in due]
+
+    def complete(
+        self, job: receipt_model.ReceiptJob, analysis: receipt_model.ReceiptAnalysis
+    ) -> bool:
+        stored = self._claimed(job)
+        if not stored:
+            return False
+        stored.state = receipt_model.ReceiptJobState.SUCCEEDED
+        stored.last_error = None
+        stored.finished_at = datetime.now(UTC)
+        stored.analysis = analysis
+        return True
+
+    def fail(
+        self,
+        job: receipt_model.ReceiptJob,
+        error: str,
+        retry_at: Optional[datetime] = None,
+    ) -> bool:
+        stored = self._claimed(job)
+        if not stored:
+            return False
+        stored.last_error = error
+        if retry_at is not None:
+            stored.state = receipt_model.ReceiptJobState.QUEUED
+            stored.available_at = retry_at
+        else:
+            stored.state = receipt_model.ReceiptJobState.FAILED
+            stored.finished_at = datetime.now(UTC)
+        return True
+
+    def stats(self, since: datetime, until: datetime) -> receipt_model.ReceiptJobStats:
+        jobs = self._jobs.values()
+        return receipt_model.ReceiptJobStats(
+            counts={
+                state: sum(job.state == state for job in jobs)
+                for state in receipt_model.ReceiptJobState
+            },
+            finished=sum(
+                job.finished_at is not None and since <= job.finished_at < until
+                for job in jobs
+            ),
+            window_seconds=(until - since).total_seconds(),
+        )
+
+    # helper
+    def _claimed(
+        self, job: receipt_model.ReceiptJob
+    ) -> Optional[receipt_model.ReceiptJob]:
+        stored = self._jobs[job.document_reference]
+        if (
+            stored.attempts != job.attempts
+            or stored.state != receipt_model.ReceiptJobState.RUNNING
+        ):
+            return None
+        return stored
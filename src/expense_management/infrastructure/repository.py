@@ -1,17 +1,50 @@
+from dataclasses import dataclass
+from datetime import datetime, UTC
+from itertools import batched, islice
 from uuid import UUID
-from typing import Optional
+from typing import (
+    AsyncIterator,
+    Callable,
+    Collection,
+    Iterable,
+    Iterator,
+    Optional,
+    Sequence,
+)
 from src.expense_management.infrastructure import exception
 from src.expense_management.domain import repository
 from src.expense_management.domain import model as expense_model
+from src.expense_management.domain import events as expense_events
+from src.expense_management.domain import exception as domain_exception
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import (
+    ColumnElement,
+    Insert,
+    Select,
+    Update,
+    and_,
+    insert,
+    literal,
+    or_,
+    select,
+    update,
+)
 from src._shared.infrastructure import orm
+from src._shared.infrastructure.database import REPLICA_READ, dialect_insert
+from src.expense_management.infrastructure.receipts import DIGEST
+from src.expense_management.infrastructure.summary import (
+    SUMMARY_FIELDS,
+    SummaryChanges,
+    summary_values,
+)
 
 
 #### Expense Repos
 class SqlAlchemyExpenseRepository(repository.IExpenseRepository):
-    def __init__(self, session: Session):
+    def __init__(self, session: Session, batch_size: int = 1000):
         self._session = session
+        self._batch_size = batch_size
 
     def get(self, expense_id: UUID):
         expense_orm = self._session.get(orm.ExpenseORM, expense_id)
@@ -21,55 +54,732 @@ class SqlAlchemyExpenseRepository(repository.IExpenseRepository):
         return expense_orm.to_domain()
 
     def save(self, expense: expense_model.Expense):
-        expense_orm = orm.ExpenseORM.from_domain(expense)
+        if not expense.is_persisted:
+            self._session.add(orm.ExpenseORM.from_domain(expense))
+        elif expense.changed_fields:
+            if not self._session.execute(_update_changes(expense)).rowcount:
+                self._session.rollback()
+                raise domain_exception.ExpenseVersionConflict
+        else:
+            return
 
-        self._session.add(expense_orm)
+        summary = SummaryChanges()
+        summary.save(expense)
+        summary.apply(self._session)
+        if (receipts := _new_receipts(self._session, [expense])) is not None:
+            self._session.execute(receipts)
+        if (outbox := _outbox(expense.pull_events())) is not None:
+            self._session.execute(*outbox)
         self._session.commit()
+        expense.mark_persisted(version=expense.version + 1)
+
+    def save_many(self, expenses: Iterable[expense_model.Expense]) -> None:
+        """Upsert expenses with one multi-row statement and one commit per batch.
+
+        A batch holding an expense changed since it was loaded is rolled back as a
+        whole, the batches before it stay committed.
+        """
+        for batch in batched(_pending(expenses), self._batch_size):
+            summary = SummaryChanges()
+            for previous in self._session.execute(_summary_rows(batch)):
+                summary.remove(**previous._asdict())
+            for expense in batch:
+                summary.add(**summary_values(expense))
+
+            written = self._session.scalars(*_upsert(self._session, batch)).all()
+            if len(written) < len(batch):
+                self._session.rollback()
+                raise domain_exception.ExpenseVersionConflict
+            summary.apply(self._session)
+            if (receipts := _new_receipts(self._session, batch)) is not None:
+                self._session.execute(receipts)
+            if (outbox := _outbox(_pull_events(batch))) is not None:
+                self._session.execute(*outbox)
+            self._session.commit()
+            for expense in batch:
+                expense.mark_persisted(version=expense.version + 1)
+
+    def submit(self, expense_id: UUID, by: UUID) -> expense_model.Expense:
+        return self._transition(expense_id, _submission(by))
+
+    def approve(self, expense_id: UUID, by: UUID) -> expense_model.Expense:
+        return self._transition(expense_id, _approval(by))
+
+    def submit_many(
+        self, expense_ids: Collection[UUID], by: UUID
+    ) -> list[expense_model.Expense]:
+        return self._transition_many(expense_ids, _submission(by))
+
+    def approve_many(
+        self, expense_ids: Collection[UUID], by: UUID
+    ) -> list[expense_model.Expense]:
+        return self._transition_many(expense_ids, _approval(by))
+
+    def withdraw(self, expense_id: UUID, by: UUID) -> expense_model.Expense:
+        return self._transition(expense_id, _withdrawal(by))
+
+    def revoke(self, expense_id: UUID, by: UUID, reason: str) -> expense_model.Expense:
+        return self._transition(expense_id, _revocation(by, reason))
+
+    def get_many(
+        self, expense_ids: Collection[UUID]
+    ) -> dict[UUID, expense_model.Expense]:
+        expense_orms = self._session.scalars(_by_ids(expense_ids))
+        return {expense_orm.id: expense_orm.to_domain() for expense_orm in expense_orms}
 
     def find_by_organization(self, org_id: UUID) -> list[expense_model.Expense]:
-        expense_orms = (
-            self._session.query(orm.ExpenseORM).filter_by(organization_id=org_id).all()
+        expense_orms = self._session.scalars(
+            select(orm.ExpenseORM).where(_of_organization(org_id)),
+            bind_arguments=REPLICA_READ,
+        ).all()
+        return _to_found(expense_orms)
+
+    def find_by_user(self, user_id: UUID) -> list[expense_model.Expense]:
+        expense_orms = self._session.scalars(
+            select(orm.ExpenseORM).where(_of_user(user_id)),
+            bind_arguments=REPLICA_READ,
+        ).all()
+        return _to_found(expense_orms)
+
+    def find_page_by_organization(
+        self,
+        org_id: UUID,
+        filters: repository.ExpenseFilter = repository.ExpenseFilter(),
+        after: Optional[repository.ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> repository.ExpensePage:
+        return self._page(_of_organization(org_id), filters, after, limit)
+
+    def find_page_by_user(
+        self,
+        user_id: UUID,
+        filters: repository.ExpenseFilter = repository.ExpenseFilter(),
+        after: Optional[repository.ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> repository.ExpensePage:
+        return self._page(_of_user(user_id), filters, after, limit)
+
+    def stream_by_organization(
+        self,
+        org_id: UUID,
+        filters: repository.ExpenseFilter = repository.ExpenseFilter(),
+    ) -> Iterator[expense_model.Expense]:
+        return self._stream(_listing(_of_organization(org_id), filters))
+
+    def stream_by_user(
+        self,
+        user_id: UUID,
+        filters: repository.ExpenseFilter = repository.ExpenseFilter(),
+    ) -> Iterator[expense_model.Expense]:
+        return self._stream(_listing(_of_user(user_id), filters))
+
+    # helper
+    def _page(
+        self,
+        owner: ColumnElement[bool],
+        filters: repository.ExpenseFilter,
+        after: Optional[repository.ExpenseCursor],
+        limit: int,
+    ) -> repository.ExpensePage:
+        expense_orms = self._session.scalars(
+            _page_query(owner, filters, after, limit)
+        ).all()
+        return _to_page(expense_orms, limit)
+
+    def _stream(self, stmt: Select) -> Iterator[expense_model.Expense]:
+        """Fetch in chunks of `batch_size` rows through a server side cursor."""
+        result = self._session.scalars(
+            stmt.execution_options(yield_per=self._batch_size)
         )
-        if not expense_orms:
+        for expense_orm in result:
+            yield expense_orm.to_domain()
+
+    def _transition(
+        self, expense_id: UUID, transition: "_Transition"
+    ) -> expense_model.Expense:
+        """Apply a state transition as one conditional UPDATE ... RETURNING.
+
+        Tried once per allowed source state, so the summary knows which row to move
+        the expense out of.
+        """
+        for from_state in transition.from_states:
+            expense_orm = self._session.execute(
+                transition.update(orm.ExpenseORM.id == expense_id, from_state)
+            ).scalar_one_or_none()
+            if expense_orm is not None:
+                break
+        else:
+            # Guard did not match, replay the domain rule to raise the precise error
+            transition.replay(self.get(expense_id))
+            raise domain_exception.ConcurrentModification
+
+        expense = expense_orm.to_domain()
+        summary = SummaryChanges()
+        summary.move(expense, from_state=from_state)
+        summary.apply(self._session)
+        self._session.execute(*_outbox([transition.event(expense)]))
+        self._session.commit()
+        return expense
+
+    def _transition_many(
+        self, expense_ids: Collection[UUID], transition: "_Transition"
+    ) -> list[expense_model.Expense]:
+        """Apply a transition to every expense passing the guard, in one statement.
+
+        Expenses failing the guard are left untouched and missing from the result.
+        """
+        if not expense_ids:
+            return []
+        (from_state,) = transition.from_states
+        expense_orms = self._session.scalars(
+            transition.update(orm.ExpenseORM.id.in_(set(expense_ids)), from_state)
+        ).all()
+
+        expenses = [expense_orm.to_domain() for expense_orm in expense_orms]
+        summary = SummaryChanges()
+        for expense in expenses:
+            summary.move(expense, from_state=from_state)
+        summary.apply(self._session)
+        if (outbox := _outbox(map(transition.event, expenses))) is not None:
+            self._session.execute(*outbox)
+        self._session.commit()
+        return expenses
+
+
+class AsyncSqlAlchemyExpenseRepository(repository.IAsyncExpenseRepository):
+    """`SqlAlchemyExpenseRepository` on an `AsyncSession`, issuing the same statements."""
+
+    def __init__(self, session: AsyncSession, batch_size: int = 1000):
+        self._session = session
+        self._batch_size = batch_size
+
+    async def get(self, expense_id: UUID) -> expense_model.Expense:
+        expense_orm = await self._session.get(orm.ExpenseORM, expense_id)
+        if not expense_orm:
             raise exception.NoExpenseFound
 
-        return [expense_orm.to_domain() for expense_orm in expense_orms]
+        return expense_orm.to_domain()
 
-    def find_by_user(self, user_id: UUID) -> list[expense_model.Expense]:
-        expense_orms = (
-            self._session.query(orm.ExpenseORM)
-            .filter(
-                or_(
-                    orm.ExpenseORM.submitter_id == user_id,
-                    orm.ExpenseORM.approved_by_id == user_id,
-                )
+    async def save(self, expense: expense_model.Expense) -> None:
+        if not expense.is_persisted:
+            self._session.add(orm.ExpenseORM.from_domain(expense))
+        elif expense.changed_fields:
+            if not (await self._session.execute(_update_changes(expense))).rowcount:
+                await self._session.rollback()
+                raise domain_exception.ExpenseVersionConflict
+        else:
+            return
+
+        summary = SummaryChanges()
+        summary.save(expense)
+        await summary.apply_async(self._session)
+        if (receipts := _new_receipts(self._session, [expense])) is not None:
+            await self._session.execute(receipts)
+        if (outbox := _outbox(expense.pull_events())) is not None:
+            await self._session.execute(*outbox)
+        await self._session.commit()
+        expense.mark_persisted(version=expense.version + 1)
+
+    async def save_many(self, expenses: Iterable[expense_model.Expense]) -> None:
+        for batch in batched(_pending(expenses), self._batch_size):
+            summary = SummaryChanges()
+            for previous in await self._session.execute(_summary_rows(batch)):
+                summary.remove(**previous._asdict())
+            for expense in batch:
+                summary.add(**summary_values(expense))
+
+            written = (
+                await self._session.scalars(*_upsert(self._session, batch))
+            ).all()
+            if len(written) < len(batch):
+                await self._session.rollback()
+                raise domain_exception.ExpenseVersionConflict
+            await summary.apply_async(self._session)
+            if (receipts := _new_receipts(self._session, batch)) is not None:
+                await self._session.execute(receipts)
+            if (outbox := _outbox(_pull_events(batch))) is not None:
+                await self._session.execute(*outbox)
+            await self._session.commit()
+            for expense in batch:
+                expense.mark_persisted(version=expense.version + 1)
+
+    async def submit(self, expense_id: UUID, by: UUID) -> expense_model.Expense:
+        return await self._transition(expense_id, _submission(by))
+
+    async def approve(self, expense_id: UUID, by: UUID) -> expense_model.Expense:
+        return await self._transition(expense_id, _approval(by))
+
+    async def submit_many(
+        self, expense_ids: Collection[UUID], by: UUID
+    ) -> list[expense_model.Expense]:
+        return await self._transition_many(expense_ids, _submission(by))
+
+    async def approve_many(
+        self, expense_ids: Collection[UUID], by: UUID
+    ) -> list[expense_model.Expense]:
+        return await self._transition_many(expense_ids, _approval(by))
+
+    async def withdraw(self, expense_id: UUID, by: UUID) -> expense_model.Expense:
+        return await self._transition(expense_id, _withdrawal(by))
+
+    async def revoke(
+        self, expense_id: UUID, by: UUID, reason: str
+    ) -> expense_model.Expense:
+        return await self._transition(expense_id, _revocation(by, reason))
+
+    async def get_many(
+        self, expense_ids: Collection[UUID]
+    ) -> dict[UUID, expense_model.Expense]:
+        expense_orms = await self._session.scalars(_by_ids(expense_ids))
+        return {expense_orm.id: expense_orm.to_domain() for expense_orm in expense_orms}
+
+    async def find_by_organization(self, org_id: UUID) -> list[expense_model.Expense]:
+        expense_orms = await self._session.scalars(
+            select(orm.ExpenseORM).where(_of_organization(org_id))
+        )
+        return _to_found(expense_orms.all())
+
+    async def find_by_user(self, user_id: UUID) -> list[expense_model.Expense]:
+        expense_orms = await self._session.scalars(
+            select(orm.ExpenseORM).where(_of_user(user_id))
+        )
+        return _to_found(expense_orms.all())
+
+    async def find_page_by_organization(
+        self,
+        org_id: UUID,
+        filters: repository.ExpenseFilter = repository.ExpenseFilter(),
+        after: Optional[repository.ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> repository.ExpensePage:
+        return await self._page(_of_organization(org_id), filters, after, limit)
+
+    async def find_page_by_user(
+        self,
+        user_id: UUID,
+        filters: repository.ExpenseFilter = repository.ExpenseFilter(),
+        after: Optional[repository.ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> repository.ExpensePage:
+        return await self._page(_of_user(user_id), filters, after, limit)
+
+    def stream_by_organization(
+        self,
+        org_id: UUID,
+        filters: repository.ExpenseFilter = repository.ExpenseFilter(),
+    ) -> AsyncIterator[expense_model.Expense]:
+        return self._stream(_listing(_of_organization(org_id), filters))
+
+    def stream_by_user(
+        self,
+        user_id: UUID,
+        filters: repository.ExpenseFilter = repository.ExpenseFilter(),
+    ) -> AsyncIterator[expense_model.Expense]:
+        return self._stream(_listing(_of_user(user_id), filters))
+
+    # helper
+    async def _page(
+        self,
+        owner: ColumnElement[bool],
+        filters: repository.ExpenseFilter,
+        after: Optional[repository.ExpenseCursor],
+        limit: int,
+    ) -> repository.ExpensePage:
+        expense_orms = await self._session.scalars(
+            _page_query(owner, filters, after, limit)
+        )
+        return _to_page(expense_orms.all(), limit)
+
+    async def _stream(self, stmt: Select) -> AsyncIterator[expense_model.Expense]:
+        result = await self._session.stream_scalars(
+            stmt.execution_options(yield_per=self._batch_size)
+        )
+        async for expense_orm in result:
+            yield expense_orm.to_domain()
+
+    async def _transition(
+        self, expense_id: UUID, transition: "_Transition"
+    ) -> expense_model.Expense:
+        for from_state in transition.from_states:
+            result = await self._session.execute(
+                transition.update(orm.ExpenseORM.id == expense_id, from_state)
             )
-            .all()
+            if (expense_orm := result.scalar_one_or_none()) is not None:
+                break
+        else:
+            transition.replay(await self.get(expense_id))
+            raise domain_exception.ConcurrentModification
+
+        expense = expense_orm.to_domain()
+        summary = SummaryChanges()
+        summary.move(expense, from_state=from_state)
+        await summary.apply_async(self._session)
+        await self._session.execute(*_outbox([transition.event(expense)]))
+        await self._session.commit()
+        return expense
+
+    async def _transition_many(
+        self, expense_ids: Collection[UUID], transition: "_Transition"
+    ) -> list[expense_model.Expense]:
+        if not expense_ids:
+            return []
+        (from_state,) = transition.from_states
+        expense_orms = await self._session.scalars(
+            transition.update(orm.ExpenseORM.id.in_(set(expense_ids)), from_state)
         )
-        if not expense_orms:
-            raise exception.NoExpenseFound
 
-        return [expense_orm.to_domain() for expense_orm in expense_orms]
+        expenses = [expense_orm.to_domain() for expense_orm in expense_orms]
+        summary = SummaryChanges()
+        for expense in expenses:
+            summary.move(expense, from_state=from_state)
+        await summary.apply_async(self._session)
+        if (outbox := _outbox(map(transition.event, expenses))) is not None:
+            await self._session.execute(*outbox)
+        await self._session.commit()
+        return expenses
+
+
+# Statements shared by the sync and async repositories
+@dataclass(frozen=True)
+class _Transition:
+    """A state change of `Expense`, its rules mirrored as SQL predicates.
+
+    The domain methods do not run on success, `event` records what they would have.
+    """
+
+    from_states: Sequence[expense_model.ExpenseState]
+    guard: ColumnElement[bool]
+    values: dict
+    replay: Callable[[expense_model.Expense], None]
+    event: Callable[[expense_model.Expense], expense_events.ExpenseEvent]
+
+    def update(
+        self, target: ColumnElement[bool], from_state: expense_model.ExpenseState
+    ) -> Update:
+        return (
+            update(orm.ExpenseORM)
+            .where(target, orm.ExpenseORM.state == from_state, self.guard)
+            .values(self.values | {"version": orm.ExpenseORM.version + 1})
+            .returning(orm.ExpenseORM)
+        )
+
+
+def _submission(by: UUID) -> _Transition:
+    return _Transition(
+        from_states=[expense_model.ExpenseState.DRAFT],
+        guard=orm.ExpenseORM.submitter_id == by,
+        values=dict(state=expense_model.ExpenseState.SUBMITTED),
+        replay=lambda expense: expense.submit(by),
+        event=_recorded(expense_events.ExpenseSubmitted, by=by),
+    )
+
+
+def _approval(by: UUID) -> _Transition:
+    return _Transition(
+        from_states=[expense_model.ExpenseState.SUBMITTED],
+        guard=orm.ExpenseORM.submitter_id != by,
+        values=dict(state=expense_model.ExpenseState.APPROVED, approved_by_id=by),
+        replay=lambda expense: expense.approve(by),
+        event=_recorded(expense_events.ExpenseApproved, by=by),
+    )
+
+
+def _withdrawal(by: UUID) -> _Transition:
+    return _Transition(
+        from_states=[
+            expense_model.ExpenseState.SUBMITTED,
+            expense_model.ExpenseState.DRAFT,
+        ],
+        guard=orm.ExpenseORM.submitter_id == by,
+        values=dict(state=expense_model.ExpenseState.WITHDRAWN),
+        replay=lambda expense: expense.withdraw(by),
+        event=_recorded(expense_events.ExpenseWithdrawn, by=by),
+    )
+
+
+def _revocation(by: UUID, reason: str) -> _Transition:
+    if not reason:
+        raise domain_exception.MissingReason
+
+    return _Transition(
+        from_states=[expense_model.ExpenseState.APPROVED],
+        guard=orm.ExpenseORM.approved_by_id == by,
+        values=dict(state=expense_model.ExpenseState.REVOKED, revoke_reason=reason),
+        replay=lambda expense: expense.revoke(by=by, reason=reason),
+        event=_recorded(expense_events.ExpenseApprovalRevoked, by=by, reason=reason),
+    )
+
+
+def _recorded(
+    event_type: type[expense_events.ExpenseEvent], **details
+) -> Callable[[expense_model.Expense], expense_events.ExpenseEvent]:
+    return lambda expense: event_type(
+        expense_id=expense.id, organization_id=expense.organization_id, **details
+    )
+
+
+def _update_changes(expense: expense_model.Expense) -> Update:
+    # Only write the columns the aggregate actually changed, and only over the
+    # version it was loaded at
+    return (
+        update(orm.ExpenseORM)
+        .where(
+            orm.ExpenseORM.id == expense.id,
+            orm.ExpenseORM.version == expense.version,
+        )
+        .values(
+            {field: getattr(expense, field) for field in expense.changed_fields}
+            | {"version": expense.version + 1}
+        )
+    )
+
+
+def _pending(
+    expenses: Iterable[expense_model.Expense],
+) -> Iterator[expense_model.Expense]:
+    return (
+        expense
+        for expense in expenses
+        if not expense.is_persisted or expense.changed_fields
+    )
+
+
+def _summary_rows(batch: Sequence[expense_model.Expense]) -> Select:
+    """Summary values of the stored versions, an upsert may overwrite any of them.
+
+    The rows stay locked until commit so a concurrent batch cannot subtract the
+    same previous values a second time.
+    """
+    table = orm.ExpenseORM.__table__
+    return (
+        select(*(table.c[name] for name in SUMMARY_FIELDS))
+        .where(table.c.id.in_([expense.id for expense in batch]))
+        .with_for_update()
+    )
+
+
+def _upsert(
+    session: Session | AsyncSession, batch: Sequence[expense_model.Expense]
+) -> tuple[Insert, list[dict]]:
+    """Returns the ids of the rows written, a stored newer version is left as is."""
+    table = orm.ExpenseORM.__table__
+    stmt = dialect_insert(session, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.id],
+        set_={
+            **{
+                column.name: stmt.excluded[column.name]
+                for column in table.columns
+                if column.name not in ("id", "created", "last_modified")
+            },
+            "last_modified": datetime.now(UTC),
+        },
+        where=table.c.version == stmt.excluded.version - 1,
+    )
+    return stmt.returning(table.c.id), [
+        orm.ExpenseORM.values_from_domain(expense) for expense in batch
+    ]
+
+
+def _new_receipts(
+    session: Session | AsyncSession, batch: Sequence[expense_model.Expense]
+) -> Optional[Insert]:
+    """Queues the receipts the expenses start to reference, each hash only once.
+
+    Free-form references name no stored receipt, they get no job.
+    """
+    references = {
+        expense.document_reference
+        for expense in batch
+        if expense.document_reference is not None
+        and DIGEST.fullmatch(expense.document_reference)
+        and (not expense.is_persisted or "document_reference" in expense.changed_fields)
+    }
+    if not references:
+        return None
+    table = orm.ReceiptJobORM.__table__
+    return (
+        dialect_insert(session, table)
+        .values([dict(document_reference=reference) for reference in references])
+        .on_conflict_do_nothing(index_elements=[table.c.document_reference])
+    )
+
+
+def _pull_events(
+    batch: Sequence[expense_model.Expense],
+) -> list[expense_events.ExpenseEvent]:
+    return [event for expense in batch for event in expense.pull_events()]
+
+
+def _outbox(
+    recorded: Iterable[expense_events.ExpenseEvent],
+) -> Optional[tuple[Insert, list[dict]]]:
+    """Outbox rows for the events, to be written in the transaction of the change."""
+    rows = [orm.OutboxMessageORM.values_from_event(event) for event in recorded]
+    if not rows:
+        return None
+    return insert(orm.OutboxMessageORM), rows
+
+
+def _by_ids(expense_ids: Collection[UUID]) -> Select:
+    return select(orm.ExpenseORM).where(orm.ExpenseORM.id.in_(set(expense_ids)))
+
+
+def _to_found(expense_orms: Sequence[orm.ExpenseORM]) -> list[expense_model.Expense]:
+    if not expense_orms:
+        raise exception.NoExpenseFound
+
+    return [expense_orm.to_domain() for expense_orm in expense_orms]
+
+
+def _page_query(
+    owner: ColumnElement[bool],
+    filters: repository.ExpenseFilter,
+    after: Optional[repository.ExpenseCursor],
+    limit: int,
+) -> Select:
+    stmt = _listing(owner, filters)
+    if after is not None:
+        stmt = stmt.where(after_clause(after))
+    # One extra row tells whether there is a next page
+    return stmt.limit(limit + 1)
+
+
+def _to_page(
+    expense_orms: Sequence[orm.ExpenseORM], limit: int
+) -> repository.ExpensePage:
+    expenses = [expense_orm.to_domain() for expense_orm in expense_orms[:limit]]
+    if len(expense_orms) <= limit:
+        return repository.ExpensePage(expenses)
+    return repository.ExpensePage(
+        expenses, next_cursor=repository.ExpenseCursor.after(expenses[-1])
+    )
+
+
+def _of_organization(org_id: UUID) -> ColumnElement[bool]:
+    return orm.ExpenseORM.organization_id == org_id
+
+
+def _of_user(user_id: UUID) -> ColumnElement[bool]:
+    return or_(
+        orm.ExpenseORM.submitter_id == user_id,
+        orm.ExpenseORM.approved_by_id == user_id,
+    )
+
+
+def _listing(owner: ColumnElement[bool], filters: repository.ExpenseFilter) -> Select:
+    return (
+        select(orm.ExpenseORM)
+        .where(owner, *filter_clauses(filters))
+        .order_by(orm.ExpenseORM.date, orm.ExpenseORM.id)
+    )
+
+
+def after_clause(after: repository.ExpenseCursor) -> ColumnElement[bool]:
+    """Keyset predicate for the rows past `after` in `(date, id)` order."""
+    return or_(
+        orm.ExpenseORM.date > after.date,
+        and_(orm.ExpenseORM.date == after.date, orm.ExpenseORM.id > after.id),
+    )
+
+
+def filter_clauses(filters: repository.ExpenseFilter) -> list[ColumnElement[bool]]:
+    """WHERE clauses for an `ExpenseFilter` on the expenses table."""
+    clauses = []
+    if filters.states is not None and len(filters.states) == 1:
+        # Inlined, a bound parameter cannot be matched against the partial index
+        (state,) = filters.states
+        clauses.append(
+            orm.ExpenseORM.state
+            == literal(state, orm.ExpenseORM.state.type, literal_execute=True)
+        )
+    elif filters.states is not None:
+        clauses.append(orm.ExpenseORM.state.in_(filters.states))
+    if filters.categories is not None:
+        clauses.append(orm.ExpenseORM.category.in_(filters.categories))
+    if filters.date_from is not None:
+        clauses.append(orm.ExpenseORM.date >= filters.date_from)
+    if filters.date_to is not None:
+        clauses.append(orm.ExpenseORM.date < filters.date_to)
+    return clauses
 
 
 class FakeExpenseRepository(repository.IExpenseRepository):
+    """Keeps copies, like rows they only change on save and reads return new ones."""
+
     def __init__(self, expenses: Optional[list[expense_model.Expense]] = None):
         self._expenses = (
-            {expense.id: expense for expense in expenses} if expenses else {}
+            {expense.id: _detached(expense) for expense in expenses} if expenses else {}
         )
+        # What the outbox would hold, in order
+        self.events: list[expense_events.ExpenseEvent] = []
 
     def get(self, expense_id: UUID) -> expense_model.Expense:
         expense = self._expenses.get(expense_id, None)
         if not expense:
             raise exception.NoExpenseFound
-        return expense
+        return _detached(expense)
 
     def save(self, expense: expense_model.Expense) -> None:
-        self._expenses[expense.id] = expense
+        if expense.is_persisted and not expense.changed_fields:
+            return
+        stored = self._expenses.get(expense.id)
+        if stored is not None and stored.version != expense.version:
+            raise domain_exception.ExpenseVersionConflict
+        self.events.extend(expense.pull_events())
+        expense.mark_persisted(version=expense.version + 1)
+        self._expenses[expense.id] = _detached(expense)
+
+    def save_many(self, expenses: Iterable[expense_model.Expense]) -> None:
+        for expense in expenses:
+            self.save(expense)
+
+    def submit(self, expense_id: UUID, by: UUID) -> expense_model.Expense:
+        expense = self.get(expense_id)
+        expense.submit(by)
+        self.save(expense)
+        return expense
+
+    def approve(self, expense_id: UUID, by: UUID) -> expense_model.Expense:
+        expense = self.get(expense_id)
+        expense.approve(by)
+        self.save(expense)
+        return expense
+
+    def submit_many(
+        self, expense_ids: Collection[UUID], by: UUID
+    ) -> list[expense_model.Expense]:
+        return self._transition_many(expense_ids, lambda expense: expense.submit(by))
+
+    def approve_many(
+        self, expense_ids: Collection[UUID], by: UUID
+    ) -> list[expense_model.Expense]:
+        return self._transition_many(expense_ids, lambda expense: expense.approve(by))
+
+    def withdraw(self, expense_id: UUID, by: UUID) -> expense_model.Expense:
+        expense = self.get(expense_id)
+        expense.withdraw(by)
+        self.save(expense)
+        return expense
+
+    def revoke(self, expense_id: UUID, by: UUID, reason: str) -> expense_model.Expense:
+        expense = self.get(expense_id)
+        expense.revoke(by=by, reason=reason)
+        self.save(expense)
+        return expense
+
+    def get_many(
+        self, expense_ids: Collection[UUID]
+    ) -> dict[UUID, expense_model.Expense]:
+        return {
+            expense_id: _detached(self._expenses[expense_id])
+            for expense_id in expense_ids
+            if expense_id in self._expenses
+        }
 
     def find_by_organization(self, org_id: UUID) -> list[expense_model.Expense]:
         expenses = [
-            expense
+            _detached(expense)
             for expense in self._expenses.values()
             if expense.organization_id == org_id
         ]
@@ -79,10 +789,191 @@ class FakeExpenseRepository(repository.IExpenseRepository):
 
     def find_by_user(self, user_id: UUID) -> list[expense_model.Expense]:
         expenses = [
-            expense
+            _detached(expense)
             for expense in self._expenses.values()
             if expense.submitter_id == user_id or expense.approved_by_id == user_id
         ]
         if not expenses:
             raise exception.NoExpenseFound
         return expenses
+
+    def find_page_by_organization(
+        self,
+        org_id: UUID,
+        filters: repository.ExpenseFilter = repository.ExpenseFilter(),
+        after: Optional[repository.ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> repository.ExpensePage:
+        return self._page(self.stream_by_organization(org_id, filters), after, limit)
+
+    def find_page_by_user(
+        self,
+        user_id: UUID,
+        filters: repository.ExpenseFilter = repository.ExpenseFilter(),
+        after: Optional[repository.ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> repository.ExpensePage:
+        return self._page(self.stream_by_user(user_id, filters), after, limit)
+
+    def stream_by_organization(
+        self,
+        org_id: UUID,
+        filters: repository.ExpenseFilter = repository.ExpenseFilter(),
+    ) -> Iterator[expense_model.Expense]:
+        return self._listing(lambda expense: expense.organization_id == org_id, filters)
+
+    def stream_by_user(
+        self,
+        user_id: UUID,
+        filters: repository.ExpenseFilter = repository.ExpenseFilter(),
+    ) -> Iterator[expense_model.Expense]:
+        return self._listing(
+            lambda expense: (
+                expense.submitter_id == user_id or expense.approved_by_id == user_id
+            ),
+            filters,
+        )
+
+    # helper
+    def _transition_many(
+        self,
+        expense_ids: Collection[UUID],
+        transition: Callable[[expense_model.Expense], None],
+    ) -> list[expense_model.Expense]:
+        expenses = []
+        for expense in self.get_many(expense_ids).values():
+            try:
+                transition(expense)
+            except domain_exception.ExpenseRuleViolation:
+                continue
+            self.save(expense)
+            expenses.append(expense)
+        return expenses
+
+    def _listing(
+        self,
+        owner: Callable[[expense_model.Expense], bool],
+        filters: repository.ExpenseFilter,
+    ) -> Iterator[expense_model.Expense]:
+        expenses = sorted(
+            (
+                _detached(expense)
+                for expense in self._expenses.values()
+                if owner(expense) and filters.matches(expense)
+            ),
+            key=lambda expense: (expense.date, expense.id),
+        )
+        return iter(expenses)
+
+    def _page(
+        self,
+        expenses: Iterator[expense_model.Expense],
+        after: Optional[repository.ExpenseCursor],
+        limit: int,
+    ) -> repository.ExpensePage:
+        if after is not None:
+            expenses = (
+                expense
+                for expense in expenses
+                if (expense.date, expense.id) > (after.date, after.id)
+            )
+        items = list(islice(expenses, limit + 1))
+        if len(items) <= limit:
+            return repository.ExpensePage(items)
+        return repository.ExpensePage(
+            items[:limit], next_cursor=repository.ExpenseCursor.after(items[limit - 1])
+        )
+
+
+def _detached(expense: expense_model.Expense) -> expense_model.Expense:
+    """A copy with no changes or events, as read back from the database."""
+    return expense_model.Expense.from_persisted(
+        *(getattr(expense, name) for name in expense_model.EXPENSE_FIELDS)
+    )
+
+
+class AsyncFakeExpenseRepository(repository.IAsyncExpenseRepository):
+    """Awaitable facade over `FakeExpenseRepository`."""
+
+    def __init__(self, expenses: Optional[list[expense_model.Expense]] = None):
+        self._expense_repo = FakeExpenseRepository(expenses)
+
+    async def get(self, expense_id: UUID) -> expense_model.Expense:
+        return self._expense_repo.get(expense_id)
+
+    async def get_many(
+        self, expense_ids: Collection[UUID]
+    ) -> dict[UUID, expense_model.Expense]:
+        return self._expense_repo.get_many(expense_ids)
+
+    async def save(self, expense: expense_model.Expense) -> None:
+        self._expense_repo.save(expense)
+
+    async def save_many(self, expenses: Iterable[expense_model.Expense]) -> None:
+        self._expense_repo.save_many(expenses)
+
+    async def submit(self, expense_id: UUID, by: UUID) -> expense_model.Expense:
+        return self._expense_repo.submit(expense_id, by)
+
+    async def approve(self, expense_id: UUID, by: UUID) -> expense_model.Expense:
+        return self._expense_repo.approve(expense_id, by)
+
+    async def submit_many(
+        self, expense_ids: Collection[UUID], by: UUID
+    ) -> list[expense_model.Expense]:
+        return self._expense_repo.submit_many(expense_ids, by)
+
+    async def approve_many(
+        self, expense_ids: Collection[UUID], by: UUID
+    ) -> list[expense_model.Expense]:
+        return self._expense_repo.approve_many(expense_ids, by)
+
+    async def withdraw(self, expense_id: UUID, by: UUID) -> expense_model.Expense:
+        return self._expense_repo.withdraw(expense_id, by)
+
+    async def revoke(
+        self, expense_id: UUID, by: UUID, reason: str
+    ) -> expense_model.Expense:
+        return self._expense_repo.revoke(expense_id, by, reason)
+
+    async def find_by_organization(self, org_id: UUID) -> list[expense_model.Expense]:
+        return self._expense_repo.find_by_organization(org_id)
+
+    async def find_by_user(self, user_id: UUID) -> list[expense_model.Expense]:
+        return self._expense_repo.find_by_user(user_id)
+
+    async def find_page_by_organization(
+        self,
+        org_id: UUID,
+        filters: repository.ExpenseFilter = repository.ExpenseFilter(),
+        after: Optional[repository.ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> repository.ExpensePage:
+        return self._expense_repo.find_page_by_organization(
+            org_id, filters, after, limit
+        )
+
+    async def find_page_by_user(
+        self,
+        user_id: UUID,
+        filters: repository.ExpenseFilter = repository.ExpenseFilter(),
+        after: Optional[repository.ExpenseCursor] = None,
+        limit: int = 50,
+    ) -> repository.ExpensePage:
+        return self._expense_repo.find_page_by_user(user_id, filters, after, limit)
+
+    async def stream_by_organization(
+        self,
+        org_id: UUID,
+        filters: repository.ExpenseFilter = repository.ExpenseFilter(),
+    ) -> AsyncIterator[expense_model.Expense]:
+        for expense in self._expense_repo.stream_by_organization(org_id, filters):
+            yield expense
+
+    async def stream_by_user(
+        self,
+        user_id: UUID,
+        filters: repository.ExpenseFilter = repository.ExpenseFilter(),
+    ) -> AsyncIterator[expense_model.Expense]:
+        for expense in self._expense_repo.stream_by_user(user_id, filters):
+            yield expense
@@ -0,0 +1,242 @@
+"""Incremental upkeep of the `expense_summaries` spend table.
+
+Rebuild it from the expenses table and report drift with
+`python -m src.expense_management.infrastructure.summary [--check]`.
+"""
+
+import argparse
+import math
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import Insert, delete, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src._shared.infrastructure import orm
+from src._shared.infrastructure.database import (
+    as_date,
+    dialect_insert,
+    month_start,
+    session_factory,
+)
+from src.expense_management.domain import model as expense_model
+
+
+@dataclass(frozen=True)
+class SummaryKey:
+    organization_id: UUID
+    period: date
+    category: expense_model.ExpenseCategory
+    state: expense_model.ExpenseState
+
+
+@dataclass(frozen=True)
+class SummaryDrift:
+    key: SummaryKey
+    stored_amount: float
+    stored_count: int
+    expected_amount: float
+    expected_count: int
+
+
+def period_of(moment: datetime) -> date:
+    return moment.date().replace(day=1)
+
+
+class SummaryChanges:
+    """Amount and count deltas per summary row, applied as one upsert."""
+
+    def __init__(self):
+        self._deltas: dict[SummaryKey, list] = defaultdict(lambda: [0.0, 0])
+
+    def add(
+        self,
+        organization_id: UUID,
+        date: datetime,
+        category: expense_model.ExpenseCategory,
+        state: expense_model.ExpenseState,
+        amount: float,
+        count: int = 1,
+    ):
+        delta = self._deltas[
+            SummaryKey(organization_id, period_of(date), category, state)
+        ]
+        delta[0] += amount * count
+        delta[1] += count
+
+    def remove(self, **values):
+        self.add(**values, count=-1)
+
+    def move(
+        self, expense: expense_model.Expense, from_state: expense_model.ExpenseState
+    ):
+        """Account for a state transition of an otherwise unchanged expense."""
+        self.remove(**summary_values(expense, state=from_state))
+        self.add(**summary_values(expense))
+
+    def save(self, expense: expense_model.Expense):
+        """Account for `expense` being inserted, or updated by its tracked changes."""
+        if expense.is_persisted:
+            if not expense.changed_fields & SUMMARY_FIELDS:
+                return
+            self.remove(**persisted_summary_values(expense))
+        self.add(**summary_values(expense))
+
+    def upsert(self, session: Session | AsyncSession) -> Optional[tuple[Insert, list]]:
+        """Statement and rows adding the deltas, None when there is nothing to add."""
+        rows = [
+            dict(
+                organization_id=key.organization_id,
+                period=key.period,
+                category=key.category,
+                state=key.state,
+                total_amount=amount,
+                expense_count=count,
+            )
+            for key, (amount, count) in self._deltas.items()
+            if count or amount
+        ]
+        if not rows:
+            return None
+
+        table = orm.ExpenseSummaryORM.__table__
+        stmt = dialect_insert(session, table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[column for column in table.primary_key],
+            set_=dict(
+                total_amount=table.c.total_amount + stmt.excluded.total_amount,
+                expense_count=table.c.expense_count + stmt.excluded.expense_count,
+            ),
+        )
+        return stmt, rows
+
+    def apply(self, session: Session) -> None:
+        if (upsert := self.upsert(session)) is not None:
+            session.execute(*upsert)
+
+    async def apply_async(self, session: AsyncSession) -> None:
+        if (upsert := self.upsert(session)) is not None:
+            await session.execute(*upsert)
+
+
+SUMMARY_FIELDS = frozenset(("organization_id", "date", "category", "state", "amount"))
+
+
+def summary_values(expense: expense_model.Expense, **overrides) -> dict:
+    return {name: getattr(expense, name) for name in SUMMARY_FIELDS} | overrides
+
+
+def persisted_summary_values(expense: expense_model.Expense) -> dict:
+    return {name: expense.persisted_value(name) for name in SUMMARY_FIELDS}
+
+
+def rebuild_spend_summary(
+    session: Session, check_only: bool = False
+) -> list[SummaryDrift]:
+    """Recompute the summary from the expenses table and return rows that drifted.
+
+    Writers are held off the summary table while it is rebuilt, so deltas they
+    commit meanwhile land on the rebuilt rows instead of being deleted with the
+    old ones.
+    """
+    if not check_only and session.get_bind().dialect.name == "postgresql":
+        session.execute(
+            text(
+                f"LOCK TABLE {orm.ExpenseSummaryORM.__tablename__} "
+                "IN SHARE ROW EXCLUSIVE MODE"
+            )
+        )
+    period = month_start(session, orm.ExpenseORM.date)
+    expected = {
+        SummaryKey(row.organization_id, as_date(row.period), row.category, row.state): (
+            row.total_amount,
+            row.expense_count,
+        )
+        for row in session.execute(
+            select(
+                orm.ExpenseORM.organization_id,
+                period.label("period"),
+                orm.ExpenseORM.category,
+                orm.ExpenseORM.state,
+                func.sum(orm.ExpenseORM.amount).label("total_amount"),
+                func.count().label("expense_count"),
+            ).group_by(
+                orm.ExpenseORM.organization_id,
+                period,
+                orm.ExpenseORM.category,
+                orm.ExpenseORM.state,
+            )
+        )
+    }
+    stored = {
+        SummaryKey(row.organization_id, row.period, row.category, row.state): (
+            row.total_amount,
+            row.expense_count,
+        )
+        for row in session.scalars(select(orm.ExpenseSummaryORM))
+        if row.expense_count
+    }
+
+    drifts = [
+        SummaryDrift(
+            key,
+            stored_amount=stored.get(key, (0.0, 0))[0],
+            stored_count=stored.get(key, (0.0, 0))[1],
+            expected_amount=expected.get(key, (0.0, 0))[0],
+            expected_count=expected.get(key, (0.0, 0))[1],
+        )
+        for key in expected.keys() | stored.keys()
+        if not _same(stored.get(key), expected.get(key))
+    ]
+
+    if not check_only:
+        session.execute(delete(orm.ExpenseSummaryORM))
+        session.add_all(
+            orm.ExpenseSummaryORM(
+                organization_id=key.organization_id,
+                period=key.period,
+                category=key.category,
+                state=key.state,
+                total_amount=amount,
+                expense_count=count,
+            )
+            for key, (amount, count) in expected.items()
+        )
+        session.commit()
+    return drifts
+
+
+def _same(stored: Optional[tuple], expected: Optional[tuple]) -> bool:
+    stored_amount, stored_count = stored or (0.0, 0)
+    expected_amount, expected_count = expected or (0.0, 0)
+    return stored_count == expected_count and math.isclose(
+        stored_amount, expected_amount, rel_tol=1e-9, abs_tol=1e-6
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--check", action="store_true", help="only report drift, do not rewrite"
+    )
+    args = parser.parse_args()
+
+    with session_factory()() as session:
+        drifts = rebuild_spend_summary(session, check_only=args.check)
+
+    for drift in drifts:
+        print(
+            f"{drift.key.organization_id} {drift.key.period} "
+            f"{drift.key.category.name} {drift.key.state.name}: "
+            f"stored {drift.stored_count} / {drift.stored_amount:.2f}, "
+            f"expected {drift.expected_count} / {drift.expected_amount:.2f}"
+        )
+    print(f"{len(drifts)} summary rows drifted")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+from typing import Annotated, Optional
+from uuid import UUID
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy.orm import Session
+
+from src._shared.infrastructure.database import get_db_session
+from src.iam.infrastructure import exception
+from src.iam.infrastructure.repository import SqlAlchemyUserRepository
+from src.iam.infrastructure.tokens import TokenSigner, get_token_signer
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+def get_current_user_id(
+    credentials: Annotated[Optional[HTTPAuthorizationCredentials], Depends(_bearer)],
+    signer: Annotated[Optional[TokenSigner], Depends(get_token_signer)],
+) -> UUID:
+    """Acting user, from the bearer token the request is authenticated with."""
+    if signer is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication is not configured",
+        )
+    if credentials is None:
+        raise _unauthenticated()
+    try:
+        return signer.verify(credentials.credentials)
+    except exception.InvalidToken:
+        raise _unauthenticated()
+
+
+def _unauthenticated() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def get_user_repository(
+    session: Annotated[Session, Depends(get_db_session)],
+) -> SqlAlchemyUserRepository:
+    return SqlAlchemyUserRepository(session)
+
+
+CurrentUserId = Annotated[UUID, Depends(get_current_user_id)]
+UserRepository = Annotated[SqlAlchemyUserRepository, Depends(get_user_repository)]
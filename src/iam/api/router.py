@@ -0,0 +1,22 @@
+from fastapi import HTTPException, Response, status
+from fastapi.routing import APIRouter
+
+from src._shared.api.serialization import DomainSerializer
+from src.iam.api.dependency import CurrentUserId, UserRepository
+from src.iam.api.schemas import UserResponse
+from src.iam.domain import model as user_model
+from src.iam.infrastructure import exception
+
+router = APIRouter(prefix="/users")
+
+_USERS = DomainSerializer(user_model.User, UserResponse)
+
+
+@router.get("/me", response_model=UserResponse)
+def get_current_user(user_id: CurrentUserId, user_repo: UserRepository):
+    try:
+        user = user_repo.get(user_id)
+    except exception.UserNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+    return Response(_USERS.one(user), media_type="application/json")
@@ -0,0 +1,11 @@
+from uuid import UUID
+
+from pydantic import BaseModel
+
+
+class UserResponse(BaseModel):
+    id: UUID
+    name: str
+    email: str
+    role: str
+    organization_id: UUID
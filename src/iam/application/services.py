@@ -1,9 +1,16 @@
-from src.expense_management.application.services import ExpenseAuthorizationContract
-from src.iam.domain.repository import IUserRepository
+from typing import Optional
+from src.expense_management.application.services import (
+    AsyncExpenseAuthorizationContract,
+    ExpenseAuthorizationContract,
+)
+from src.iam.domain.repository import IAsyncUserRepository, IUserRepository
+from src.iam.domain.model import Principal, UserRole
 from uuid import UUID
 
 
 class AuthorizationService(ExpenseAuthorizationContract):
+    """Every decision is made from a single principal lookup."""
+
     def __init__(self, user_repo: IUserRepository):
         self._user_repo = user_repo
 
@@ -14,18 +21,64 @@ class AuthorizationService(ExpenseAuthorizationContract):
         if submitter_id == approver_id:
             return False
 
-        if not self._user_repo.has_role(approver_id, "APPROVER"):
-            return False
-
-        return self._user_repo.is_same_organization(approver_id, organization_id)
+        return self.can_view_organization_expenses(approver_id, organization_id)
 
     def can_submit_expense(self, user_id: UUID):
-        return self._user_repo.has_role(
-            user_id, "SUBMITTER"
-        ) | self._user_repo.has_role(user_id, "APPROVER")
+        return _can_submit(self._user_repo.get_principal(user_id))
 
     def is_approver(self, user_id: UUID) -> bool:
-        return self._user_repo.has_role(user_id, "APPROVER")
+        return _is_approver(self._user_repo.get_principal(user_id))
 
     def is_same_organization(self, user_id: UUID, org_id: UUID):
-        return self._user_repo.is_same_organization(user_id=user_id, org_id=org_id)
+        return _is_member(self._user_repo.get_principal(user_id), org_id)
+
+    def can_view_organization_expenses(self, user_id: UUID, org_id: UUID) -> bool:
+        return _can_view_organization(self._user_repo.get_principal(user_id), org_id)
+
+
+class AsyncAuthorizationService(AsyncExpenseAuthorizationContract):
+    """`AuthorizationService` on an async user repository, same decisions."""
+
+    def __init__(self, user_repo: IAsyncUserRepository):
+        self._user_repo = user_repo
+
+    async def can_approve_expense(
+        self, submitter_id: UUID, approver_id: UUID, organization_id: UUID
+    ) -> bool:
+        if submitter_id == approver_id:
+            return False
+
+        return await self.can_view_organization_expenses(approver_id, organization_id)
+
+    async def can_submit_expense(self, user_id: UUID) -> bool:
+        return _can_submit(await self._user_repo.get_principal(user_id))
+
+    async def is_approver(self, user_id: UUID) -> bool:
+        return _is_approver(await self._user_repo.get_principal(user_id))
+
+    async def is_same_organization(self, user_id: UUID, org_id: UUID) -> bool:
+        return _is_member(await self._user_repo.get_principal(user_id), org_id)
+
+    async def can_view_organization_expenses(self, user_id: UUID, org_id: UUID) -> bool:
+        return _can_view_organization(
+            await self._user_repo.get_principal(user_id), org_id
+        )
+
+
+def _can_submit(principal: Optional[Principal]) -> bool:
+    return principal is not None and principal.role in (
+        UserRole.SUBMITTER,
+        UserRole.APPROVER,
+    )
+
+
+def _is_approver(principal: Optional[Principal]) -> bool:
+    return principal is not None and principal.role == UserRole.APPROVER
+
+
+def _is_member(principal: Optional[Principal], org_id: UUID) -> bool:
+    return principal is not None and principal.organization_id == org_id
+
+
+def _can_view_organization(principal: Optional[Principal], org_id: UUID) -> bool:
+    return _is_approver(principal) and principal.organization_id == org_id
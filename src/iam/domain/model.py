@@ -9,10 +9,19 @@ class UserRole(Enum):
     ADMIN = auto()
 
 
-@dataclass(kw_only=True)
+@dataclass(kw_only=True, slots=True)
 class User:
     id: UUID = field(default_factory=uuid4)
     name: str
     email: str
     role: UserRole
     organization_id: UUID
+
+
+@dataclass(frozen=True, kw_only=True, slots=True)
+class Principal:
+    """The part of a user authorization decisions are based on."""
+
+    id: UUID
+    role: UserRole
+    organization_id: UUID
@@ -1,4 +1,4 @@
-from typing import Protocol
+from typing import Iterable, Optional, Protocol
 from uuid import UUID
 from src.iam.domain import model as user_model
 
@@ -11,3 +11,21 @@ class IUserRepository(Protocol):
     def exists(self, user_id: UUID) -> bool: ...
 
     def get(self, user_id: UUID) -> user_model.User: ...
+
+    def get_principal(self, user_id: UUID) -> Optional[user_model.Principal]: ...
+
+    def get_principals(
+        self, user_ids: Iterable[UUID]
+    ) -> dict[UUID, user_model.Principal]: ...
+
+
+class IAsyncUserRepository(Protocol):
+    async def exists(self, user_id: UUID) -> bool: ...
+
+    async def get(self, user_id: UUID) -> user_model.User: ...
+
+    async def get_principal(self, user_id: UUID) -> Optional[user_model.Principal]: ...
+
+    async def get_principals(
+        self, user_ids: Iterable[UUID]
+    ) -> dict[UUID, user_model.Principal]: ...
@@ -0,0 +1,265 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from threading import Lock
+from typing import Callable, Iterable, Optional
+from uuid import UUID
+from weakref import WeakSet
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from src._shared.config import get_settings
+from src._shared.infrastructure import orm
+from src.iam.domain import model as user_model
+from src.iam.domain import repository
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+
+
+class PrincipalCache:
+    """Process wide, bounded LRU of resolved principals with a time to live."""
+
+    def __init__(
+        self,
+        maxsize: int = 4096,
+        ttl: float = 60,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[UUID, tuple[float, user_model.Principal]] = (
+            OrderedDict()
+        )
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, user_id: UUID) -> Optional[user_model.Principal]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] <= self._clock():
+                self._misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self._hits += 1
+            return entry[1]
+
+    def put(self, principal: user_model.Principal) -> None:
+        with self._lock:
+            self._entries[principal.id] = (self._clock() + self._ttl, principal)
+            self._entries.move_to_end(principal.id)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, user_id: UUID) -> None:
+        """Drop a user, e.g. after their role or organization changed."""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                size=len(self._entries),
+            )
+
+
+class CachedUserRepository(repository.IUserRepository):
+    """Answers authorization lookups from a shared `PrincipalCache`."""
+
+    def __init__(self, user_repo: repository.IUserRepository, cache: PrincipalCache):
+        self._user_repo = user_repo
+        self._cache = cache
+
+    def has_role(self, user_id: UUID, role: str) -> bool:
+        principal = self._principal(user_id)
+        return principal.role.name == role if principal else False
+
+    def is_same_organization(self, user_id: UUID, org_id: UUID) -> bool:
+        principal = self._principal(user_id)
+        return principal.organization_id == org_id if principal else False
+
+    def exists(self, user_id: UUID) -> bool:
+        return self._principal(user_id) is not None
+
+    def get(self, user_id: UUID) -> user_model.User:
+        return self._user_repo.get(user_id)
+
+    def get_principal(self, user_id: UUID) -> Optional[user_model.Principal]:
+        return self._principal(user_id)
+
+    def get_principals(
+        self, user_ids: Iterable[UUID]
+    ) -> dict[UUID, user_model.Principal]:
+        principals = {}
+        missing = []
+        for user_id in set(user_ids):
+            principal = self._cache.get(user_id)
+            if principal is None:
+                missing.append(user_id)
+            else:
+                principals[user_id] = principal
+
+        if missing:
+            loaded = self._user_repo.get_principals(missing)
+            for principal in loaded.values():
+                self._cache.put(principal)
+            principals.update(loaded)
+        return principals
+
+    # helper
+    def _principal(self, user_id: UUID) -> Optional[user_model.Principal]:
+        principal = self._cache.get(user_id)
+        if principal is not None:
+            return principal
+
+        # Unknown users are not cached, they may be created any moment
+        principal = self._user_repo.get_principal(user_id)
+        if principal is not None:
+            self._cache.put(principal)
+        return principal
+
+
+class AsyncCachedUserRepository(repository.IAsyncUserRepository):
+    """`CachedUserRepository` in front of an async repository, sharing the cache."""
+
+    def __init__(
+        self, user_repo: repository.IAsyncUserRepository, cache: PrincipalCache
+    ):
+        self._user_repo = user_repo
+        self._cache = cache
+
+    async def exists(self, user_id: UUID) -> bool:
+        return await self.get_principal(user_id) is not None
+
+    async def get(self, user_id: UUID) -> user_model.User:
+        return await self._user_repo.get(user_id)
+
+    async def get_principal(self, user_id: UUID) -> Optional[user_model.Principal]:
+        principal = self._cache.get(user_id)
+        if principal is not None:
+            return principal
+
+        principal = await self._user_repo.get_principal(user_id)
+        if principal is not None:
+            self._cache.put(principal)
+        return principal
+
+    async def get_principals(
+        self, user_ids: Iterable[UUID]
+    ) -> dict[UUID, user_model.Principal]:
+        principals = {}
+        missing = []
+        for user_id in set(user_ids):
+            principal = self._cache.get(user_id)
+            if principal is None:
+                missing.append(user_id)
+            else:
+                principals[user_id] = principal
+
+        if missing:
+            loaded = await self._user_repo.get_principals(missing)
+            for principal in loaded.values():
+                self._cache.put(principal)
+            principals.update(loaded)
+        return principals
+
+
+# Caches to evict from, and the users to evict per session until it commits
+_watched: WeakSet[PrincipalCache] = WeakSet()
+_listening = False
+_CHANGED_USERS = "principal_cache.changed_users"
+# Stands in for every user, the rows of a bulk statement are not known
+_EVERYONE = object()
+
+
+def invalidate_on_user_change(cache: PrincipalCache) -> None:
+    """Evict users whose role or organization is changed through a `Session`.
+
+    Flushed changes evict the user. Bulk UPDATE and DELETE statements on the users
+    table, ORM or Core, clear the whole cache as their rows are not known. Writes
+    on a bare `Connection` bypass the session and are only caught by the TTL.
+
+    Evictions wait for the commit, before it a concurrent request could still read
+    the old row and cache it again. Rolled back changes evict nothing. The session
+    listeners are registered once, caches are held weakly.
+    """
+    global _listening
+    _watched.add(cache)
+    if not _listening:
+        event.listen(Session, "do_orm_execute", _bulk_write)
+        event.listen(Session, "after_flush", _collect_changed_users)
+        event.listen(Session, "after_commit", _evict_changed_users)
+        event.listen(Session, "after_rollback", _discard_changed_users)
+        _listening = True
+
+
+def _changed_users(session: Session) -> set:
+    return session.info.setdefault(_CHANGED_USERS, set())
+
+
+def _bulk_write(orm_execute_state: ORMExecuteState):
+    statement = orm_execute_state.statement
+    if (
+        orm_execute_state.is_update or orm_execute_state.is_delete
+    ) and statement.table.name == orm.UserORM.__tablename__:
+        _changed_users(orm_execute_state.session).add(_EVERYONE)
+
+
+def _collect_changed_users(session: Session, flush_context):
+    # Still the pre-flush state, history included
+    for target in session.dirty:
+        if isinstance(target, orm.UserORM):
+            state = inspect(target)
+            if (
+                state.attrs.role.history.has_changes()
+                or state.attrs.organization_id.history.has_changes()
+            ):
+                _changed_users(session).add(target.id)
+    for target in session.deleted:
+        if isinstance(target, orm.UserORM):
+            _changed_users(session).add(target.id)
+
+
+def _evict_changed_users(session: Session):
+    changed = session.info.pop(_CHANGED_USERS, None)
+    if not changed:
+        return
+    for cache in list(_watched):
+        if _EVERYONE in changed:
+            cache.clear()
+        else:
+            for user_id in changed:
+                cache.invalidate(user_id)
+
+
+def _discard_changed_users(session: Session):
+    session.info.pop(_CHANGED_USERS, None)
+
+
+@lru_cache(maxsize=1)
+def get_principal_cache() -> PrincipalCache:
+    settings = get_settings()
+    cache = PrincipalCache(
+        maxsize=settings.principal_cache.maxsize,
+        ttl=settings.principal_cache.ttl_seconds,
+    )
+    invalidate_on_user_change(cache)
+    return cache
@@ -1,2 +1,6 @@
 class UserNotFound(Exception):
     pass
+
+
+class InvalidToken(Exception):
+    pass
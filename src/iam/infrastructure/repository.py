@@ -1,8 +1,10 @@
 from uuid import UUID
-from typing import Optional
+from typing import Iterable, Optional
 from src.iam.infrastructure import exception
 from src.iam.domain import repository
 from src.iam.domain import model as user_model
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from src._shared.infrastructure import orm
 
@@ -13,15 +15,15 @@ class SqlAlchemyUserRepository(repository.IUserRepository):
         self._session = session
 
     def has_role(self, user_id: UUID, role: str) -> bool:
-        user_orm = self._session.get(orm.UserORM, user_id)
-        return user_orm.role.name == role if user_orm else False
+        principal = self.get_principal(user_id)
+        return principal.role.name == role if principal else False
 
     def is_same_organization(self, user_id: UUID, org_id: UUID) -> bool:
-        user_orm = self._session.get(orm.UserORM, user_id)
-        return user_orm.organization_id == org_id if user_orm else False
+        principal = self.get_principal(user_id)
+        return principal.organization_id == org_id if principal else False
 
     def exists(self, user_id: UUID):
-        return self._session.get(orm.UserORM, user_id) is not None
+        return self.get_principal(user_id) is not None
 
     def get(self, user_id: UUID):
         user = self._session.get(orm.UserORM, user_id)
@@ -29,6 +31,54 @@ class SqlAlchemyUserRepository(repository.IUserRepository):
             raise exception.UserNotFound
         return user.to_domain()
 
+    def get_principal(self, user_id: UUID) -> Optional[user_model.Principal]:
+        row = self._session.execute(
+            _principal_query().where(orm.UserORM.id == user_id)
+        ).one_or_none()
+        return user_model.Principal(**row._mapping) if row else None
+
+    def get_principals(
+        self, user_ids: Iterable[UUID]
+    ) -> dict[UUID, user_model.Principal]:
+        rows = self._session.execute(
+            _principal_query().where(orm.UserORM.id.in_(set(user_ids)))
+        )
+        return {row.id: user_model.Principal(**row._mapping) for row in rows}
+
+
+class AsyncSqlAlchemyUserRepository(repository.IAsyncUserRepository):
+    def __init__(self, session: AsyncSession):
+        self._session = session
+
+    async def exists(self, user_id: UUID) -> bool:
+        return await self.get_principal(user_id) is not None
+
+    async def get(self, user_id: UUID) -> user_model.User:
+        user = await self._session.get(orm.UserORM, user_id)
+        if not user:
+            raise exception.UserNotFound
+        return user.to_domain()
+
+    async def get_principal(self, user_id: UUID) -> Optional[user_model.Principal]:
+        result = await self._session.execute(
+            _principal_query().where(orm.UserORM.id == user_id)
+        )
+        row = result.one_or_none()
+        return user_model.Principal(**row._mapping) if row else None
+
+    async def get_principals(
+        self, user_ids: Iterable[UUID]
+    ) -> dict[UUID, user_model.Principal]:
+        rows = await self._session.execute(
+            _principal_query().where(orm.UserORM.id.in_(set(user_ids)))
+        )
+        return {row.id: user_model.Principal(**row._mapping) for row in rows}
+
+
+def _principal_query():
+    """Only the columns needed for authorization, no full user row."""
+    return select(orm.UserORM.id, orm.UserORM.role, orm.UserORM.organization_id)
+
 
 class FakeUserRepository(repository.IUserRepository):
     def __init__(self, users: Optional[list[user_model.User]] = None):
@@ -50,3 +100,38 @@ class FakeUserRepository(repository.IUserRepository):
         if not user:
             raise exception.UserNotFound
         return user
+
+    def get_principal(self, user_id: UUID) -> Optional[user_model.Principal]:
+        user = self._users.get(user_id, None)
+        if not user:
+            return None
+        return user_model.Principal(
+            id=user.id, role=user.role, organization_id=user.organization_id
+        )
+
+    def get_principals(
+        self, user_ids: Iterable[UUID]
+    ) -> dict[UUID, user_model.Principal]:
+        principals = (self.get_principal(user_id) for user_id in user_ids)
+        return {principal.id: principal for principal in principals if principal}
+
+
+class AsyncFakeUserRepository(repository.IAsyncUserRepository):
+    """Awaitable facade over `FakeUserRepository`."""
+
+    def __init__(self, users: Optional[list[user_model.User]] = None):
+        self._user_repo = FakeUserRepository(users)
+
+    async def exists(self, user_id: UUID) -> bool:
+        return self._user_repo.exists(user_id)
+
+    async def get(self, user_id: UUID) -> user_model.User:
+        return self._user_repo.get(user_id)
+
+    async def get_principal(self, user_id: UUID) -> Optional[user_model.Principal]:
+        return self._user_repo.get_principal(user_id)
+
+    async def get_principals(
+        self, user_ids: Iterable[UUID]
+    ) -> dict[UUID, user_model.Principal]:
+        return self._user_repo.get_principals(user_ids)
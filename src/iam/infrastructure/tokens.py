@@ -0,0 +1,99 @@
+"""Signed bearer tokens identifying the acting user.
+
+Tokens are HS256 JSON Web Tokens carrying the user id as `sub` and an `exp`
+expiry, signed with `Settings.auth.secret_key`. An identity provider sharing the
+key can issue them, `python -m src.iam.infrastructure.tokens USER_ID` issues one.
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import UTC, datetime, timedelta
+from functools import lru_cache
+from typing import Callable, Optional
+from uuid import UUID
+
+from src._shared.config import get_settings
+from src.iam.infrastructure import exception
+
+_HEADER = {"alg": "HS256", "typ": "JWT"}
+
+
+class TokenSigner:
+    def __init__(
+        self,
+        secret_key: str,
+        ttl: timedelta = timedelta(hours=1),
+        clock: Callable[[], datetime] = lambda: datetime.now(UTC),
+    ):
+        self._key = secret_key.encode()
+        self._ttl = ttl
+        self._clock = clock
+
+    def issue(self, user_id: UUID) -> str:
+        expires = self._clock() + self._ttl
+        claims = {"sub": str(user_id), "exp": int(expires.timestamp())}
+        signing_input = f"{_encode(_HEADER)}.{_encode(claims)}"
+        return f"{signing_input}.{_b64(self._sign(signing_input))}"
+
+    def verify(self, token: str) -> UUID:
+        """The user a token was issued to, if it is intact and not yet expired."""
+        try:
+            header, payload, signature = token.split(".")
+            valid = hmac.compare_digest(
+                _unb64(signature), self._sign(f"{header}.{payload}")
+            )
+            if not valid or _decode(header) != _HEADER:
+                raise exception.InvalidToken
+            claims = _decode(payload)
+            if claims["exp"] <= self._clock().timestamp():
+                raise exception.InvalidToken
+            return UUID(claims["sub"])
+        except (ValueError, KeyError, TypeError):
+            raise exception.InvalidToken
+
+    # helper
+    def _sign(self, signing_input: str) -> bytes:
+        return hmac.new(self._key, signing_input.encode(), hashlib.sha256).digest()
+
+
+@lru_cache(maxsize=1)
+def get_token_signer() -> Optional[TokenSigner]:
+    """None unless `Settings.auth` is configured, requests are then refused."""
+    auth = get_settings().auth
+    if auth is None:
+        return None
+    return TokenSigner(auth.secret_key, timedelta(seconds=auth.token_ttl_seconds))
+
+
+def _b64(value: bytes) -> str:
+    return urlsafe_b64encode(value).rstrip(b"=").decode()
+
+
+def _unb64(value: str) -> bytes:
+    return urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def _encode(value: dict) -> str:
+    return _b64(json.dumps(value, separators=(",", ":")).encode())
+
+
+def _decode(value: str) -> dict:
+    return json.loads(_unb64(value))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("user_id", type=UUID)
+    args = parser.parse_args()
+
+    signer = get_token_signer()
+    if signer is None:
+        parser.error("AUTH--SECRET_KEY is not configured")
+    print(signer.issue(args.user_id))
+
+
+if __name__ == "__main__":
+    main()
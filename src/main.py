@@ -1,12 +1,60 @@
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from datetime import UTC, datetime, timedelta
 from typing import Annotated
 
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query
+from sqlalchemy.orm import Session
 
+from src._shared.infrastructure.database import (
+    dispose_async_engine,
+    dispose_engine,
+    get_db_session,
+    warm_up_pool,
+)
+from src.expense_management.api.router import router as expense_router
+from src.expense_management.infrastructure.receipts import (
+    SqlAlchemyReceiptJobRepository,
+)
+from src.iam.api.router import router as user_router
+from src.iam.infrastructure.cache import get_principal_cache
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warm_up_pool()
+    yield
+    dispose_engine()
+    await dispose_async_engine()
+
+
+app = FastAPI(lifespan=lifespan)
+app.include_router(expense_router)
+app.include_router(user_router)
 
 
 @app.get("/healthz")
 def get_health():
     return {"status": "ok"}
+
+
+@app.get("/metrics/principal-cache")
+def get_principal_cache_stats():
+    return asdict(get_principal_cache().stats())
+
+
+@app.get("/metrics/receipt-jobs")
+def get_receipt_job_stats(
+    session: Annotated[Session, Depends(get_db_session)],
+    window_seconds: Annotated[int, Query(gt=0)] = 300,
+):
+    until = datetime.now(UTC)
+    stats = SqlAlchemyReceiptJobRepository(session).stats(
+        until - timedelta(seconds=window_seconds), until
+    )
+    return dict(
+        {state.name.lower(): count for state, count in stats.counts.items()},
+        finished=stats.finished,
+        throughput_per_second=stats.throughput,
+    )
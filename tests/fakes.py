@@ -0,0 +1,26 @@
+from typing import Iterable, Optional
+from uuid import UUID
+
+from src.iam.domain import model as user_model
+from src.iam.infrastructure.repository import FakeUserRepository
+
+
+class CountingUserRepository(FakeUserRepository):
+    """Counts the principal lookups, one per call however many users it loads."""
+
+    def __init__(self, users: list[user_model.User]):
+        super().__init__(users)
+        self.lookups = 0
+
+    def get_principal(self, user_id: UUID) -> Optional[user_model.Principal]:
+        self.lookups += 1
+        return super().get_principal(user_id)
+
+    def get_principals(
+        self, user_ids: Iterable[UUID]
+    ) -> dict[UUID, user_model.Principal]:
+        self.lookups += 1
+        principals = (
+            FakeUserRepository.get_principal(self, user_id) for user_id in user_ids
+        )
+        return {principal.id: principal for principal in principals if principal}
@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy.orm import Session
+
+from src._shared.config import DBConfig, Settings
+from src._shared.infrastructure import database
+
+
+@pytest.fixture
+def sqlite_settings(monkeypatch, tmp_path):
+    settings = Settings(
+        test=None,
+        db=DBConfig(
+            host="localhost",
+            port=5432,
+            password="",
+            username="",
+            dbname="",
+            pool_size=2,
+            max_overflow=0,
+        ),
+    )
+    monkeypatch.setattr(database, "get_settings", lambda: settings)
+    monkeypatch.setattr(
+        database, "build_postgres_uri", lambda: f"sqlite:///{tmp_path / 'fet.db'}"
+    )
+    database.dispose_engine()
+    yield settings
+    database.dispose_engine()
+
+
+def test_engine_is_shared_per_process(sqlite_settings):
+    assert database.postgres_db_engine() is database.postgres_db_engine()
+
+
+def test_engine_uses_configured_pool(sqlite_settings):
+    engine = database.postgres_db_engine()
+    assert engine.pool.size() == 2
+    assert engine.pool._pre_ping
+
+
+def test_session_is_closed_after_request(sqlite_settings):
+    dependency = database.get_db_session()
+    session = next(dependency)
+    assert isinstance(session, Session)
+    session.connection()
+    assert database.postgres_db_engine().pool.checkedout() == 1
+
+    with pytest.raises(StopIteration):
+        next(dependency)
+
+    assert database.postgres_db_engine().pool.checkedout() == 0
+
+
+def test_warm_up_fills_pool(sqlite_settings):
+    database.warm_up_pool()
+    assert database.postgres_db_engine().pool.checkedin() == 2
@@ -6,7 +6,12 @@ import pytz
 import src.expense_management.domain.model as expense_model
 import src.organization.domain.model as org_model
 import src.expense_management.domain.exception as exception
+import src.expense_management.domain.events as events
+from src.expense_management.domain.report import ExpenseReport
 from random import randint
+from pydantic import TypeAdapter
+from src._shared.api.serialization import DomainSerializer
+from src.expense_management.api.schemas import ExpenseResponse
 
 tz_berlin = pytz.timezone("Europe/Berlin")
 
@@ -170,3 +175,215 @@ def test_cannot_revoke_approval_as_not_approver():
     expense.approve(approver)
     with pytest.raises(exception.InvalidRevokeUser):
         expense.revoke("not_approver", reason="good reason")
+
+
+def test_transitions_record_events_until_pulled():
+    expense = generate_random_expense()
+    expense.submit(expense.submitter_id)
+    approver = "valid_approver"
+    expense.approve(approver)
+    expense.revoke(by=approver, reason="new insights")
+
+    submitted, approved, revoked = expense.pull_events()
+    assert isinstance(submitted, events.ExpenseSubmitted)
+    assert submitted.by == expense.submitter_id
+    assert isinstance(approved, events.ExpenseApproved)
+    assert revoked.reason == "new insights"
+    assert revoked.expense_id == expense.id
+    assert expense.pull_events() == []
+
+
+def test_failed_transition_records_no_event():
+    expense = generate_random_expense()
+    with pytest.raises(exception.ExpenseNotSubmitted):
+        expense.approve("valid_approver")
+    assert expense.pull_events() == []
+
+
+def test_new_expense_has_no_tracked_changes():
+    expense = generate_random_expense()
+    expense.title = "changed"
+    assert not expense.is_persisted
+    assert expense.changed_fields == frozenset()
+
+
+def test_persisted_expense_tracks_changed_fields():
+    expense = generate_random_expense()
+    expense.mark_persisted()
+    expense.submit(expense.submitter_id)
+    assert expense.changed_fields == {"state"}
+
+    expense.mark_persisted()
+    assert expense.changed_fields == frozenset()
+
+
+def test_reverted_field_is_not_changed():
+    expense = generate_random_expense()
+    expense.mark_persisted()
+    title = expense.title
+    expense.title = "changed"
+    expense.title = title
+    assert expense.changed_fields == frozenset()
+
+
+def test_expense_has_no_instance_dict():
+    expense = generate_random_expense()
+    expense.mark_persisted()
+    expense.title = "changed"
+
+    assert not hasattr(expense, "__dict__")
+    assert expense.changed_fields == {"title"}
+
+
+def test_expense_batch_holds_columns():
+    expenses = [generate_random_expense() for _ in range(3)]
+    expenses[0].submit(expenses[0].submitter_id)
+
+    batch = expense_model.ExpenseBatch.from_expenses(expenses)
+
+    assert len(batch) == 3
+    assert batch.ids == [expense.id for expense in expenses]
+    assert batch.total() == pytest.approx(sum(expense.amount for expense in expenses))
+    assert batch.totals_by_state()[expense_model.ExpenseState.SUBMITTED] == (
+        pytest.approx(expenses[0].amount)
+    )
+
+
+def test_expense_from_persisted_values_tracks_changes():
+    expense = generate_random_expense()
+    values = [getattr(expense, name) for name in expense_model.EXPENSE_FIELDS]
+
+    restored = expense_model.Expense.from_persisted(*values)
+    restored.amount = 1
+
+    assert restored.is_persisted
+    assert restored.changed_fields == {"amount"}
+    restored.amount = expense.amount
+    assert restored == expense
+
+
+def test_domain_serializer_matches_response_model():
+    expenses = [
+        expense_model.Expense(
+            submitter_id=uuid4(),
+            date=datetime(2025, 1, day),
+            title=f"title-{day}",
+            amount=10 * day,
+            category=expense_model.ExpenseCategory.OFFICE_SUPPLIES,
+            organization_id=uuid4(),
+        )
+        for day in range(1, 4)
+    ]
+    expenses[0].submit(expenses[0].submitter_id)
+    serializer = DomainSerializer(expense_model.Expense, ExpenseResponse)
+
+    responses = TypeAdapter(list[ExpenseResponse]).validate_json(
+        serializer.many(expenses)
+    )
+
+    assert (
+        ExpenseResponse.model_validate_json(serializer.one(expenses[0]))
+        == (responses[0])
+    )
+    for expense, response in zip(expenses, responses):
+        assert response.id == expense.id
+        assert response.amount == expense.amount
+        assert response.state == expense.state.name
+        assert response.category == expense.category.name
+
+
+def test_init_period_with_balance():
+    period = expense_model.Period(initial_balance=100)
+    assert period.balance == pytest.approx(100)
+
+
+def test_add_expense_to_period_decreases_balance():
+    period = expense_model.Period(
+        start=datetime(2025, 1, 1), end=datetime(2026, 1, 1), initial_balance=100.10
+    )
+    period.add_expense(generate_random_expense(amount=100))
+
+    assert period.expenses == pytest.approx(100)
+    assert period.balance == pytest.approx(0.10)
+
+
+def test_expenses_between_sums_date_range():
+    period = expense_model.Period(start=datetime(2025, 1, 1))
+    expenses = [generate_random_expense(amount=day) for day in range(1, 11)]
+    for day, expense in zip(range(10, 0, -1), expenses):
+        expense.date = datetime(2025, 3, day)
+        period.add_expense(expense)
+
+    assert period.expenses_between(
+        datetime(2025, 3, 2), datetime(2025, 3, 4)
+    ) == pytest.approx(
+        sum(
+            expense.amount
+            for expense in expenses
+            if datetime(2025, 3, 2) <= expense.date <= datetime(2025, 3, 4)
+        )
+    )
+    assert period.expenses_between(
+        datetime(2025, 1, 1), datetime(2025, 12, 31)
+    ) == pytest.approx(period.expenses)
+    assert period.expenses_between(datetime(2025, 4, 1), datetime(2025, 5, 1)) == 0
+
+
+def test_expenses_between_after_out_of_order_add():
+    period = expense_model.Period(start=datetime(2025, 1, 1))
+    late = generate_random_expense(amount=5)
+    late.date = datetime(2025, 6, 1)
+    early = generate_random_expense(amount=7)
+    early.date = datetime(2025, 2, 1)
+
+    period.add_expense(late)
+    assert period.expenses_between(datetime(2025, 1, 1), datetime(2025, 3, 1)) == 0
+    period.add_expense(early)
+
+    assert period.expenses_between(
+        datetime(2025, 1, 1), datetime(2025, 3, 1)
+    ) == pytest.approx(7)
+
+
+def test_report_breakdowns_match_expense_sums():
+    period = expense_model.Period(start=datetime(2025, 1, 1), end=datetime(2025, 4, 1))
+    expenses = [generate_random_expense(amount=amount) for amount in range(1, 13)]
+    for index, expense in enumerate(expenses):
+        expense.date = datetime(2025, index % 3 + 1, 5)
+        expense.submitter_id = uuid4() if index % 4 else expenses[0].submitter_id
+        if index % 2:
+            expense.submit(expense.submitter_id)
+        period.add_expense(expense)
+    outside = generate_random_expense(amount=1000)
+    outside.date = datetime(2025, 4, 1)
+    period.add_expense(outside)
+
+    report = ExpenseReport.of_period(period)
+
+    def total(predicate):
+        return sum(e.amount for e in expenses if predicate(e))
+
+    assert len(report) == len(expenses)
+    assert report.total() == pytest.approx(total(lambda e: True))
+    assert report.by_category() == {
+        expense_model.ExpenseCategory.OFFICE_SUPPLIES: total(lambda e: True)
+    }
+    assert report.by_month() == {
+        datetime(2025, month, 1).date(): total(lambda e: e.date.month == month)
+        for month in (1, 2, 3)
+    }
+    assert report.by_submitter() == {
+        submitter_id: total(lambda e: e.submitter_id == submitter_id)
+        for submitter_id in {e.submitter_id for e in expenses}
+    }
+    assert (
+        report.by_category_and_month()[expense_model.ExpenseCategory.OFFICE_SUPPLIES]
+        == report.by_month()
+    )
+    submitted = report.only([expense_model.ExpenseState.SUBMITTED])
+    assert submitted.total() == pytest.approx(
+        total(lambda e: e.state == expense_model.ExpenseState.SUBMITTED)
+    )
+    assert report.by_state()[expense_model.ExpenseState.DRAFT] == (
+        pytest.approx(total(lambda e: e.state == expense_model.ExpenseState.DRAFT))
+    )
@@ -0,0 +1,320 @@
+from dataclasses import dataclass
+from uuid import UUID, uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from src._shared.infrastructure import orm
+from src._shared.infrastructure.database import get_async_db_session, get_db_session
+from src.expense_management.infrastructure.receipts import (
+    LocalReceiptStore,
+    get_receipt_store,
+)
+from src.iam.domain import model as user_model
+from src.iam.infrastructure.cache import PrincipalCache, get_principal_cache
+from src.iam.infrastructure.tokens import TokenSigner, get_token_signer
+from src.main import app
+
+SECRET = "test-secret"
+
+
+@dataclass
+class Api:
+    client: TestClient
+    org_id: UUID
+    submitter_id: UUID
+    approver_id: UUID
+    outsider_id: UUID
+
+    def auth(self, user_id: UUID, **headers) -> dict:
+        token = TokenSigner(SECRET).issue(user_id)
+        return {"Authorization": f"Bearer {token}", **headers}
+
+    def create_expense(self, **form) -> UUID:
+        response = self.client.post(
+            "/expenses",
+            data={
+                "title": "Lunch",
+                "date": "2025-01-15T12:00:00",
+                "amount": "12.5",
+                "category": "OFFICE_SUPPLIES",
+                "organization_id": str(self.org_id),
+            }
+            | form,
+            headers=self.auth(self.submitter_id),
+        )
+        assert response.status_code == 201, response.text
+        return UUID(response.json()["id"])
+
+
+@pytest.fixture
+def api(tmp_path):
+    """The app on a SQLite file, shared by its sync and async sessions."""
+    path = tmp_path / "expenses.db"
+    engine = create_engine(f"sqlite:///{path}")
+    orm.Base.metadata.create_all(engine)
+    sessions = sessionmaker(bind=engine)
+    async_sessions = async_sessionmaker(
+        create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool),
+        expire_on_commit=False,
+    )
+
+    def db_session():
+        session = sessions()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    async def async_db_session():
+        async with async_sessions() as session:
+            yield session
+
+    app.dependency_overrides.update(
+        {
+            get_db_session: db_session,
+            get_async_db_session: async_db_session,
+            get_token_signer: lambda: TokenSigner(SECRET),
+            get_receipt_store: lambda: LocalReceiptStore(tmp_path / "receipts"),
+            get_principal_cache: lambda: PrincipalCache(maxsize=64, ttl=60),
+        }
+    )
+
+    org_id, other_org_id = uuid4(), uuid4()
+    with sessions() as session:
+        session.add_all(
+            [
+                orm.OrganizationORM(id=org_id, name="Acme"),
+                orm.OrganizationORM(id=other_org_id, name="Other"),
+            ]
+        )
+        users = [
+            orm.UserORM(
+                id=uuid4(),
+                name=name,
+                email=f"{name}@u.com",
+                role=role,
+                organization_id=user_org_id,
+            )
+            for name, role, user_org_id in (
+                ("sam", user_model.UserRole.SUBMITTER, org_id),
+                ("ann", user_model.UserRole.APPROVER, org_id),
+                ("oz", user_model.UserRole.APPROVER, other_org_id),
+            )
+        ]
+        session.add_all(users)
+        session.commit()
+        user_ids = [user.id for user in users]
+
+    yield Api(TestClient(app), org_id, *user_ids)
+    app.dependency_overrides.clear()
+    engine.dispose()
+
+
+class TestAuthentication:
+    def test_requests_need_a_valid_token(self, api):
+        for headers in (
+            {},
+            {"X-User-Id": str(api.submitter_id)},
+            {"Authorization": "Bearer not-a-token"},
+            {"Authorization": f"Bearer {TokenSigner('other').issue(api.submitter_id)}"},
+        ):
+            response = api.client.get("/expenses", headers=headers)
+
+            assert response.status_code == 401
+            assert response.headers["www-authenticate"] == "Bearer"
+
+    def test_token_identifies_acting_user(self, api):
+        response = api.client.get("/users/me", headers=api.auth(api.approver_id))
+
+        assert response.status_code == 200
+        assert response.json()["id"] == str(api.approver_id)
+        assert response.json()["role"] == "APPROVER"
+
+    def test_requests_are_refused_without_configured_authentication(self, api):
+        app.dependency_overrides[get_token_signer] = lambda: None
+
+        response = api.client.get("/expenses", headers=api.auth(api.submitter_id))
+
+        assert response.status_code == 503
+
+
+class TestCreateExpense:
+    def test_submitter_creates_expense_in_own_organization(self, api):
+        expense_id = api.create_expense(notes="client visit")
+
+        response = api.client.get(
+            f"/expenses/{expense_id}", headers=api.auth(api.submitter_id)
+        )
+
+        assert response.json()["notes"] == "client visit"
+        assert response.json()["state"] == "DRAFT"
+
+    def test_create_errors_map_to_status_codes(self, api):
+        form = {
+            "title": "Lunch",
+            "date": "2025-01-15T12:00:00",
+            "amount": "12.5",
+            "category": "OFFICE_SUPPLIES",
+            "organization_id": str(api.org_id),
+        }
+
+        def create(user_id, **fields):
+            return api.client.post(
+                "/expenses", data=form | fields, headers=api.auth(user_id)
+            ).status_code
+
+        assert create(api.outsider_id) == 403
+        assert create(api.submitter_id, organization_id=str(uuid4())) == 403
+        assert create(api.submitter_id, category="TRAVEL_BY_UNICORN") == 422
+        assert create(api.submitter_id, amount="-1") == 422
+
+
+class TestTransitions:
+    def test_expense_moves_through_its_states(self, api):
+        expense_id = api.create_expense()
+        path = f"/expenses/{expense_id}"
+
+        submitted = api.client.post(
+            f"{path}/submit", headers=api.auth(api.submitter_id)
+        )
+        approved = api.client.post(f"{path}/approve", headers=api.auth(api.approver_id))
+        revoked = api.client.post(
+            f"{path}/revoke",
+            json={"reason": "duplicate"},
+            headers=api.auth(api.approver_id),
+        )
+
+        assert [submitted.json()["state"], approved.json()["state"]] == [
+            "SUBMITTED",
+            "APPROVED",
+        ]
+        assert revoked.json()["state"] == "REVOKED"
+        assert revoked.json()["revoke_reason"] == "duplicate"
+
+    def test_transition_errors_map_to_status_codes(self, api):
+        expense_id = api.create_expense()
+        path = f"/expenses/{expense_id}"
+
+        early = api.client.post(f"{path}/approve", headers=api.auth(api.approver_id))
+        api.client.post(f"{path}/submit", headers=api.auth(api.submitter_id))
+        own = api.client.post(f"{path}/approve", headers=api.auth(api.submitter_id))
+        outsider = api.client.post(f"{path}/approve", headers=api.auth(api.outsider_id))
+        missing = api.client.post(
+            f"/expenses/{uuid4()}/submit", headers=api.auth(api.submitter_id)
+        )
+
+        assert early.status_code == 409
+        assert own.status_code == 403
+        assert outsider.status_code == 403
+        assert missing.status_code == 404
+
+
+class TestBatch:
+    def test_batch_submit_and_approve(self, api):
+        expense_ids = [api.create_expense() for _ in range(3)]
+        unknown_id = uuid4()
+
+        submitted = api.client.post(
+            "/expenses/batch/submit",
+            json={"expense_ids": [str(expense_id) for expense_id in expense_ids]},
+            headers=api.auth(api.submitter_id),
+        )
+        approved = api.client.post(
+            "/expenses/batch/approve",
+            json={"expense_ids": [str(expense_ids[0]), str(unknown_id)]},
+            headers=api.auth(api.approver_id),
+        )
+
+        assert submitted.status_code == 200
+        assert [result["state"] for result in submitted.json()] == ["SUBMITTED"] * 3
+        assert approved.status_code == 200
+        results = {result["expense_id"]: result for result in approved.json()}
+        assert results[str(expense_ids[0])]["state"] == "APPROVED"
+        assert not results[str(unknown_id)]["ok"]
+
+    def test_batch_needs_expense_ids(self, api):
+        response = api.client.post(
+            "/expenses/batch/submit",
+            json={"expense_ids": []},
+            headers=api.auth(api.submitter_id),
+        )
+
+        assert response.status_code == 422
+
+
+class TestConditionalReads:
+    def test_expense_is_revalidated_by_its_etag(self, api):
+        expense_id = api.create_expense()
+        path = f"/expenses/{expense_id}"
+        headers = api.auth(api.submitter_id)
+
+        response = api.client.get(path, headers=headers)
+        etag = response.headers["etag"]
+        unchanged = api.client.get(path, headers=headers | {"If-None-Match": etag})
+        weak = api.client.get(path, headers=headers | {"If-None-Match": f"W/{etag}"})
+        api.client.post(f"{path}/submit", headers=headers)
+        changed = api.client.get(path, headers=headers | {"If-None-Match": etag})
+
+        assert response.headers["cache-control"] == "private, no-cache"
+        assert (unchanged.status_code, unchanged.content) == (304, b"")
+        assert unchanged.headers["etag"] == etag
+        assert weak.status_code == 304
+        assert changed.status_code == 200
+        assert changed.json()["state"] == "SUBMITTED"
+        assert changed.headers["etag"] != etag
+
+    def test_list_pages_are_revalidated_by_their_etag(self, api):
+        expense_ids = [api.create_expense() for _ in range(3)]
+        headers = api.auth(api.submitter_id)
+        url = "/expenses?limit=2"
+
+        response = api.client.get(url, headers=headers)
+        etag = response.headers["etag"]
+        unchanged = api.client.get(url, headers=headers | {"If-None-Match": etag})
+        other = api.client.get(url, headers=headers | {"If-None-Match": '"other"'})
+        api.client.post(f"/expenses/{expense_ids[0]}/submit", headers=headers)
+        changed = api.client.get(url, headers=headers | {"If-None-Match": etag})
+
+        assert len(response.json()["items"]) == 2
+        assert (unchanged.status_code, unchanged.content) == (304, b"")
+        assert unchanged.headers["etag"] == etag
+        assert other.status_code == 200
+        assert other.headers["etag"] == etag
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != etag
+
+    def test_organization_list_checks_permission_before_revalidating(self, api):
+        api.create_expense()
+        url = f"/expenses/organizations/{api.org_id}"
+
+        response = api.client.get(url, headers=api.auth(api.approver_id))
+        etag = response.headers["etag"]
+        unchanged = api.client.get(
+            url, headers=api.auth(api.approver_id, **{"If-None-Match": etag})
+        )
+        outsider = api.client.get(
+            url, headers=api.auth(api.outsider_id, **{"If-None-Match": "*"})
+        )
+
+        assert len(response.json()["items"]) == 1
+        assert unchanged.status_code == 304
+        assert outsider.status_code == 403
+
+
+class TestMetrics:
+    def test_receipt_job_window_must_be_positive(self, api):
+        for window in ("0", "-60"):
+            response = api.client.get(
+                "/metrics/receipt-jobs", params={"window_seconds": window}
+            )
+
+            assert response.status_code == 422
+
+        response = api.client.get("/metrics/receipt-jobs")
+        assert response.status_code == 200
+        assert response.json()["throughput_per_second"] == 0.0
@@ -1,14 +1,63 @@
-from datetime import datetime
+import asyncio
+import gc
+import hashlib
+import weakref
+from dataclasses import replace
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import UTC, date, datetime, timedelta
+from io import BytesIO
 from uuid import UUID, uuid4
 
 import pytest
+from PIL import Image
+from sqlalchemy import delete, event, select, text, update
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
 
 from src.expense_management.domain import model as expense_model
 from src.iam.domain import model as user_model
 from src._shared.infrastructure import orm
+from src._shared.infrastructure.database import Replica, RoutingSession
 from src.expense_management.infrastructure import exception
-from src.expense_management.infrastructure.repository import SqlAlchemyExpenseRepository
-from src.iam.infrastructure.repository import SqlAlchemyUserRepository
+from src.expense_management.domain import exception as domain_exception
+from src.expense_management.application.queries import ExpenseGrouping
+from src.expense_management.domain import receipt as receipt_model
+from src.expense_management.domain.repository import ExpenseFilter
+from src.expense_management.infrastructure.outbox import OutboxDispatcher
+from src.expense_management.infrastructure.queries import (
+    FakeExpenseQueries,
+    SqlAlchemyExpenseQueries,
+)
+from src.expense_management.infrastructure.repository import (
+    AsyncSqlAlchemyExpenseRepository,
+    FakeExpenseRepository,
+    SqlAlchemyExpenseRepository,
+    _summary_rows,
+)
+from src.expense_management.infrastructure.receipt_pipeline import ReceiptPipeline
+from src.expense_management.infrastructure.receipts import (
+    FakeReceiptJobRepository,
+    LocalReceiptStore,
+    SqlAlchemyReceiptJobRepository,
+)
+from src.expense_management.infrastructure.summary import rebuild_spend_summary
+from src.iam.infrastructure.cache import (
+    AsyncCachedUserRepository,
+    CachedUserRepository,
+    PrincipalCache,
+    invalidate_on_user_change,
+)
+from src.iam.infrastructure import exception as iam_exception
+from src.iam.infrastructure.tokens import TokenSigner
+from src.iam.infrastructure.repository import (
+    AsyncSqlAlchemyUserRepository,
+    FakeUserRepository,
+    SqlAlchemyUserRepository,
+)
+from tests.fakes import CountingUserRepository
 
 
 def insert_org(session, commit: bool = False):
@@ -65,6 +114,86 @@ def generate_expense(submitter_id: UUID = uuid4(), org_id: UUID = uuid4()):
     )
 
 
+def capture_statements(session):
+    statements = []
+
+    @event.listens_for(session.get_bind(), "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    return statements
+
+
+def explain_queries(session, call) -> list[str]:
+    """Run `call` and return the query plan of every SELECT it issued."""
+    bind = session.get_bind()
+    queries = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith("SELECT"):
+            queries.append((statement, parameters))
+
+    event.listen(bind, "before_cursor_execute", capture)
+    try:
+        call()
+    finally:
+        event.remove(bind, "before_cursor_execute", capture)
+
+    prefix = "EXPLAIN QUERY PLAN " if bind.dialect.name == "sqlite" else "EXPLAIN "
+    return [
+        "\n".join(
+            str(row[-1])
+            for row in session.connection().exec_driver_sql(
+                prefix + statement, parameters
+            )
+        )
+        for statement, parameters in queries
+    ]
+
+
+def generate_expenses_over_year(submitter_id: UUID, org_id: UUID, count: int):
+    expenses = [
+        generate_expense(submitter_id=submitter_id, org_id=org_id) for i in range(count)
+    ]
+    for i, expense in enumerate(expenses):
+        expense.date = datetime(2025, i % 12 + 1, 1)
+        if i % 3 == 0:
+            expense.submit(submitter_id)
+    return expenses
+
+
+def without_summary_upkeep(statements: list[str]) -> list[str]:
+    """Statements on the expenses, without the summaries and outbox kept alongside."""
+    return [
+        stmt
+        for stmt in statements
+        if "expense_summaries" not in stmt and "expense_outbox" not in stmt
+    ]
+
+
+def run_async(scenario):
+    """Run `scenario(session)` against a fresh in-memory database through aiosqlite."""
+
+    async def main():
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as connection:
+            await connection.run_sync(orm.Base.metadata.create_all)
+        try:
+            async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+                return await scenario(session)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+def walk_pages(find_page, limit: int, **kwargs):
+    pages = [find_page(limit=limit, **kwargs)]
+    while pages[-1].next_cursor:
+        pages.append(find_page(limit=limit, after=pages[-1].next_cursor, **kwargs))
+    return pages
+
+
 class TestUserRepo:
     def test_can_check_organization_is_same(self, session):
         org_id = insert_org(session)
@@ -103,6 +232,211 @@ class TestUserRepo:
         assert not user_repo.exists(uuid4())
 
 
+def generate_user(role=user_model.UserRole.APPROVER, org_id: UUID = uuid4()):
+    return user_model.User(
+        name="user", email="i@u.com", role=role, organization_id=org_id
+    )
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCachedUserRepo:
+    def test_repeated_lookups_hit_cache(self):
+        user = generate_user()
+        user_repo = CountingUserRepository([user])
+        cache = PrincipalCache()
+        cached_repo = CachedUserRepository(user_repo, cache)
+
+        assert cached_repo.has_role(user.id, "APPROVER")
+        assert cached_repo.is_same_organization(user.id, user.organization_id)
+        assert cached_repo.exists(user.id)
+
+        assert user_repo.lookups == 1
+        stats = cache.stats()
+        assert (stats.hits, stats.misses, stats.size) == (2, 1, 1)
+
+    def test_cache_is_shared_between_repositories(self):
+        user = generate_user()
+        cache = PrincipalCache()
+        CachedUserRepository(CountingUserRepository([user]), cache).exists(user.id)
+        user_repo = CountingUserRepository([user])
+
+        assert CachedUserRepository(user_repo, cache).has_role(user.id, "APPROVER")
+        assert user_repo.lookups == 0
+
+    def test_entries_expire(self):
+        user = generate_user()
+        user_repo = CountingUserRepository([user])
+        clock = FakeClock()
+        cached_repo = CachedUserRepository(
+            user_repo, PrincipalCache(ttl=10, clock=clock)
+        )
+
+        cached_repo.exists(user.id)
+        clock.now = 11
+        cached_repo.exists(user.id)
+
+        assert user_repo.lookups == 2
+
+    def test_least_recently_used_is_evicted(self):
+        users = [generate_user() for i in range(3)]
+        user_repo = CountingUserRepository(users)
+        cache = PrincipalCache(maxsize=2)
+        cached_repo = CachedUserRepository(user_repo, cache)
+
+        for user in users:
+            cached_repo.exists(user.id)
+
+        assert cache.get(users[0].id) is None
+        assert cache.get(users[2].id) is not None
+        assert cache.stats().evictions == 1
+
+    def test_invalidate_reloads_changed_user(self):
+        user = generate_user(role=user_model.UserRole.SUBMITTER)
+        user_repo = CountingUserRepository([user])
+        cache = PrincipalCache()
+        cached_repo = CachedUserRepository(user_repo, cache)
+        assert not cached_repo.has_role(user.id, "APPROVER")
+
+        user.role = user_model.UserRole.APPROVER
+        cache.invalidate(user.id)
+
+        assert cached_repo.has_role(user.id, "APPROVER")
+
+    def test_bulk_user_updates_clear_cache(self, session):
+        org_id = insert_org(session)
+        approver_id = insert_approver(session, org_id=org_id)
+        cache = PrincipalCache()
+        invalidate_on_user_change(cache)
+        cached_repo = CachedUserRepository(SqlAlchemyUserRepository(session), cache)
+        assert cached_repo.has_role(approver_id, "APPROVER")
+
+        session.execute(
+            update(orm.UserORM)
+            .where(orm.UserORM.id == approver_id)
+            .values(role=user_model.UserRole.SUBMITTER)
+        )
+        assert cache.stats().size == 1
+        session.commit()
+
+        assert cache.stats().size == 0
+        assert cached_repo.has_role(approver_id, "SUBMITTER")
+
+    def test_changed_users_are_evicted_once_committed(self, session):
+        org_id = insert_org(session)
+        approver_id = insert_approver(session, org_id=org_id)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        session.commit()
+        cache = PrincipalCache()
+        invalidate_on_user_change(cache)
+        invalidate_on_user_change(cache)
+        cached_repo = CachedUserRepository(SqlAlchemyUserRepository(session), cache)
+        cached_repo.get_principals([approver_id, submitter_id])
+
+        session.get(orm.UserORM, submitter_id).role = user_model.UserRole.APPROVER
+        session.flush()
+        session.rollback()
+        assert cache.get(submitter_id) is not None
+
+        session.get(orm.UserORM, approver_id).role = user_model.UserRole.SUBMITTER
+        session.flush()
+        assert cache.get(approver_id) is not None
+        session.commit()
+
+        assert cache.get(approver_id) is None
+        assert cache.get(submitter_id) is not None
+        assert cached_repo.has_role(approver_id, "SUBMITTER")
+
+    def test_watched_caches_can_be_released(self):
+        cache = PrincipalCache()
+        invalidate_on_user_change(cache)
+        released = weakref.ref(cache)
+
+        del cache
+        gc.collect()
+
+        assert released() is None
+
+    def test_get_principals_only_loads_missing(self):
+        users = [generate_user() for i in range(3)]
+        user_repo = CountingUserRepository(users)
+        cache = PrincipalCache()
+        cached_repo = CachedUserRepository(user_repo, cache)
+        cached_repo.exists(users[0].id)
+
+        principals = cached_repo.get_principals([user.id for user in users])
+
+        assert set(principals) == {user.id for user in users}
+        assert user_repo.lookups == 2
+        assert cache.stats().size == 3
+
+    def test_unknown_users_are_not_cached(self):
+        cache = PrincipalCache()
+        cached_repo = CachedUserRepository(CountingUserRepository([]), cache)
+
+        assert not cached_repo.exists(uuid4())
+        assert cache.stats().size == 0
+
+    def test_can_get_principal_in_one_narrow_query(self, session):
+        org_id = insert_org(session)
+        approver_id = insert_approver(session, org_id=org_id)
+        user_repo = SqlAlchemyUserRepository(session)
+
+        statements = capture_statements(session)
+        principal = user_repo.get_principal(approver_id)
+
+        assert principal == user_model.Principal(
+            id=approver_id, role=user_model.UserRole.APPROVER, organization_id=org_id
+        )
+        assert len(statements) == 1
+        assert "users.name" not in statements[0]
+        assert user_repo.get_principal(uuid4()) is None
+
+    def test_can_get_principals_in_batch(self, session):
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        approver_id = insert_approver(session, org_id=org_id)
+        user_repo = SqlAlchemyUserRepository(session)
+
+        principals = user_repo.get_principals([submitter_id, approver_id, uuid4()])
+
+        assert set(principals) == {submitter_id, approver_id}
+        assert principals[submitter_id].role == user_model.UserRole.SUBMITTER
+
+
+class TestTokenSigner:
+    def test_token_identifies_user_until_expiry(self):
+        user_id = uuid4()
+        now = [datetime(2025, 1, 1, tzinfo=UTC)]
+        signer = TokenSigner("secret", ttl=timedelta(minutes=5), clock=lambda: now[0])
+        token = signer.issue(user_id)
+
+        assert signer.verify(token) == user_id
+        now[0] += timedelta(minutes=5)
+        with pytest.raises(iam_exception.InvalidToken):
+            signer.verify(token)
+
+    def test_tampered_or_foreign_tokens_are_rejected(self):
+        token = TokenSigner("secret").issue(uuid4())
+        header, payload, signature = token.split(".")
+        forged = TokenSigner("secret").issue(uuid4()).split(".")[1]
+
+        for invalid in (
+            f"{header}.{forged}.{signature}",
+            TokenSigner("other").issue(uuid4()),
+            "not-a-token",
+            f"{header}.{payload}.",
+        ):
+            with pytest.raises(iam_exception.InvalidToken):
+                TokenSigner("secret").verify(invalid)
+
+
 class TestPersistantUserRepo:
     def test_can_check_existance_persistance(self, postgres_session):
         org_id = insert_org(postgres_session, commit=True)
@@ -143,6 +477,1123 @@ class TestPersistantUserRepo:
         assert not user_repo.is_same_organization(submitter_id, uuid4())
 
 
+class TestExpenseRepo:
+    def test_can_save_many_expenses(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session, batch_size=10)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expenses = [
+            generate_expense(submitter_id=submitter_id, org_id=org_id)
+            for i in range(25)
+        ]
+
+        expense_repo.save_many(expenses)
+
+        assert len(expense_repo.find_by_organization(org_id=org_id)) == 25
+        assert expense_repo.get(expenses[0].id) == expenses[0]
+
+    def test_save_many_updates_existing_expenses(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expense = generate_expense(submitter_id=submitter_id, org_id=org_id)
+        expense_repo.save_many([expense])
+
+        expense.title = "renamed"
+        expense.submit(submitter_id)
+        expense_repo.save_many([expense])
+        session.expire_all()
+
+        stored = expense_repo.get(expense.id)
+        assert stored.title == "renamed"
+        assert stored.state == expense_model.ExpenseState.SUBMITTED
+
+    def test_save_updates_only_changed_columns(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expense = generate_expense(submitter_id=submitter_id, org_id=org_id)
+        expense_repo.save(expense)
+
+        expense = expense_repo.get(expense.id)
+        expense.submit(submitter_id)
+        statements = capture_statements(session)
+        expense_repo.save(expense)
+
+        updates = [stmt for stmt in statements if stmt.startswith("UPDATE")]
+        assert len(updates) == 1
+        assert "state=" in updates[0]
+        assert "title" not in updates[0]
+        session.expire_all()
+        assert (
+            expense_repo.get(expense.id).state == expense_model.ExpenseState.SUBMITTED
+        )
+
+    def test_save_without_changes_issues_no_statement(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expense = generate_expense(submitter_id=submitter_id, org_id=org_id)
+        expense_repo.save(expense)
+
+        expense = expense_repo.get(expense.id)
+        statements = capture_statements(session)
+        expense_repo.save(expense)
+
+        assert statements == []
+
+    def test_saving_a_stale_expense_conflicts(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expense = generate_expense(submitter_id=submitter_id, org_id=org_id)
+        expense_repo.save(expense)
+
+        first, second = expense_repo.get(expense.id), expense_repo.get(expense.id)
+        first.title = "first"
+        expense_repo.save(first)
+        second.title = "second"
+        with pytest.raises(domain_exception.ExpenseVersionConflict):
+            expense_repo.save(second)
+        with pytest.raises(domain_exception.ExpenseVersionConflict):
+            expense_repo.save_many([second])
+
+        stored = expense_repo.submit(expense.id, by=submitter_id)
+        assert (first.version, stored.version) == (2, 3)
+        assert stored.title == "first"
+        first.notes = "stale after the transition"
+        with pytest.raises(domain_exception.ExpenseVersionConflict):
+            expense_repo.save(first)
+
+    def test_fake_repo_rejects_stale_expenses(self):
+        expense = generate_expense(submitter_id=uuid4(), org_id=uuid4())
+        expense_repo = FakeExpenseRepository()
+        expense_repo.save(expense)
+
+        first, second = expense_repo.get(expense.id), expense_repo.get(expense.id)
+        first.title = "first"
+        expense_repo.save(first)
+        second.title = "second"
+        with pytest.raises(domain_exception.ExpenseVersionConflict):
+            expense_repo.save(second)
+
+        stored = expense_repo.submit(expense.id, by=expense.submitter_id)
+        assert (first.version, stored.version) == (2, 3)
+        assert expense_repo.get(expense.id).title == "first"
+        assert expense_repo.get(expense.id) is not expense_repo.get(expense.id)
+
+    def test_transitions_are_single_statements(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        approver_id = insert_approver(session, org_id=org_id)
+        expense = generate_expense(submitter_id=submitter_id, org_id=org_id)
+        expense_repo.save(expense)
+
+        statements = capture_statements(session)
+        submitted = expense_repo.submit(expense.id, by=submitter_id)
+        approved = expense_repo.approve(expense.id, by=approver_id)
+
+        statements = without_summary_upkeep(statements)
+        assert len(statements) == 2
+        assert all(stmt.startswith("UPDATE") for stmt in statements)
+        assert submitted.state == expense_model.ExpenseState.SUBMITTED
+        assert approved.state == expense_model.ExpenseState.APPROVED
+        assert approved.approved_by_id == approver_id
+
+    def test_failed_transition_raises_domain_error(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        approver_id = insert_approver(session, org_id=org_id)
+        expense = generate_expense(submitter_id=submitter_id, org_id=org_id)
+        expense_repo.save(expense)
+
+        with pytest.raises(domain_exception.ExpenseNotSubmitted):
+            expense_repo.approve(expense.id, by=approver_id)
+
+        expense_repo.submit(expense.id, by=submitter_id)
+        with pytest.raises(domain_exception.InvalidApprover):
+            expense_repo.approve(expense.id, by=submitter_id)
+        with pytest.raises(domain_exception.ExpenseNotDraft):
+            expense_repo.submit(expense.id, by=submitter_id)
+        with pytest.raises(exception.NoExpenseFound):
+            expense_repo.submit(uuid4(), by=submitter_id)
+
+    def test_can_withdraw_and_revoke(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        approver_id = insert_approver(session, org_id=org_id)
+        withdrawn = generate_expense(submitter_id=submitter_id, org_id=org_id)
+        revoked = generate_expense(submitter_id=submitter_id, org_id=org_id)
+        expense_repo.save_many([withdrawn, revoked])
+
+        expense_repo.submit(withdrawn.id, by=submitter_id)
+        assert (
+            expense_repo.withdraw(withdrawn.id, by=submitter_id).state
+            == expense_model.ExpenseState.WITHDRAWN
+        )
+
+        expense_repo.submit(revoked.id, by=submitter_id)
+        expense_repo.approve(revoked.id, by=approver_id)
+        with pytest.raises(domain_exception.InvalidRevokeUser):
+            expense_repo.revoke(revoked.id, by=submitter_id, reason="reason")
+        with pytest.raises(domain_exception.MissingReason):
+            expense_repo.revoke(revoked.id, by=approver_id, reason="")
+        expense = expense_repo.revoke(revoked.id, by=approver_id, reason="reason")
+        assert expense.state == expense_model.ExpenseState.REVOKED
+        assert expense.revoke_reason == "reason"
+
+    def test_can_page_through_organization_expenses(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expenses = generate_expenses_over_year(submitter_id, org_id, 25)
+        expense_repo.save_many(expenses)
+
+        pages = walk_pages(
+            lambda **kwargs: expense_repo.find_page_by_organization(org_id, **kwargs),
+            limit=10,
+        )
+
+        assert [len(page.items) for page in pages] == [10, 10, 5]
+        assert [expense.id for page in pages for expense in page.items] == [
+            expense.id for expense in sorted(expenses, key=lambda e: (e.date, e.id))
+        ]
+
+    def test_pages_respect_filters(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expenses = generate_expenses_over_year(submitter_id, org_id, 24)
+        expense_repo.save_many(expenses)
+        filters = ExpenseFilter(
+            states=[expense_model.ExpenseState.SUBMITTED],
+            date_from=datetime(2025, 1, 1),
+            date_to=datetime(2025, 7, 1),
+        )
+
+        pages = walk_pages(
+            lambda **kwargs: expense_repo.find_page_by_user(
+                submitter_id, filters=filters, **kwargs
+            ),
+            limit=3,
+        )
+
+        found = [expense for page in pages for expense in page.items]
+        assert {expense.id for expense in found} == {
+            expense.id for expense in expenses if filters.matches(expense)
+        }
+
+    def test_can_stream_organization_expenses(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session, batch_size=7)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expenses = generate_expenses_over_year(submitter_id, org_id, 30)
+        expense_repo.save_many(expenses)
+
+        streamed = list(expense_repo.stream_by_organization(org_id))
+
+        assert [expense.id for expense in streamed] == [
+            expense.id for expense in sorted(expenses, key=lambda e: (e.date, e.id))
+        ]
+
+    def test_fake_repo_pages_like_sql_repo(self, session):
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expenses = generate_expenses_over_year(submitter_id, org_id, 15)
+        sql_repo = SqlAlchemyExpenseRepository(session)
+        sql_repo.save_many(expenses)
+        fake_repo = FakeExpenseRepository(expenses)
+
+        def ids(repo):
+            pages = walk_pages(
+                lambda **kwargs: repo.find_page_by_organization(org_id, **kwargs),
+                limit=4,
+            )
+            return [expense.id for page in pages for expense in page.items]
+
+        assert ids(sql_repo) == ids(fake_repo)
+
+    def test_approve_many_in_one_statement(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        approver_id = insert_approver(session, org_id=org_id)
+        expenses = [
+            generate_expense(submitter_id=submitter_id, org_id=org_id) for i in range(5)
+        ]
+        expense_repo.save_many(expenses)
+        expense_repo.submit_many([expense.id for expense in expenses[:4]], submitter_id)
+
+        statements = capture_statements(session)
+        approved = expense_repo.approve_many(
+            [expense.id for expense in expenses], by=approver_id
+        )
+
+        assert len(without_summary_upkeep(statements)) == 1
+        assert {expense.id for expense in approved} == {
+            expense.id for expense in expenses[:4]
+        }
+        assert all(expense.approved_by_id == approver_id for expense in approved)
+        assert expense_repo.get_many([expenses[4].id])[expenses[4].id].state == (
+            expense_model.ExpenseState.DRAFT
+        )
+
+
+def by_state_and_month(aggregate):
+    state, month = aggregate.key
+    return state.name, month
+
+
+class TestExpenseQueries:
+    def test_can_aggregate_by_state_and_month(self, session):
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expenses = generate_expenses_over_year(submitter_id, org_id, 24)
+        for i, expense in enumerate(expenses):
+            expense.amount = i + 1
+        SqlAlchemyExpenseRepository(session).save_many(expenses)
+        group_by = [ExpenseGrouping.STATE, ExpenseGrouping.MONTH]
+
+        aggregates = SqlAlchemyExpenseQueries(session).aggregate_by_organization(
+            org_id, group_by
+        )
+
+        assert sum(aggregate.count for aggregate in aggregates) == 24
+        assert sorted(aggregates, key=by_state_and_month) == sorted(
+            FakeExpenseQueries(expenses).aggregate_by_organization(org_id, group_by),
+            key=by_state_and_month,
+        )
+
+    def test_aggregates_respect_filters(self, session):
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expenses = generate_expenses_over_year(submitter_id, org_id, 12)
+        SqlAlchemyExpenseRepository(session).save_many(expenses)
+        filters = ExpenseFilter(states=[expense_model.ExpenseState.SUBMITTED])
+
+        (aggregate,) = SqlAlchemyExpenseQueries(session).aggregate_by_organization(
+            org_id, [ExpenseGrouping.SUBMITTER], filters
+        )
+
+        assert aggregate.key == (submitter_id,)
+        assert aggregate.count == 4
+        assert aggregate.total == pytest.approx(400)
+        assert aggregate.average == pytest.approx(100)
+
+    def test_read_only_listing_bypasses_identity_map(self, session):
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expenses = generate_expenses_over_year(submitter_id, org_id, 12)
+        SqlAlchemyExpenseRepository(session).save_many(expenses)
+        expense_queries = SqlAlchemyExpenseQueries(session)
+
+        listed = expense_queries.expenses_by_organization(org_id)
+
+        assert listed == FakeExpenseQueries(expenses).expenses_by_organization(org_id)
+        assert all(expense.is_persisted for expense in listed)
+        assert not any(
+            isinstance(instance, orm.ExpenseORM)
+            for instance in session.identity_map.values()
+        )
+
+    def test_rows_respect_filters(self, session):
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expenses = generate_expenses_over_year(submitter_id, org_id, 12)
+        SqlAlchemyExpenseRepository(session).save_many(expenses)
+        filters = ExpenseFilter(states=[expense_model.ExpenseState.SUBMITTED])
+
+        rows = SqlAlchemyExpenseQueries(session).rows_by_organization(org_id, filters)
+
+        assert rows == FakeExpenseQueries(expenses).rows_by_organization(
+            org_id, filters
+        )
+        assert [row.date.month for row in rows] == [1, 4, 7, 10]
+
+    def test_streamed_rows_match_listing(self, session):
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        SqlAlchemyExpenseRepository(session).save_many(
+            generate_expenses_over_year(submitter_id, org_id, 10)
+        )
+        expense_queries = SqlAlchemyExpenseQueries(session, batch_size=3)
+
+        streamed = expense_queries.stream_rows_by_organization(org_id)
+
+        assert list(streamed) == expense_queries.rows_by_organization(org_id)
+
+    def test_can_read_columnar_batch(self, session):
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expenses = generate_expenses_over_year(submitter_id, org_id, 12)
+        SqlAlchemyExpenseRepository(session).save_many(expenses)
+
+        batch = SqlAlchemyExpenseQueries(session).batch_by_organization(org_id)
+
+        assert batch == FakeExpenseQueries(expenses).batch_by_organization(org_id)
+        assert len(batch) == 12
+        assert batch.totals_by_state() == {
+            expense_model.ExpenseState.DRAFT: pytest.approx(800),
+            expense_model.ExpenseState.SUBMITTED: pytest.approx(400),
+        }
+
+    def test_tag_changes_with_every_write(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expense = generate_expense(submitter_id=submitter_id, org_id=org_id)
+        expense_repo.save(expense)
+        expense_queries = SqlAlchemyExpenseQueries(session)
+
+        stamp = expense_queries.stamp_by_id(expense.id)
+        tagged = expense_queries.expense_by_id(expense.id)
+        expense_repo.submit(expense.id, by=submitter_id)
+
+        assert stamp == (submitter_id, org_id, tagged.tag)
+        assert tagged.expense == expense
+        assert expense_queries.stamp_by_id(expense.id).tag != stamp.tag
+        with pytest.raises(exception.NoExpenseFound):
+            expense_queries.stamp_by_id(uuid4())
+
+    def test_list_pages_carry_names_in_one_query(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        approver_id = insert_approver(session, org_id=org_id)
+        expenses = generate_expenses_over_year(submitter_id, org_id, 7)
+        expense_repo.save_many(expenses)
+        expense_repo.approve(expenses[0].id, by=approver_id)
+        expenses[0] = expense_repo.get(expenses[0].id)
+        expense_queries = SqlAlchemyExpenseQueries(session)
+        statements = capture_statements(session)
+
+        first = expense_queries.list_page_by_organization(org_id, limit=4)
+        second = expense_queries.list_page_by_organization(
+            org_id, after=first.next_cursor, limit=4
+        )
+
+        assert len(statements) == 2
+        assert second.next_cursor is None
+        items = first.items + second.items
+        assert [item.id for item in items] == [expense.id for expense in expenses]
+        assert {item.organization_name for item in items} == {"org1"}
+        assert {item.submitter_name for item in items} == {"submitter"}
+        assert (items[0].approved_by_id, items[0].approver_name) == (
+            approver_id,
+            "approver",
+        )
+        assert items[1].approver_name is None
+        fake_queries = FakeExpenseQueries(
+            expenses,
+            names={org_id: "org1", submitter_id: "submitter", approver_id: "approver"},
+        )
+        assert first == fake_queries.list_page_by_organization(org_id, limit=4)
+        assert expense_queries.list_page_by_user(approver_id).items == [items[0]]
+
+    def test_list_tags_follow_the_page_rows(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expenses = generate_expenses_over_year(submitter_id, org_id, 7)
+        expense_repo.save_many(expenses)
+        expense_queries = SqlAlchemyExpenseQueries(session)
+        first = expense_queries.list_page_by_organization(org_id, limit=4)
+        second = expense_queries.list_page_by_organization(
+            org_id, after=first.next_cursor, limit=4
+        )
+        statements = capture_statements(session)
+
+        tags = [
+            expense_queries.list_tag_by_organization(org_id, limit=4),
+            expense_queries.list_tag_by_organization(
+                org_id, after=first.next_cursor, limit=4
+            ),
+            expense_queries.list_tag_by_user(submitter_id, limit=4),
+        ]
+        tag_statements = list(statements)
+        expense_repo.submit(expenses[5].id, by=submitter_id)
+
+        assert tags == [first.tag, second.tag, first.tag]
+        assert len(tag_statements) == 3
+        assert not any("JOIN" in statement for statement in tag_statements)
+        assert expense_queries.list_tag_by_organization(org_id, limit=4) == first.tag
+        assert (
+            expense_queries.list_tag_by_organization(
+                org_id, after=first.next_cursor, limit=4
+            )
+            != second.tag
+        )
+
+
+class TestAsyncRepos:
+    def test_can_resolve_principals(self):
+        async def scenario(session):
+            org_id = await session.run_sync(insert_org)
+            approver_id = await session.run_sync(insert_approver, org_id=org_id)
+            user_repo = AsyncCachedUserRepository(
+                AsyncSqlAlchemyUserRepository(session), PrincipalCache()
+            )
+            return (
+                org_id,
+                approver_id,
+                await user_repo.get_principal(approver_id),
+                await user_repo.get_principals([approver_id, uuid4()]),
+                await user_repo.exists(uuid4()),
+            )
+
+        org_id, approver_id, principal, principals, unknown_exists = run_async(scenario)
+
+        assert principal.role == user_model.UserRole.APPROVER
+        assert principal.organization_id == org_id
+        assert principals == {approver_id: principal}
+        assert not unknown_exists
+
+    def test_transitions_match_sync_repo(self):
+        async def scenario(session):
+            org_id = await session.run_sync(insert_org)
+            submitter_id = await session.run_sync(insert_submitter, org_id=org_id)
+            approver_id = await session.run_sync(insert_approver, org_id=org_id)
+            expense_repo = AsyncSqlAlchemyExpenseRepository(session)
+            expenses = generate_expenses_over_year(submitter_id, org_id, 6)
+            await expense_repo.save_many(expenses)
+
+            draft = expenses[1]
+            draft.amount = 42
+            await expense_repo.save(draft)
+            await expense_repo.submit(draft.id, by=submitter_id)
+            with pytest.raises(domain_exception.InvalidApprover):
+                await expense_repo.approve(draft.id, by=submitter_id)
+            approved = await expense_repo.approve(draft.id, by=approver_id)
+            with pytest.raises(exception.NoExpenseFound):
+                await expense_repo.get(uuid4())
+
+            page = await expense_repo.find_page_by_organization(org_id, limit=4)
+            streamed = [
+                expense async for expense in expense_repo.stream_by_organization(org_id)
+            ]
+            drifts = await session.run_sync(rebuild_spend_summary, check_only=True)
+            return approved, page, streamed, drifts
+
+        approved, page, streamed, drifts = run_async(scenario)
+
+        assert approved.state == expense_model.ExpenseState.APPROVED
+        assert approved.amount == 42
+        assert len(page.items) == 4 and page.next_cursor is not None
+        assert len(streamed) == 6
+        assert drifts == []
+
+
+class TestSpendSummary:
+    def assert_no_drift(self, session):
+        assert rebuild_spend_summary(session, check_only=True) == []
+
+    def test_summary_follows_saves(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expenses = generate_expenses_over_year(submitter_id, org_id, 24)
+        expense_repo.save_many(expenses[:12])
+        expense_repo.save(expenses[12])
+        self.assert_no_drift(session)
+
+        moved = expense_repo.get(expenses[0].id)
+        moved.date = datetime(2025, 6, 15)
+        moved.amount = 250
+        expense_repo.save(moved)
+        self.assert_no_drift(session)
+
+        expenses[1].amount = 42
+        expense_repo.save_many(expenses[1:])
+        self.assert_no_drift(session)
+
+    def test_summary_follows_transitions(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        approver_id = insert_approver(session, org_id=org_id)
+        expenses = [
+            generate_expense(submitter_id=submitter_id, org_id=org_id) for i in range(6)
+        ]
+        expense_repo.save_many(expenses)
+
+        expense_repo.submit_many([expense.id for expense in expenses[:4]], submitter_id)
+        expense_repo.approve_many([expenses[0].id, expenses[1].id], approver_id)
+        expense_repo.revoke(expenses[0].id, by=approver_id, reason="reason")
+        expense_repo.withdraw(expenses[2].id, by=submitter_id)
+        expense_repo.withdraw(expenses[4].id, by=submitter_id)
+        expense_repo.submit(expenses[5].id, by=submitter_id)
+        with pytest.raises(domain_exception.ExpenseNotSubmitted):
+            expense_repo.approve(expenses[4].id, by=approver_id)
+
+        self.assert_no_drift(session)
+        assert {
+            aggregate.key[2]: aggregate.count
+            for aggregate in SqlAlchemyExpenseQueries(session).monthly_spend(org_id)
+        } == {
+            expense_model.ExpenseState.REVOKED: 1,
+            expense_model.ExpenseState.APPROVED: 1,
+            expense_model.ExpenseState.WITHDRAWN: 2,
+            expense_model.ExpenseState.SUBMITTED: 2,
+        }
+
+    def test_monthly_spend_matches_fake(self, session):
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expenses = generate_expenses_over_year(submitter_id, org_id, 24)
+        SqlAlchemyExpenseRepository(session).save_many(expenses)
+        months = dict(month_from=date(2025, 3, 1), month_to=date(2025, 9, 1))
+
+        assert SqlAlchemyExpenseQueries(session).monthly_spend(
+            org_id, **months
+        ) == FakeExpenseQueries(expenses).monthly_spend(org_id, **months)
+
+    def test_rebuild_repairs_drift(self, session):
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        SqlAlchemyExpenseRepository(session).save_many(
+            generate_expenses_over_year(submitter_id, org_id, 12)
+        )
+        session.execute(update(orm.ExpenseSummaryORM).values(expense_count=0))
+
+        assert len(rebuild_spend_summary(session)) == 12
+        self.assert_no_drift(session)
+
+    def test_large_totals_allow_rounding(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expenses = [
+            generate_expense(submitter_id=submitter_id, org_id=org_id)
+            for i in range(30)
+        ]
+        for expense in expenses:
+            expense.amount = 123_456_789.01
+        expense_repo.save_many(expenses)
+        for expense in expenses[::2]:
+            expense.amount = 987_654_321.07
+        expense_repo.save_many(expenses)
+
+        self.assert_no_drift(session)
+
+    def test_batch_reads_stored_values_under_lock(self):
+        statement = _summary_rows([generate_expense()])
+
+        assert "FOR UPDATE" in str(statement.compile(dialect=postgresql.dialect()))
+
+
+class TestExpenseIndexes:
+    def test_organization_listing_uses_index(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+
+        (plan,) = explain_queries(
+            session, lambda: expense_repo.find_page_by_organization(uuid4())
+        )
+
+        assert "ix_expenses_organization_id_date" in plan
+        assert "TEMP B-TREE" not in plan
+
+    def test_user_listing_uses_submitter_and_approver_index(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+
+        (plan,) = explain_queries(
+            session, lambda: expense_repo.find_page_by_user(uuid4())
+        )
+
+        assert "ix_expenses_submitter_id_date" in plan
+        assert "ix_expenses_approved_by_id" in plan
+
+    def test_approval_queue_uses_partial_index(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        filters = ExpenseFilter(states=[expense_model.ExpenseState.SUBMITTED])
+
+        (plan,) = explain_queries(
+            session,
+            lambda: expense_repo.find_page_by_organization(uuid4(), filters=filters),
+        )
+
+        assert "ix_expenses_submitted_organization_id_date" in plan
+
+    def test_list_pages_use_listing_indexes(self, session):
+        expense_queries = SqlAlchemyExpenseQueries(session)
+
+        (organization_plan,) = explain_queries(
+            session, lambda: expense_queries.list_page_by_organization(uuid4())
+        )
+        (user_plan,) = explain_queries(
+            session, lambda: expense_queries.list_page_by_user(uuid4())
+        )
+
+        assert "ix_expenses_organization_id_date" in organization_plan
+        assert "TEMP B-TREE" not in organization_plan
+        assert "ix_expenses_submitter_id_date" in user_plan
+        assert "ix_expenses_approved_by_id" in user_plan
+
+
+class TestLocalReceiptStore:
+    def test_identical_receipts_are_stored_once(self, tmp_path):
+        store = LocalReceiptStore(tmp_path)
+        content = bytes(range(256)) * 1000
+
+        first = store.save(content[i : i + 4096] for i in range(0, len(content), 4096))
+        second = store.save([content])
+
+        assert first == second
+        assert first.digest == hashlib.sha256(content).hexdigest()
+        assert first.size == len(content)
+        assert first.path.read_bytes() == content
+        assert store.locate(first.digest) == first
+        assert [path for path in tmp_path.rglob("*") if path.is_file()] == [first.path]
+
+    def test_failed_upload_leaves_nothing_behind(self, tmp_path):
+        store = LocalReceiptStore(tmp_path)
+
+        def interrupted():
+            yield b"partial"
+            raise ConnectionError
+
+        with pytest.raises(ConnectionError):
+            store.save(interrupted())
+
+        assert not [path for path in tmp_path.rglob("*") if path.is_file()]
+        with pytest.raises(exception.NoReceiptFound):
+            store.locate(hashlib.sha256(b"partial").hexdigest())
+
+    def test_locate_rejects_anything_but_a_digest(self, tmp_path):
+        store = LocalReceiptStore(tmp_path)
+
+        with pytest.raises(exception.NoReceiptFound):
+            store.locate("../../etc/passwd")
+
+
+def minimal_pdf(text: str) -> bytes:
+    stream = b"BT /F1 12 Tf 72 720 Td (%s) Tj ET" % text.encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R"
+        b" /Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    return pdf
+
+
+def queued_job(document_reference: str, available_at: datetime):
+    return receipt_model.ReceiptJob(
+        document_reference=document_reference, available_at=available_at
+    )
+
+
+class TestReceiptJobs:
+    def test_saving_expenses_queues_each_receipt_once(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expenses = [
+            generate_expense(submitter_id=submitter_id, org_id=org_id) for i in range(4)
+        ]
+        for expense in expenses[:3]:
+            expense.document_reference = "a" * 64
+
+        expense_repo.save_many(expenses[:2])
+        expense_repo.save(expenses[2])
+        expense_repo.save(expenses[3])
+        replaced = expense_repo.get(expenses[3].id)
+        replaced.document_reference = "b" * 64
+        expense_repo.save(replaced)
+
+        jobs = SqlAlchemyReceiptJobRepository(session)
+        counts = jobs.stats(datetime(2025, 1, 1), datetime(2025, 1, 2)).counts
+        assert counts[receipt_model.ReceiptJobState.QUEUED] == 2
+        assert jobs.get("a" * 64).attempts == 0
+        assert jobs.get("b" * 64).analysis is None
+
+    def test_free_form_references_queue_no_job(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expenses = [
+            generate_expense(submitter_id=submitter_id, org_id=org_id) for i in range(3)
+        ]
+        expenses[0].document_reference = "scans/2024/receipt-0001.pdf"
+        expenses[1].document_reference = "x" * 200
+        expenses[2].document_reference = "A" * 64
+
+        expense_repo.save(expenses[0])
+        expense_repo.save_many(expenses[1:])
+
+        assert session.scalars(select(orm.ReceiptJobORM)).all() == []
+        stored = expense_repo.get(expenses[1].id)
+        assert stored.document_reference == "x" * 200
+
+    def test_claim_leases_due_jobs_until_they_finish(self, session):
+        now = datetime(2025, 1, 1, 12)
+        session.add_all(
+            [
+                orm.ReceiptJobORM(document_reference="a" * 64, available_at=now),
+                orm.ReceiptJobORM(
+                    document_reference="b" * 64, available_at=now - timedelta(1)
+                ),
+                orm.ReceiptJobORM(
+                    document_reference="c" * 64, available_at=now + timedelta(1)
+                ),
+            ]
+        )
+        session.commit()
+        jobs = SqlAlchemyReceiptJobRepository(session)
+        lease = timedelta(minutes=5)
+
+        (first,) = jobs.claim(1, now, lease)
+        (second,) = jobs.claim(5, now + timedelta(minutes=1), lease)
+        assert (first.document_reference, second.document_reference) == (
+            "b" * 64,
+            "a" * 64,
+        )
+        assert first.state == receipt_model.ReceiptJobState.RUNNING
+        assert first.attempts == 1
+        assert jobs.claim(5, now + timedelta(minutes=1), lease) == []
+
+        # The worker holding "b" died, its lease runs out
+        (reclaimed,) = jobs.claim(5, now + lease, lease)
+        assert reclaimed.document_reference == "b" * 64
+        assert reclaimed.attempts == 2
+
+        assert jobs.fail(second, "OSError: busy", retry_at=now + timedelta(hours=1))
+        analysis = receipt_model.ReceiptAnalysis(media_type="image/png", size=3)
+        # The first worker reports late, after "b" was claimed again
+        assert not jobs.complete(first, analysis)
+        assert jobs.get("b" * 64).state == receipt_model.ReceiptJobState.RUNNING
+        assert jobs.complete(reclaimed, analysis)
+        assert not jobs.fail(reclaimed, "OSError: late")
+        retried = jobs.get("a" * 64)
+        assert retried.state == receipt_model.ReceiptJobState.QUEUED
+        assert retried.last_error == "OSError: busy"
+        assert jobs.get("b" * 64).analysis.media_type == "image/png"
+        assert jobs.claim(5, now + 2 * lease, lease) == []
+
+        (retry,) = jobs.claim(5, now + timedelta(hours=1), lease)
+        assert jobs.fail(retry, "OSError: gone")
+        stats = jobs.stats(datetime.now(UTC) - timedelta(minutes=1), datetime.now(UTC))
+        assert stats.counts[receipt_model.ReceiptJobState.FAILED] == 1
+        assert stats.finished == 2
+        assert jobs.stats(now, now).throughput == 0.0
+
+    def test_fake_drops_results_of_stale_claims(self):
+        now = datetime(2025, 1, 1)
+        lease = timedelta(minutes=5)
+        jobs = FakeReceiptJobRepository([queued_job("a" * 64, now)])
+        analysis = receipt_model.ReceiptAnalysis(media_type="image/png", size=3)
+
+        (stale,) = jobs.claim(1, now, lease)
+        (current,) = jobs.claim(1, now + lease, lease)
+
+        assert not jobs.fail(stale, "OSError: late", retry_at=now + 2 * lease)
+        assert jobs.complete(current, analysis)
+        assert not jobs.complete(current, analysis)
+        assert jobs.get("a" * 64).state == receipt_model.ReceiptJobState.SUCCEEDED
+
+
+class TestReceiptPipeline:
+    def test_pipeline_analyzes_images_and_pdfs(self, tmp_path):
+        store = LocalReceiptStore(tmp_path)
+        scan = BytesIO()
+        Image.new("RGB", (1600, 1200), "white").save(scan, format="JPEG")
+        image = store.save([scan.getvalue()])
+        pdf = store.save([minimal_pdf("Lunch 12.50 EUR")])
+        now = datetime(2025, 1, 1)
+        jobs = FakeReceiptJobRepository(
+            [queued_job(image.digest, now), queued_job(pdf.digest, now)]
+        )
+
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            pipeline = ReceiptPipeline(
+                jobs, store, executor, capacity=2, clock=lambda: now
+            )
+            assert pipeline.run_once() == 2
+
+        image_analysis = jobs.get(image.digest).analysis
+        assert image_analysis.media_type == "image/jpeg"
+        assert (image_analysis.width, image_analysis.height) == (1600, 1200)
+        thumbnail = store.locate(image_analysis.thumbnail_reference)
+        with Image.open(thumbnail.path) as thumbnail_image:
+            assert thumbnail_image.size == (320, 240)
+        pdf_analysis = jobs.get(pdf.digest).analysis
+        assert pdf_analysis.page_count == 1
+        assert "Lunch 12.50 EUR" in pdf_analysis.text
+        assert pipeline.stats().succeeded == 2
+        assert pipeline.stats().throughput > 0
+
+    def test_failed_jobs_are_retried_with_backoff(self, tmp_path):
+        store = LocalReceiptStore(tmp_path)
+        corrupted = store.save([b"receipt"])
+        corrupted.path.write_bytes(b"tampered")
+        now = [datetime(2025, 1, 1)]
+        jobs = FakeReceiptJobRepository([queued_job(corrupted.digest, now[0])])
+        pipeline = ReceiptPipeline(
+            jobs,
+            store,
+            ThreadPoolExecutor(max_workers=1),
+            capacity=1,
+            max_attempts=2,
+            retry_delay=timedelta(seconds=30),
+            clock=lambda: now[0],
+        )
+
+        assert pipeline.run_once() == 1
+        assert jobs.get(corrupted.digest).state == receipt_model.ReceiptJobState.QUEUED
+        assert pipeline.run_once() == 0
+        now[0] += timedelta(seconds=30)
+        assert pipeline.run_once() == 1
+
+        job = jobs.get(corrupted.digest)
+        assert job.state == receipt_model.ReceiptJobState.FAILED
+        assert job.last_error.startswith("CorruptReceipt")
+        assert (pipeline.stats().retried, pipeline.stats().failed) == (1, 1)
+
+
+def outbox_rows(session) -> list[orm.OutboxMessageORM]:
+    return session.scalars(
+        select(orm.OutboxMessageORM).order_by(orm.OutboxMessageORM.occurred_at)
+    ).all()
+
+
+class TestOutbox:
+    def test_saves_and_transitions_write_their_events(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        approver_id = insert_approver(session, org_id=org_id)
+        expenses = [
+            generate_expense(submitter_id=submitter_id, org_id=org_id) for i in range(3)
+        ]
+        expenses[0].submit(submitter_id)
+
+        expense_repo.save(expenses[0])
+        expense_repo.save_many(expenses[1:])
+        expense_repo.approve(expenses[0].id, by=approver_id)
+        expense_repo.submit_many([expense.id for expense in expenses[1:]], submitter_id)
+
+        rows = outbox_rows(session)
+        assert [row.event_type for row in rows] == [
+            "ExpenseSubmitted",
+            "ExpenseApproved",
+            "ExpenseSubmitted",
+            "ExpenseSubmitted",
+        ]
+        assert rows[1].expense_id == expenses[0].id
+        assert rows[1].organization_id == org_id
+        assert rows[1].payload == {"by": str(approver_id)}
+        assert all(row.dispatched_at is None for row in rows)
+
+    def test_events_are_written_only_with_their_change(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expense = generate_expense(submitter_id=submitter_id, org_id=org_id)
+        expense_repo.save(expense)
+
+        with pytest.raises(domain_exception.ExpenseNotSubmitted):
+            expense_repo.approve(expense.id, by=submitter_id)
+        assert expense_repo.submit_many([expense.id], by=uuid4()) == []
+        assert outbox_rows(session) == []
+
+    def test_fake_repo_collects_events(self):
+        expense = generate_expense()
+        expense_repo = FakeExpenseRepository([expense])
+
+        expense_repo.submit(expense.id, by=expense.submitter_id)
+        expense_repo.approve_many([expense.id], by=uuid4())
+
+        assert [type(event).__name__ for event in expense_repo.events] == [
+            "ExpenseSubmitted",
+            "ExpenseApproved",
+        ]
+
+    def test_dispatcher_drains_in_batches(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expenses = [
+            generate_expense(submitter_id=submitter_id, org_id=org_id) for i in range(5)
+        ]
+        for expense in expenses:
+            expense.submit(submitter_id)
+        expense_repo.save_many(expenses)
+        published = []
+        dispatcher = OutboxDispatcher(session, published.append, batch_size=2)
+
+        assert [dispatcher.dispatch_batch() for _ in range(4)] == [2, 2, 1, 0]
+        assert [message.expense_id for message in published] == [
+            expense.id for expense in expenses
+        ]
+        assert all(row.dispatched_at is not None for row in outbox_rows(session))
+
+        assert dispatcher.purge(before=datetime.now(UTC) + timedelta(1)) == 5
+        assert outbox_rows(session) == []
+
+    def test_failed_messages_are_retried_until_max_attempts(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expense = generate_expense(submitter_id=submitter_id, org_id=org_id)
+        expense.submit(submitter_id)
+        expense_repo.save(expense)
+
+        def unavailable(message):
+            raise ConnectionError("broker down")
+
+        start = datetime.now(UTC)
+        now = [start]
+        dispatcher = OutboxDispatcher(
+            session,
+            unavailable,
+            max_attempts=3,
+            retry_delay=timedelta(seconds=30),
+            clock=lambda: now[0],
+        )
+        attempts = []
+        for seconds in [0, 10, 30, 60, 90, 1000]:
+            now[0] = start + timedelta(seconds=seconds)
+            assert dispatcher.dispatch_batch() == 0
+            attempts.append(outbox_rows(session)[0].attempts)
+        assert attempts == [1, 1, 2, 2, 3, 3]
+
+        (row,) = outbox_rows(session)
+        assert row.dispatched_at is None and row.dead_at is not None
+        assert row.last_error == "ConnectionError: broker down"
+
+    def test_dead_messages_are_kept_until_purged(self, session):
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        org_id = insert_org(session)
+        submitter_id = insert_submitter(session, org_id=org_id)
+        expense = generate_expense(submitter_id=submitter_id, org_id=org_id)
+        expense.submit(submitter_id)
+        expense_repo.save(expense)
+
+        def unavailable(message):
+            raise ConnectionError("broker down")
+
+        dispatcher = OutboxDispatcher(session, unavailable, max_attempts=1)
+        assert dispatcher.dispatch_batch() == 0
+        (dead,) = dispatcher.dead_letters()
+        assert dead.message.expense_id == expense.id
+        assert (dead.attempts, dead.last_error) == (1, "ConnectionError: broker down")
+
+        later = datetime.now(UTC) + timedelta(1)
+        assert dispatcher.purge(before=later) == 0
+        assert dispatcher.purge(before=later, dead_before=later) == 1
+        assert dispatcher.dead_letters() == []
+
+
+def replicated_expenses():
+    """Primary and replica databases, the replica lacks the latest expense."""
+    primary, replica = create_engine("sqlite://"), create_engine("sqlite://")
+    org_id, submitter_id = uuid4(), uuid4()
+    replicated = generate_expense(submitter_id=submitter_id, org_id=org_id)
+    latest = generate_expense(submitter_id=submitter_id, org_id=org_id)
+    for engine, expenses in ((primary, [replicated, latest]), (replica, [replicated])):
+        orm.Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        SqlAlchemyExpenseRepository(session).save_many(
+            [replace(expense) for expense in expenses]
+        )
+        session.close()
+    return primary, replica, org_id, latest
+
+
+class TestReplicaRouting:
+    def test_reports_read_from_replica_until_session_writes(self):
+        primary, replica, org_id, latest = replicated_expenses()
+        session = RoutingSession(
+            bind=primary, replica=Replica(replica, max_lag=5, measure=lambda _: 0.5)
+        )
+        expense_repo = SqlAlchemyExpenseRepository(session)
+        expense_queries = SqlAlchemyExpenseQueries(session)
+
+        assert len(expense_repo.find_by_organization(org_id)) == 1
+        assert len(expense_queries.rows_by_organization(org_id)) == 1
+        assert len(list(expense_queries.stream_rows_by_organization(org_id))) == 1
+        (aggregate,) = expense_queries.aggregate_by_organization(
+            org_id, [ExpenseGrouping.STATE]
+        )
+        assert aggregate.count == 1
+        assert expense_repo.get(latest.id).title == latest.title
+        assert expense_queries.expense_by_id(latest.id).expense.id == latest.id
+
+        expense_repo.save(generate_expense(submitter_id=uuid4(), org_id=org_id))
+        assert len(expense_repo.find_by_organization(org_id)) == 3
+        assert len(expense_queries.rows_by_organization(org_id)) == 3
+
+    @pytest.mark.parametrize("lag", [30.0, None])
+    def test_lagging_or_unreachable_replica_falls_back_to_primary(self, lag):
+        primary, replica, org_id, _ = replicated_expenses()
+        session = RoutingSession(
+            bind=primary, replica=Replica(replica, max_lag=5, measure=lambda _: lag)
+        )
+
+        assert (
+            len(SqlAlchemyExpenseRepository(session).find_by_organization(org_id)) == 2
+        )
+        assert len(SqlAlchemyExpenseQueries(session).rows_by_organization(org_id)) == 2
+
+    @pytest.mark.parametrize(
+        "replica",
+        [
+            create_engine("sqlite:////nonexistent/replica.db"),
+            create_engine("sqlite://"),
+        ],
+        ids=["unreachable", "failing"],
+    )
+    def test_failed_replica_read_is_retried_on_primary(self, replica):
+        primary, _, org_id, _ = replicated_expenses()
+        now = [0.0]
+        replica = Replica(
+            replica, max_lag=5, measure=lambda _: 0.0, clock=lambda: now[0]
+        )
+        session = RoutingSession(bind=primary, replica=replica)
+
+        assert (
+            len(SqlAlchemyExpenseRepository(session).find_by_organization(org_id)) == 2
+        )
+        assert not replica.is_available()
+        now[0] = 1.0
+        assert len(SqlAlchemyExpenseQueries(session).rows_by_organization(org_id)) == 2
+        assert not replica.is_available()
+        session.commit()
+
+    def test_lag_is_measured_once_per_interval(self):
+        lags = iter([0.0, 30.0])
+        now = [0.0]
+        replica = Replica(
+            create_engine("sqlite://"),
+            max_lag=5,
+            check_interval=1.0,
+            measure=lambda _: next(lags),
+            clock=lambda: now[0],
+        )
+
+        assert replica.is_available()
+        now[0] = 0.5
+        assert replica.is_available()
+        now[0] = 1.0
+        assert not replica.is_available()
+
+
 class TestPersistantExpenseRepo:
     def test_can_save_expense(self, postgres_session):
         expense_repo = SqlAlchemyExpenseRepository(postgres_session)
@@ -184,3 +1635,78 @@ class TestPersistantExpenseRepo:
 
         with pytest.raises(exception.NoExpenseFound):
             expense_repo.find_by_organization(uuid4())
+
+    def test_can_save_many_expenses(self, postgres_session):
+        expense_repo = SqlAlchemyExpenseRepository(postgres_session, batch_size=100)
+        org_id = insert_org(postgres_session)
+        submitter_id = insert_submitter(postgres_session, org_id=org_id)
+        expenses = [
+            generate_expense(submitter_id=submitter_id, org_id=org_id)
+            for i in range(1000)
+        ]
+
+        expense_repo.save_many(expenses)
+        expense_repo.save_many(expenses[:10])
+
+        assert len(expense_repo.find_by_organization(org_id=org_id)) == 1000
+
+    def test_listings_use_indexes(self, postgres_session):
+        expense_repo = SqlAlchemyExpenseRepository(postgres_session)
+        # The test tables are tiny, make the planner prove it can use the indexes
+        postgres_session.execute(text("SET LOCAL enable_seqscan = off"))
+        filters = ExpenseFilter(states=[expense_model.ExpenseState.SUBMITTED])
+
+        (organization_plan,) = explain_queries(
+            postgres_session, lambda: expense_repo.find_page_by_organization(uuid4())
+        )
+        (queue_plan,) = explain_queries(
+            postgres_session,
+            lambda: expense_repo.find_page_by_organization(uuid4(), filters=filters),
+        )
+
+        assert "ix_expenses_organization_id_date" in organization_plan
+        assert "ix_expenses_submitted_organization_id_date" in queue_plan
+
+
+class TestPersistantOutbox:
+    def test_concurrent_dispatchers_skip_locked_rows(self, postgres_db):
+        sessions = sessionmaker(bind=postgres_db)
+        occurred_at = datetime(2000, 1, 1, tzinfo=UTC)
+        rows = [
+            orm.OutboxMessageORM(
+                id=uuid4(),
+                event_type="ExpenseSubmitted",
+                expense_id=uuid4(),
+                organization_id=uuid4(),
+                occurred_at=occurred_at + timedelta(seconds=i),
+                payload={},
+            )
+            for i in range(4)
+        ]
+        ids = [row.id for row in rows]
+        with sessions() as session:
+            session.add_all(rows)
+            session.commit()
+
+        first, second = [], []
+        try:
+            with sessions() as session, sessions() as other_session:
+                other = OutboxDispatcher(other_session, second.append, batch_size=2)
+
+                def publish_while_other_dispatches(message):
+                    if not first:
+                        other.dispatch_batch()
+                    first.append(message)
+
+                OutboxDispatcher(
+                    session, publish_while_other_dispatches, batch_size=2
+                ).dispatch_batch()
+        finally:
+            with sessions() as session:
+                session.execute(
+                    delete(orm.OutboxMessageORM).where(orm.OutboxMessageORM.id.in_(ids))
+                )
+                session.commit()
+
+        assert [message.id for message in first] == ids[:2]
+        assert [message.id for message in second] == ids[2:]
@@ -1,3 +1,7 @@
+import asyncio
+import csv
+import hashlib
+import json
 from datetime import datetime
 from typing import Optional
 from uuid import UUID, uuid4
@@ -5,14 +9,37 @@ from uuid import UUID, uuid4
 import pytest
 
 from src.expense_management.application import expense_exception
+from src.expense_management.application.export import ExportFormat
+from src.expense_management.application.queries import (
+    ExpenseGrouping,
+    ExpenseQueryService,
+)
 from src.expense_management.application.services import (
+    AsyncExpenseApplicationService,
     ExpenseApplicationService,
 )
-from src.iam.application.services import AuthorizationService
+from src.iam.application.services import (
+    AsyncAuthorizationService,
+    AuthorizationService,
+)
+from src.expense_management.domain import exception as domain_exception
 from src.expense_management.domain import model as expense_model
 from src.iam.domain import model as user_model
-from src.expense_management.infrastructure.repository import FakeExpenseRepository
-from src.iam.infrastructure.repository import FakeUserRepository
+from src.expense_management.infrastructure.queries import FakeExpenseQueries
+from src.expense_management.domain import receipt as receipt_model
+from src.expense_management.infrastructure.receipts import (
+    FakeReceiptJobRepository,
+    LocalReceiptStore,
+)
+from src.expense_management.infrastructure.repository import (
+    AsyncFakeExpenseRepository,
+    FakeExpenseRepository,
+)
+from src.iam.infrastructure.repository import (
+    AsyncFakeUserRepository,
+    FakeUserRepository,
+)
+from tests.fakes import CountingUserRepository
 
 
 def fake_user_repo(users: list[user_model.User]):
@@ -118,6 +145,32 @@ class TestExpenseAuthPolicy:
             expense.submitter_id, approver2.id, expense.organization_id
         )
 
+    def test_decisions_need_one_principal_lookup(self):
+        org_id = uuid4()
+        approver = generate_user(role="approver", org_id=org_id)
+        user_repo = CountingUserRepository([approver])
+        ex_auth_service = AuthorizationService(user_repo)
+
+        assert ex_auth_service.can_approve_expense(uuid4(), approver.id, org_id)
+        assert user_repo.lookups == 1
+
+        assert ex_auth_service.can_view_organization_expenses(approver.id, org_id)
+        assert user_repo.lookups == 2
+
+
+class InterleavingExpenseRepository(FakeExpenseRepository):
+    """Runs `concurrent_write` once, between a request's read and its save."""
+
+    def __init__(self, concurrent_write):
+        super().__init__()
+        self._concurrent_write = concurrent_write
+
+    def save(self, expense: expense_model.Expense) -> None:
+        if expense.is_persisted and self._concurrent_write:
+            concurrent_write, self._concurrent_write = self._concurrent_write, None
+            concurrent_write(self)
+        super().save(expense)
+
 
 class TestExpenseAppService:
     def get_FakeUserRepo(self, users: list[user_model.User]):
@@ -163,6 +216,97 @@ class TestExpenseAppService:
             expense_model.Expense,
         )
 
+    def test_cannot_create_expense_outside_own_organization(self, tmp_path):
+        submitter = generate_user()
+        store = LocalReceiptStore(tmp_path)
+        expense_app = ExpenseApplicationService(
+            auth_service=AuthorizationService(fake_user_repo([submitter])),
+            expense_repo=self.get_FakeExpenseRepo(),
+            receipt_store=store,
+        )
+
+        with pytest.raises(expense_exception.NotPermitted):
+            expense_app.create_expense(
+                submitter.id,
+                "title",
+                datetime.now(),
+                100.10,
+                "OFFICE_SUPPLIES",
+                uuid4(),
+                receipt=[b"receipt"],
+            )
+        with pytest.raises(expense_exception.InvalidCategory):
+            expense_app.create_expense(
+                submitter.id,
+                "title",
+                datetime.now(),
+                100.10,
+                "TRAVEL_BY_UNICORN",
+                submitter.organization_id,
+            )
+        assert not any(path.is_file() for path in tmp_path.rglob("*"))
+
+    def test_can_create_expenses_in_bulk(self):
+        submitter = generate_user()
+        user_repo = self.get_FakeUserRepo([submitter])
+        expense_repo = self.get_FakeExpenseRepo()
+        expense_auth_service = self.get_AuthService(user_repo=user_repo)
+        expense_app = self.get_ExpenseApplicationService(
+            expense_repo=expense_repo, expense_auth_service=expense_auth_service
+        )
+
+        results = expense_app.create_expenses(
+            dict(
+                submitter_id=submitter.id,
+                title=f"title-{i}",
+                date=datetime.now(),
+                amount=10.0,
+                category="OFFICE_SUPPLIES",
+                organization_id=submitter.organization_id,
+            )
+            for i in range(3)
+        )
+
+        assert [result.ok for result in results] == [True] * 3
+        assert all(
+            result.expense in expense_app.find_expenses_by_user(submitter.id)
+            for result in results
+        )
+
+    def test_bulk_create_reports_expenses_outside_organization(self):
+        submitter = generate_user()
+        user_repo = CountingUserRepository([submitter])
+        expense_app = self.get_ExpenseApplicationService(
+            expense_repo=self.get_FakeExpenseRepo(),
+            expense_auth_service=self.get_AuthService(user_repo=user_repo),
+        )
+        foreign_org_id = uuid4()
+
+        results = expense_app.create_expenses(
+            dict(
+                submitter_id=submitter.id,
+                title=f"title-{i}",
+                date=datetime.now(),
+                amount=10.0,
+                category="OFFICE_SUPPLIES",
+                organization_id=org_id,
+            )
+            for i, org_id in enumerate([submitter.organization_id, foreign_org_id] * 2)
+        )
+
+        assert [result.error for result in results] == [
+            None,
+            "NotPermitted",
+            None,
+            "NotPermitted",
+        ]
+        assert user_repo.lookups == 2
+        stored = expense_app.find_expenses_by_user(submitter.id)
+        assert {expense.id for expense in stored} == {
+            results[0].expense_id,
+            results[2].expense_id,
+        }
+
     def test_can_get_expense_as_submitter(self):
         submitter = generate_user()
         user_repo = self.get_FakeUserRepo([submitter])
@@ -260,6 +404,31 @@ class TestExpenseAppService:
         assert expense2 in expenses
         assert expense1 not in expenses
 
+    def test_concurrent_change_conflicts_with_transition(self):
+        submitter = generate_user()
+        expense = generate_expense(submitter.id, submitter.organization_id)
+
+        def edit_notes(expense_repo):
+            edited = expense_repo.get(expense.id)
+            edited.notes = "edited meanwhile"
+            expense_repo.save(edited)
+
+        expense_repo = InterleavingExpenseRepository(edit_notes)
+        expense_repo.save(expense)
+        expense_app = self.get_ExpenseApplicationService(
+            expense_repo=expense_repo,
+            expense_auth_service=self.get_AuthService(
+                self.get_FakeUserRepo([submitter])
+            ),
+        )
+
+        with pytest.raises(domain_exception.ConcurrentModification):
+            expense_app.submit_expense(user_id=submitter.id, expense_id=expense.id)
+
+        stored = expense_repo.get(expense.id)
+        assert (stored.state.name, stored.notes) == ("DRAFT", "edited meanwhile")
+        assert expense_app.submit_expense(submitter.id, expense.id).version == 3
+
     def test_can_submit_expense(self):
         submitter = generate_user()
 
@@ -281,7 +450,9 @@ class TestExpenseAppService:
             "OFFICE_SUPPLIES",
             submitter.organization_id,
         )
-        expense_app.submit_expense(user_id=submitter.id, expense_id=expense.id)
+        expense = expense_app.submit_expense(
+            user_id=submitter.id, expense_id=expense.id
+        )
 
         assert expense.state.name == "SUBMITTED"
 
@@ -332,7 +503,9 @@ class TestExpenseAppService:
             "OFFICE_SUPPLIES",
             submitter.organization_id,
         )
-        expense_app.withdraw_expense(user_id=submitter.id, expense_id=expense.id)
+        expense = expense_app.withdraw_expense(
+            user_id=submitter.id, expense_id=expense.id
+        )
 
         assert expense.state.name == "WITHDRAWN"
 
@@ -354,11 +527,15 @@ class TestExpenseAppService:
             submitter.organization_id,
         )
 
-        expense_app.submit_expense(user_id=submitter.id, expense_id=expense.id)
+        expense = expense_app.submit_expense(
+            user_id=submitter.id, expense_id=expense.id
+        )
 
         assert expense.state.name == "SUBMITTED"
 
-        expense_app.approve_expense(user_id=approver.id, expense_id=expense.id)
+        expense = expense_app.approve_expense(
+            user_id=approver.id, expense_id=expense.id
+        )
 
         assert expense.state.name == "APPROVED"
 
@@ -380,14 +557,16 @@ class TestExpenseAppService:
             submitter.organization_id,
         )
 
-        expense_app.submit_expense(user_id=submitter.id, expense_id=expense.id)
+        expense = expense_app.submit_expense(
+            user_id=submitter.id, expense_id=expense.id
+        )
 
         assert expense.state.name == "SUBMITTED"
 
         with pytest.raises(expense_exception.InvalidApprover):
             expense_app.approve_expense(user_id=approver.id, expense_id=expense.id)
 
-        assert expense.state.name == "SUBMITTED"
+        assert expense_repo.get(expense.id).state.name == "SUBMITTED"
 
     def test_cannot_approve_as_submitter_of_same_org(self):
         submitter = generate_user()
@@ -407,14 +586,16 @@ class TestExpenseAppService:
             submitter.organization_id,
         )
 
-        expense_app.submit_expense(user_id=submitter.id, expense_id=expense.id)
+        expense = expense_app.submit_expense(
+            user_id=submitter.id, expense_id=expense.id
+        )
 
         assert expense.state.name == "SUBMITTED"
 
         with pytest.raises(expense_exception.InvalidApprover):
             expense_app.approve_expense(user_id=submitter2.id, expense_id=expense.id)
 
-        assert expense.state.name == "SUBMITTED"
+        assert expense_repo.get(expense.id).state.name == "SUBMITTED"
 
     def test_can_revoke_as_approver(self):
         submitter = generate_user()
@@ -434,16 +615,370 @@ class TestExpenseAppService:
             submitter.organization_id,
         )
 
-        expense_app.submit_expense(user_id=submitter.id, expense_id=expense.id)
+        expense = expense_app.submit_expense(
+            user_id=submitter.id, expense_id=expense.id
+        )
 
         assert expense.state.name == "SUBMITTED"
 
-        expense_app.approve_expense(user_id=approver.id, expense_id=expense.id)
+        expense = expense_app.approve_expense(
+            user_id=approver.id, expense_id=expense.id
+        )
 
         assert expense.state.name == "APPROVED"
 
-        expense_app.revoke_approval(
+        expense = expense_app.revoke_approval(
             user_id=approver.id, expense_id=expense.id, reason="I have my reason"
         )
 
         assert expense.state.name == "REVOKED"
+
+    def test_can_submit_expenses_in_bulk(self):
+        submitter = generate_user()
+        expense_repo = self.get_FakeExpenseRepo()
+        expense_app = self.get_ExpenseApplicationService(
+            expense_repo=expense_repo,
+            expense_auth_service=self.get_AuthService(
+                self.get_FakeUserRepo([submitter])
+            ),
+        )
+        mine = generate_expense(submitter.id, submitter.organization_id)
+        other = generate_expense(uuid4(), submitter.organization_id)
+        expense_repo.save_many([mine, other])
+        missing_id = uuid4()
+
+        results = expense_app.submit_expenses(
+            submitter.id, [mine.id, other.id, missing_id]
+        )
+
+        assert [result.expense_id for result in results] == [
+            mine.id,
+            other.id,
+            missing_id,
+        ]
+        assert results[0].ok
+        assert results[0].expense.state.name == "SUBMITTED"
+        assert results[1].error == "InvalidSubmitUser"
+        assert results[2].error == "NoExpenseFound"
+        assert other.state.name == "DRAFT"
+
+    def test_can_approve_expenses_in_bulk(self):
+        submitter = generate_user()
+        approver = generate_user(role="approver", org_id=submitter.organization_id)
+        expense_repo = self.get_FakeExpenseRepo()
+        expense_app = self.get_ExpenseApplicationService(
+            expense_repo=expense_repo,
+            expense_auth_service=self.get_AuthService(
+                self.get_FakeUserRepo([submitter, approver])
+            ),
+        )
+        expenses = [
+            generate_expense(submitter.id, submitter.organization_id) for i in range(3)
+        ]
+        foreign = generate_expense(uuid4(), uuid4())
+        foreign.submit(foreign.submitter_id)
+        expense_repo.save_many([*expenses, foreign])
+        expense_app.submit_expenses(
+            submitter.id, [expense.id for expense in expenses[:2]]
+        )
+
+        results = expense_app.approve_expenses(
+            approver.id, [expense.id for expense in [*expenses, foreign]]
+        )
+
+        assert [result.ok for result in results] == [True, True, False, False]
+        assert results[2].error == "ExpenseNotSubmitted"
+        assert results[3].error == "InvalidApprover"
+        assert all(
+            expense_repo.get(expense.id).state.name == "APPROVED"
+            for expense in expenses[:2]
+        )
+
+    def test_created_expense_references_receipt_by_content_hash(self, tmp_path):
+        submitter = generate_user()
+        expense_app = ExpenseApplicationService(
+            auth_service=AuthorizationService(fake_user_repo([submitter])),
+            expense_repo=self.get_FakeExpenseRepo(),
+            receipt_store=LocalReceiptStore(tmp_path),
+        )
+
+        first, second = (
+            expense_app.create_expense(
+                submitter.id,
+                "title",
+                datetime.now(),
+                10.0,
+                "OFFICE_SUPPLIES",
+                submitter.organization_id,
+                receipt=iter([b"%PDF-1.7 ", b"receipt"]),
+            )
+            for _ in range(2)
+        )
+
+        digest = hashlib.sha256(b"%PDF-1.7 receipt").hexdigest()
+        assert first.document_reference == second.document_reference == digest
+        receipt = expense_app.get_receipt(submitter.id, first.id)
+        assert receipt.path.read_bytes() == b"%PDF-1.7 receipt"
+
+    def test_receipt_is_visible_to_submitter_and_approvers_of_org(self, tmp_path):
+        submitter = generate_user()
+        approver = generate_user(role="approver", org_id=submitter.organization_id)
+        colleague = generate_user(org_id=submitter.organization_id)
+        expense_app = ExpenseApplicationService(
+            auth_service=AuthorizationService(
+                fake_user_repo([submitter, approver, colleague])
+            ),
+            expense_repo=self.get_FakeExpenseRepo(),
+            receipt_store=LocalReceiptStore(tmp_path),
+        )
+        expense = expense_app.create_expense(
+            submitter.id,
+            "title",
+            datetime.now(),
+            10.0,
+            "OFFICE_SUPPLIES",
+            submitter.organization_id,
+            receipt=[b"receipt"],
+        )
+        without_receipt = expense_app.create_expense(
+            submitter.id,
+            "title",
+            datetime.now(),
+            10.0,
+            "OFFICE_SUPPLIES",
+            submitter.organization_id,
+        )
+
+        assert expense_app.get_receipt(approver.id, expense.id).size == 7
+        with pytest.raises(expense_exception.NotPermitted):
+            expense_app.get_receipt(colleague.id, expense.id)
+        with pytest.raises(expense_exception.NoReceipt):
+            expense_app.get_receipt(submitter.id, without_receipt.id)
+
+    def test_receipt_job_is_looked_up_by_document_reference(self, tmp_path):
+        submitter = generate_user()
+        colleague = generate_user(org_id=submitter.organization_id)
+        receipt_jobs = FakeReceiptJobRepository(
+            [
+                receipt_model.ReceiptJob(
+                    document_reference=hashlib.sha256(b"receipt").hexdigest(),
+                    available_at=datetime.now(),
+                )
+            ]
+        )
+        expense_app = ExpenseApplicationService(
+            auth_service=AuthorizationService(fake_user_repo([submitter, colleague])),
+            expense_repo=self.get_FakeExpenseRepo(),
+            receipt_store=LocalReceiptStore(tmp_path),
+            receipt_jobs=receipt_jobs,
+        )
+        expense = expense_app.create_expense(
+            submitter.id,
+            "title",
+            datetime.now(),
+            10.0,
+            "OFFICE_SUPPLIES",
+            submitter.organization_id,
+            receipt=[b"receipt"],
+        )
+
+        job = expense_app.get_receipt_job(submitter.id, expense.id)
+
+        assert job.state == receipt_model.ReceiptJobState.QUEUED
+        with pytest.raises(expense_exception.NotPermitted):
+            expense_app.get_receipt_job(colleague.id, expense.id)
+
+
+class TestAsyncExpenseApplicationService:
+    def test_can_approve_expenses_in_bulk(self):
+        submitter = generate_user()
+        approver = generate_user(role="approver", org_id=submitter.organization_id)
+        expenses = [
+            generate_expense(submitter.id, submitter.organization_id) for i in range(3)
+        ]
+        foreign = generate_expense(uuid4(), uuid4())
+        foreign.submit(foreign.submitter_id)
+        expense_app = AsyncExpenseApplicationService(
+            auth_service=AsyncAuthorizationService(
+                AsyncFakeUserRepository([submitter, approver])
+            ),
+            expense_repo=AsyncFakeExpenseRepository([*expenses, foreign]),
+        )
+
+        async def scenario():
+            await expense_app.submit_expenses(
+                submitter.id, [expense.id for expense in expenses[:2]]
+            )
+            return await expense_app.approve_expenses(
+                approver.id, [expense.id for expense in [*expenses, foreign]]
+            )
+
+        results = asyncio.run(scenario())
+
+        assert [result.ok for result in results] == [True, True, False, False]
+        assert results[2].error == "ExpenseNotSubmitted"
+        assert results[3].error == "InvalidApprover"
+
+    def test_approval_is_checked_like_sync_service(self):
+        submitter = generate_user()
+        outsider = generate_user(role="approver")
+        expense = generate_expense(submitter.id, submitter.organization_id)
+        expense.submit(submitter.id)
+        expense_app = AsyncExpenseApplicationService(
+            auth_service=AsyncAuthorizationService(
+                AsyncFakeUserRepository([submitter, outsider])
+            ),
+            expense_repo=AsyncFakeExpenseRepository([expense]),
+        )
+
+        with pytest.raises(expense_exception.InvalidApprover):
+            asyncio.run(expense_app.approve_expense(outsider.id, expense.id))
+        with pytest.raises(expense_exception.InvalidApprover):
+            asyncio.run(expense_app.approve_expense(submitter.id, expense.id))
+
+    def test_bulk_create_is_checked_like_sync_service(self):
+        submitter = generate_user()
+        expense_app = AsyncExpenseApplicationService(
+            auth_service=AsyncAuthorizationService(
+                AsyncFakeUserRepository([submitter])
+            ),
+            expense_repo=AsyncFakeExpenseRepository(),
+        )
+
+        results = asyncio.run(
+            expense_app.create_expenses(
+                dict(
+                    submitter_id=submitter.id,
+                    title="title",
+                    date=datetime.now(),
+                    amount=10.0,
+                    category="OFFICE_SUPPLIES",
+                    organization_id=org_id,
+                )
+                for org_id in [submitter.organization_id, uuid4()]
+            )
+        )
+
+        assert [result.error for result in results] == [None, "NotPermitted"]
+
+
+class TestExpenseQueryService:
+    def test_approver_can_summarize_organization(self):
+        approver = generate_user(role="approver")
+        expenses = [
+            generate_expense(uuid4(), approver.organization_id) for i in range(3)
+        ]
+        query_service = ExpenseQueryService(
+            AuthorizationService(fake_user_repo([approver])),
+            FakeExpenseQueries(expenses),
+        )
+
+        (aggregate,) = query_service.summarize_organization(
+            approver.id, approver.organization_id, [ExpenseGrouping.CATEGORY]
+        )
+
+        assert aggregate.key == (expense_model.ExpenseCategory.OFFICE_SUPPLIES,)
+        assert aggregate.count == 3
+        assert aggregate.total == 300
+
+    def test_cannot_summarize_other_organization(self):
+        approver = generate_user(role="approver")
+        query_service = ExpenseQueryService(
+            AuthorizationService(fake_user_repo([approver])), FakeExpenseQueries()
+        )
+
+        with pytest.raises(expense_exception.NotPermitted):
+            query_service.summarize_organization(
+                approver.id, uuid4(), [ExpenseGrouping.STATE]
+            )
+
+    def test_can_export_organization_expenses(self):
+        approver = generate_user(role="approver")
+        expenses = [
+            generate_expense(uuid4(), approver.organization_id) for i in range(3)
+        ]
+        expenses[0].submit(expenses[0].submitter_id)
+        query_service = ExpenseQueryService(
+            AuthorizationService(fake_user_repo([approver])),
+            FakeExpenseQueries(expenses),
+        )
+
+        csv_rows = list(
+            csv.DictReader(
+                "".join(
+                    query_service.export_organization_expenses(
+                        approver.id, approver.organization_id, ExportFormat.CSV
+                    )
+                ).splitlines()
+            )
+        )
+        ndjson_rows = [
+            json.loads(line)
+            for chunk in query_service.export_organization_expenses(
+                approver.id, approver.organization_id, ExportFormat.NDJSON
+            )
+            for line in chunk.splitlines()
+        ]
+
+        assert len(csv_rows) == len(ndjson_rows) == 3
+        assert {row["id"] for row in csv_rows} == {str(e.id) for e in expenses}
+        assert [row["state"] for row in ndjson_rows].count("SUBMITTED") == 1
+        assert ndjson_rows[0]["amount"] == 100
+
+    def test_expense_tag_follows_changes_and_permissions(self):
+        submitter = generate_user()
+        approver = generate_user(role="approver", org_id=submitter.organization_id)
+        outsider = generate_user(role="approver")
+        expense = generate_expense(submitter.id, submitter.organization_id)
+        query_service = ExpenseQueryService(
+            AuthorizationService(fake_user_repo([submitter, approver, outsider])),
+            FakeExpenseQueries([expense]),
+        )
+
+        tag = query_service.expense_tag(submitter.id, expense.id)
+        tagged = query_service.get_expense(approver.id, expense.id)
+        expense.submit(submitter.id)
+
+        assert tagged.tag == tag
+        assert tagged.expense == expense
+        assert query_service.expense_tag(submitter.id, expense.id) != tag
+        with pytest.raises(expense_exception.NotPermitted):
+            query_service.expense_tag(outsider.id, expense.id)
+        with pytest.raises(expense_exception.NotPermitted):
+            query_service.get_expense(outsider.id, expense.id)
+
+    def test_export_checks_permission_before_streaming(self):
+        approver = generate_user(role="approver")
+        query_service = ExpenseQueryService(
+            AuthorizationService(fake_user_repo([approver])), FakeExpenseQueries()
+        )
+
+        with pytest.raises(expense_exception.NotPermitted):
+            query_service.export_organization_expenses(
+                approver.id, uuid4(), ExportFormat.CSV
+            )
+
+    def test_report_for_period_checks_permission(self):
+        approver = generate_user(role="approver")
+        expenses = [
+            generate_expense(uuid4(), approver.organization_id) for i in range(3)
+        ]
+        expenses[0].date = datetime(2024, 12, 31)
+        query_service = ExpenseQueryService(
+            AuthorizationService(fake_user_repo([approver])),
+            FakeExpenseQueries(expenses),
+        )
+
+        report = query_service.report_for_period(
+            approver.id,
+            approver.organization_id,
+            datetime(2025, 1, 1),
+            datetime(2026, 1, 1),
+        )
+
+        assert len(report) == 2
+        assert report.total() == 200
+        with pytest.raises(expense_exception.NotPermitted):
+            query_service.report_for_period(
+                approver.id, uuid4(), datetime(2025, 1, 1), datetime(2026, 1, 1)
+            )